@@ -0,0 +1,71 @@
+import argparse
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from src.config import settings
+from src.generators.encoding_profiles import (
+    ENCODING_PROFILES, benchmark_path, codec_args, parse_ssim, parse_vmaf, pick_winner, record_winner
+)
+
+FFMPEG = settings.FFMPEG_PATH or "ffmpeg"
+
+def run(args: List[str]) -> subprocess.CompletedProcess:
+    return subprocess.run([FFMPEG, "-y", "-hide_banner", *args], capture_output=True, text=True, check=True)
+
+def build_reference(path: Path, seconds: int) -> None:
+    """Synthetic stand-in for gameplay: moving test pattern plus temporal noise, stored lossless."""
+    size = f"{settings.VIDEO_WIDTH}x{settings.VIDEO_HEIGHT}"
+    run([
+        "-f", "lavfi", "-i", f"testsrc2=size={size}:rate={settings.VIDEO_FPS}:duration={seconds}",
+        "-vf", "noise=alls=12:allf=t", "-c:v", "libx264", "-qp", "0", "-preset", "ultrafast", str(path)
+    ])
+
+def has_vmaf() -> bool:
+    return "libvmaf" in run(["-filters"]).stdout
+
+def score(distorted: Path, reference: Path, metric: str) -> Optional[float]:
+    result = run(["-i", str(distorted), "-i", str(reference), "-lavfi", metric, "-f", "null", "-"])
+    return parse_vmaf(result.stderr) if metric == "libvmaf" else parse_ssim(result.stderr)
+
+def benchmark(seconds: int, min_ssim: float) -> None:
+    frames = seconds * settings.VIDEO_FPS
+    vmaf = has_vmaf()
+    results: Dict[str, Dict] = {}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        reference = Path(tmp) / "reference.mkv"
+        build_reference(reference, seconds)
+
+        print(f"{'profile':>10} | {'fps':>7} | {'size':>9} | {'ssim':>6} | {'vmaf':>6}")
+        for name in ENCODING_PROFILES:
+            output = Path(tmp) / f"{name}.mp4"
+            start = time.perf_counter()
+            run(["-i", str(reference), *codec_args(name), "-an", str(output)])
+            elapsed = time.perf_counter() - start
+
+            results[name] = {
+                "fps": frames / elapsed,
+                "bytes": output.stat().st_size,
+                "ssim": score(output, reference, "ssim"),
+                "vmaf": score(output, reference, "libvmaf") if vmaf else None,
+            }
+            r = results[name]
+            vmaf_text = f"{r['vmaf']:>6.2f}" if r["vmaf"] is not None else f"{'n/a':>6}"
+            print(f"{name:>10} | {r['fps']:>7.1f} | {r['bytes'] / 1024:>6.0f} KB | {r['ssim']:>6.4f} | {vmaf_text}")
+
+    winner = pick_winner(results, min_ssim)
+    if winner is None:
+        print(f"No profile reached SSIM {min_ssim}; nothing recorded")
+        return
+    record_winner(results, winner)
+    print(f"Winner: {winner} (fastest with SSIM >= {min_ssim}), recorded in {benchmark_path()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark encoding profiles on this machine")
+    parser.add_argument("--seconds", type=int, default=10, help="length of the synthetic clip")
+    parser.add_argument("--min-ssim", type=float, default=0.95, help="quality floor for the winner")
+    args = parser.parse_args()
+    benchmark(args.seconds, args.min_ssim)
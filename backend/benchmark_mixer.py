@@ -0,0 +1,41 @@
+import time
+
+from pydub import AudioSegment
+from pydub.generators import Sine, WhiteNoise
+
+from src.generators.audio_mixer import AudioMixer, pcm_to_float
+
+def build_speech(seconds: int) -> AudioSegment:
+    """Stand-in for decoded edge-tts output: 24kHz mono 16-bit."""
+    return WhiteNoise(sample_rate=24000).to_audio_segment(duration=seconds * 1000).apply_gain(-20)
+
+def pydub_mix(audio: AudioSegment, bleep: AudioSegment, intervals) -> AudioSegment:
+    """Previous implementation: one full-segment overlay per bleep."""
+    mixed = audio
+    for start, end in intervals:
+        bleep_dur = max(200, int((end - start) * 1000))
+        mixed = mixed.overlay(bleep[:bleep_dur], position=int(start * 1000))
+    return mixed
+
+def timed(fn, runs: int) -> float:
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn()
+    return (time.perf_counter() - start) / runs * 1000
+
+def benchmark():
+    mixer = AudioMixer()
+    bleep = Sine(1000, sample_rate=24000).to_audio_segment(duration=300).apply_gain(-5)
+    mixer.sound_bank.get("bleep", 0.3, 24000)  # Bank is built once per process
+
+    print(f"{'seconds':>7} | {'bleeps':>6} | {'pydub overlay':>14} | {'numpy':>9} | speedup")
+    for seconds, bleep_count in ((60, 5), (60, 30), (180, 90)):
+        speech = build_speech(seconds)
+        intervals = [(i * seconds / bleep_count + 0.1, i * seconds / bleep_count + 0.4) for i in range(bleep_count)]
+        pydub_ms = timed(lambda: pydub_mix(speech, bleep, intervals), 3)
+        # Includes the AudioSegment -> float32 conversion the pipeline performs once
+        numpy_ms = timed(lambda: mixer.mix(pcm_to_float(speech), speech.frame_rate, intervals), 10)
+        print(f"{seconds:>7} | {bleep_count:>6} | {pydub_ms:>11.1f} ms | {numpy_ms:>6.1f} ms | {pydub_ms / numpy_ms:>6.0f}x")
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,45 @@
+import random
+import time
+
+from better_profanity import Profanity
+
+from src.processors.profanity_matcher import ProfanityMatcher, default_words
+
+def build_story(word_count: int) -> str:
+    """Synthetic story: mostly clean words with ~2% cuss words and punctuation."""
+    rng = random.Random(42)
+    clean = "the night was quiet when I heard a noise coming from the basement again".split()
+    dirty = ["fuck", "shit", "$h1t", "damn", "f*ck", "asshole", "bitch"]
+    words = []
+    for i in range(word_count):
+        word = rng.choice(dirty) if rng.random() < 0.02 else rng.choice(clean)
+        if i % 12 == 11:
+            word += rng.choice([".", ",", "!", "?"])
+        words.append(word)
+    return " ".join(words)
+
+def timed(fn, text: str, runs: int) -> float:
+    start = time.perf_counter()
+    for _ in range(runs):
+        fn(text)
+    return (time.perf_counter() - start) / runs * 1000
+
+def benchmark():
+    extra_words = [f"customword{i}" for i in range(300)]  # DB-loaded words
+
+    bp = Profanity()
+    bp.load_censor_words()
+    bp.add_censor_words(extra_words)
+
+    matcher = ProfanityMatcher(default_words() + extra_words)
+
+    print(f"{'words':>6} | {'better_profanity':>18} | {'matcher':>10} | speedup")
+    for word_count in (300, 1000, 3000):
+        text = build_story(word_count)
+        runs = 3 if word_count > 1000 else 5
+        bp_ms = timed(lambda t: bp.censor(t, censor_char="*"), text, runs)
+        m_ms = timed(matcher.censor, text, runs * 10)
+        print(f"{word_count:>6} | {bp_ms:>15.1f} ms | {m_ms:>7.2f} ms | {bp_ms / m_ms:>6.0f}x")
+
+if __name__ == "__main__":
+    benchmark()
@@ -70,6 +70,9 @@ CREATE TABLE story_parts (
     title VARCHAR(500),                               -- e.g., "Story Title [Part 1/3]"
     caption TEXT,                                     -- Caption with part info
     
+    -- TTS voice chosen at split time (parts are sized for its speaking rate)
+    voice_name VARCHAR(100),
+    
     -- Status
     status VARCHAR(50) NOT NULL DEFAULT 'pending',
     -- Possible: pending, audio_generated, video_generated, uploaded, completed, failed
@@ -103,6 +106,8 @@ CREATE TABLE audio_files (
     -- Metadata
     character_count INTEGER,                          -- Characters processed
     has_bleep_sounds BOOLEAN DEFAULT FALSE,           -- Whether censoring was applied
+    tempo_factor FLOAT DEFAULT 1.0,                   -- Speed-up applied to fit the max duration
+    word_timings BYTEA,                               -- Packed word timings (float32 arrays + words)
     
     -- Status
     status VARCHAR(50) NOT NULL DEFAULT 'generated',
@@ -125,6 +130,7 @@ CREATE TABLE videos (
     
     -- File info
     filename VARCHAR(255) NOT NULL,                   -- e.g., nosleep_abc123_1.mp4
+    variant VARCHAR(30) NOT NULL DEFAULT 'default',   -- Output format (OUTPUT_VARIANTS name)
     local_path VARCHAR(500),                          -- Temporary local path
     drive_file_id VARCHAR(100),                       -- Google Drive file ID
     drive_download_url VARCHAR(500),                  -- Direct download link
@@ -139,6 +145,12 @@ CREATE TABLE videos (
     -- Gameplay used
     gameplay_filename VARCHAR(255),                   -- Which gameplay video was used
     
+    -- Encode stats (from FFmpeg -progress)
+    encode_preset VARCHAR(20),                        -- Encoding profile used (throughput/size/quality)
+    encode_seconds FLOAT,                             -- Wall time of the render
+    encode_fps FLOAT,                                 -- Final encode frames per second
+    encode_speed FLOAT,                               -- Final speed (x realtime)
+    
     -- Status
     status VARCHAR(50) NOT NULL DEFAULT 'generated',
     -- Possible: generated, uploaded_to_drive, youtube_queued, youtube_uploaded, 
@@ -288,12 +300,24 @@ CREATE TABLE gameplay_videos (
     filename VARCHAR(255) NOT NULL,
     duration_seconds FLOAT,
     file_size_bytes BIGINT,
+    source_md5 VARCHAR(32),                           -- Drive md5Checksum of the source
     
     -- Metadata
     is_active BOOLEAN DEFAULT TRUE,                   -- Can be used for videos
     usage_count INTEGER DEFAULT 0,                    -- Times used
     last_used_at TIMESTAMP WITH TIME ZONE,
     
+    -- Normalized mezzanine (output size/fps, fixed GOP) from the ingest step
+    mezzanine_path VARCHAR(500),                      -- Local transcoded file
+    mezzanine_sha256 VARCHAR(64),                     -- Integrity check of the local file
+    mezzanine_mtime FLOAT,                            -- File mtime when last hashed (cheap check)
+    width INTEGER,
+    height INTEGER,
+    fps FLOAT,
+    keyframe_times FLOAT[],                           -- Keyframe timestamps (seconds)
+    recent_offsets FLOAT[],                           -- Last start offsets used (spread reuse)
+    ingested_at TIMESTAMP WITH TIME ZONE,
+    
     -- Sync info
     synced_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     
@@ -325,7 +349,11 @@ CREATE TABLE daily_statistics (
     upload_failures INTEGER DEFAULT 0,
     
     -- API usage
-    gemini_requests INTEGER DEFAULT 0,
+    gemini_requests INTEGER DEFAULT 0,               -- LLM calls (all providers)
+    llm_prompt_tokens INTEGER DEFAULT 0,
+    llm_completion_tokens INTEGER DEFAULT 0,
+    llm_latency_ms FLOAT DEFAULT 0,                   -- Summed, divide by gemini_requests
+    llm_cost_usd FLOAT DEFAULT 0,
     tts_characters INTEGER DEFAULT 0,
     youtube_quota_used INTEGER DEFAULT 0,
     
@@ -336,6 +364,40 @@ CREATE TABLE daily_statistics (
 
 CREATE INDEX idx_daily_statistics_date ON daily_statistics(date);
 
+-- ============================================
+--              LLM USAGE TABLE
+-- ============================================
+-- One row per LLM call (tokens, latency, cost)
+CREATE TABLE llm_usage (
+    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    processing_job_id UUID REFERENCES processing_jobs(id) ON DELETE SET NULL,
+    
+    -- Call info
+    provider VARCHAR(50) NOT NULL,                    -- groq, openai, gemini
+    model VARCHAR(100) NOT NULL,
+    prompt_name VARCHAR(100) NOT NULL,                -- e.g. story_modification, title_generation
+    
+    -- Usage
+    prompt_tokens INTEGER DEFAULT 0,
+    completion_tokens INTEGER DEFAULT 0,
+    cached_tokens INTEGER DEFAULT 0,                  -- Prompt tokens served from provider cache
+    latency_ms FLOAT DEFAULT 0,                       -- Wall time including retries
+    retry_count INTEGER DEFAULT 0,
+    cache_hit BOOLEAN DEFAULT FALSE,
+    cost_usd FLOAT DEFAULT 0,
+    
+    -- Status
+    status VARCHAR(50) NOT NULL DEFAULT 'success',
+    -- Possible: success, failed
+    
+    error_message TEXT,
+    
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX idx_llm_usage_processing_job_id ON llm_usage(processing_job_id);
+CREATE INDEX idx_llm_usage_created_at ON llm_usage(created_at);
+
 -- ============================================
 --               SETTINGS TABLE
 -- ============================================
@@ -354,7 +416,8 @@ INSERT INTO settings (key, value, description) VALUES
     ('youtube_daily_limit', '6', 'Maximum YouTube uploads per day'),
     ('enable_youtube_upload', 'true', 'Enable/disable YouTube uploads'),
     ('enable_email_notifications', 'true', 'Enable/disable email notifications'),
-    ('maintenance_mode', 'false', 'Pause all processing when true');
+    ('maintenance_mode', 'false', 'Pause all processing when true'),
+    ('cuss_words_version', '0', 'Bumped on every cuss_words change; workers reload their matcher cache');
 
 -- ============================================
 --            TRIGGER FUNCTIONS
@@ -504,3 +567,33 @@ CREATE TABLE IF NOT EXISTS schema_version (
 );
 
 INSERT INTO schema_version (version, description) VALUES (1, 'Initial schema');
+
+-- View: LLM usage per day and prompt (find the prompts that dominate spend/latency)
+CREATE VIEW v_llm_usage_daily AS
+SELECT DATE(u.created_at) as date,
+       u.provider,
+       u.model,
+       u.prompt_name,
+       COUNT(*) as calls,
+       SUM(u.prompt_tokens) as prompt_tokens,
+       SUM(u.completion_tokens) as completion_tokens,
+       SUM(u.cost_usd) as cost_usd,
+       AVG(u.latency_ms) as avg_latency_ms,
+       PERCENTILE_CONT(0.95) WITHIN GROUP (ORDER BY u.latency_ms) as p95_latency_ms,
+       SUM(u.retry_count) as retries,
+       SUM(CASE WHEN u.cache_hit THEN 1 ELSE 0 END) as cache_hits
+FROM llm_usage u
+GROUP BY DATE(u.created_at), u.provider, u.model, u.prompt_name
+ORDER BY date DESC, cost_usd DESC;
+
+-- View: LLM usage per pipeline run
+CREATE VIEW v_llm_usage_by_job AS
+SELECT u.processing_job_id,
+       u.prompt_name,
+       COUNT(*) as calls,
+       SUM(u.prompt_tokens) as prompt_tokens,
+       SUM(u.completion_tokens) as completion_tokens,
+       SUM(u.cost_usd) as cost_usd,
+       SUM(u.latency_ms) as total_latency_ms
+FROM llm_usage u
+GROUP BY u.processing_job_id, u.prompt_name;
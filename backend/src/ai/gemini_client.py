@@ -1,7 +1,8 @@
 
 import json
+import time
 import asyncio
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 
 from groq import AsyncGroq
 from openai import AsyncOpenAI
@@ -12,11 +13,23 @@ from src.utils.logger import logger
 from src.utils.retry import retry_gemini # Generic retry logic
 from src.ai import prompts
 
+# USD per 1M tokens (prompt, completion). Unknown models are recorded at zero cost.
+MODEL_PRICING: Dict[str, Tuple[float, float]] = {
+    "llama-3.3-70b-versatile": (0.59, 0.79),
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "gemini-1.5-flash": (0.075, 0.30),
+}
+
 class AIClient:
     def __init__(self):
         self.provider = "none"
         self.client = None
         self.model = None
+        
+        # Usage records not yet written to the database (see flush_usage)
+        self.pending_usage: List[dict] = []
+        # Totals for the current pipeline run (cleared by run_pipeline), keyed by prompt name
+        self.run_usage: Dict[str, dict] = {}
 
         # 1. Try Groq (Free Tier Priority)
         if settings.GROQ_API_KEY:
@@ -42,11 +55,38 @@ class AIClient:
         else:
             logger.warning("No AI API keys set. Processing will fail.")
 
-    @retry_gemini
-    async def generate_text(self, prompt: str) -> str:
+    async def generate_text(self, prompt: str, prompt_name: str = "custom") -> str:
         """
         Generate text using available provider.
+        Every call is metered (tokens, latency, retries, cost) under prompt_name.
+        """
+        call = {
+            "provider": self.provider,
+            "model": self.model or "none",
+            "prompt_name": prompt_name,
+            "prompt_tokens": 0,
+            "completion_tokens": 0,
+            "cached_tokens": 0,
+            "attempts": 0,
+        }
+        start = time.perf_counter()
+        error = None
+        
+        try:
+            return await self._generate_with_retry(prompt, call)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._record_usage(call, (time.perf_counter() - start) * 1000, error)
+
+    @retry_gemini
+    async def _generate_with_retry(self, prompt: str, call: dict) -> str:
         """
+        Single provider request. Fills token counts into call.
+        """
+        call["attempts"] += 1
+        
         if not self.provider or self.provider == "none":
             raise ValueError("No AI Provider configured (Missing API Keys)")
 
@@ -60,6 +100,7 @@ class AIClient:
                     ],
                     temperature=0.7
                 )
+                self._read_openai_usage(response, call)
                 return response.choices[0].message.content.strip()
                 
             elif self.provider == "openai":
@@ -71,6 +112,7 @@ class AIClient:
                     ],
                     temperature=0.7
                 )
+                self._read_openai_usage(response, call)
                 return response.choices[0].message.content.strip()
                 
             elif self.provider == "gemini":
@@ -81,25 +123,112 @@ class AIClient:
                     None, 
                     lambda: model.generate_content(prompt)
                 )
+                usage = getattr(response, "usage_metadata", None)
+                if usage:
+                    call["prompt_tokens"] = getattr(usage, "prompt_token_count", 0) or 0
+                    call["completion_tokens"] = getattr(usage, "candidates_token_count", 0) or 0
+                    call["cached_tokens"] = getattr(usage, "cached_content_token_count", 0) or 0
                 return response.text.strip()
                 
         except Exception as e:
             logger.error(f"{self.provider} generation failed: {e}")
             raise
 
+    def _read_openai_usage(self, response, call: dict) -> None:
+        """Groq and OpenAI share the OpenAI usage schema."""
+        usage = getattr(response, "usage", None)
+        if not usage:
+            return
+        call["prompt_tokens"] = usage.prompt_tokens or 0
+        call["completion_tokens"] = usage.completion_tokens or 0
+        details = getattr(usage, "prompt_tokens_details", None)
+        call["cached_tokens"] = (getattr(details, "cached_tokens", 0) or 0) if details else 0
+
+    def _record_usage(self, call: dict, latency_ms: float, error: Optional[Exception]) -> None:
+        """
+        Queue a usage record for the DB and add it to the run totals.
+        """
+        prompt_price, completion_price = MODEL_PRICING.get(call["model"], (0.0, 0.0))
+        # Cached prompt tokens are billed at roughly half price by providers that report them
+        billable_prompt = call["prompt_tokens"] - call["cached_tokens"] / 2
+        cost = (billable_prompt * prompt_price + call["completion_tokens"] * completion_price) / 1_000_000
+        
+        record = {
+            "provider": call["provider"],
+            "model": call["model"],
+            "prompt_name": call["prompt_name"],
+            "prompt_tokens": call["prompt_tokens"],
+            "completion_tokens": call["completion_tokens"],
+            "cached_tokens": call["cached_tokens"],
+            "latency_ms": round(latency_ms, 1),
+            "retry_count": max(0, call["attempts"] - 1),
+            "cache_hit": call["cached_tokens"] > 0,
+            "cost_usd": cost,
+            "status": "failed" if error else "success",
+            "error_message": str(error)[:500] if error else None,
+        }
+        self.pending_usage.append(record)
+        
+        totals = self.run_usage.setdefault(call["prompt_name"], {
+            "calls": 0, "prompt_tokens": 0, "completion_tokens": 0,
+            "latency_ms": 0.0, "cost_usd": 0.0, "retries": 0
+        })
+        totals["calls"] += 1
+        totals["prompt_tokens"] += record["prompt_tokens"]
+        totals["completion_tokens"] += record["completion_tokens"]
+        totals["latency_ms"] += record["latency_ms"]
+        totals["cost_usd"] += cost
+        totals["retries"] += record["retry_count"]
+        
+        logger.debug(
+            f"LLM {call['prompt_name']}: {record['prompt_tokens']}+{record['completion_tokens']} tokens, "
+            f"{record['latency_ms']:.0f}ms, {record['retry_count']} retries"
+        )
+
+    async def flush_usage(self, job_id=None) -> int:
+        """
+        Write pending usage records to llm_usage and daily_statistics.
+        Returns number of records written.
+        """
+        if not self.pending_usage:
+            return 0
+        
+        from src.database.connection import get_db_session
+        from src.database.queries import DBQueries
+        
+        calls, self.pending_usage = self.pending_usage, []
+        try:
+            async with get_db_session() as session:
+                await DBQueries(session).record_llm_usage(calls, job_id)
+        except Exception as e:
+            logger.error(f"Failed to persist LLM usage: {e}")
+            self.pending_usage = calls + self.pending_usage
+            return 0
+        return len(calls)
+
+    def usage_summary(self) -> str:
+        """Human readable per-prompt totals for this run, most expensive first."""
+        lines = []
+        for name, t in sorted(self.run_usage.items(), key=lambda kv: -kv[1]["cost_usd"]):
+            lines.append(
+                f"{name}: {t['calls']} calls, {t['prompt_tokens']}+{t['completion_tokens']} tokens, "
+                f"${t['cost_usd']:.4f}, avg {t['latency_ms'] / t['calls']:.0f}ms, {t['retries']} retries"
+            )
+        return "\n".join(lines)
+
     async def modify_story(self, original_content: str, original_title: str) -> str:
         """
         Rewrite story with intro, middle, outro and extension.
         """
         prompt = prompts.STORY_MODIFICATION_PROMPT.format(original_content=original_content)
-        return await self.generate_text(prompt)
+        return await self.generate_text(prompt, prompt_name="story_modification")
 
     async def generate_title(self, original_title: str) -> str:
         """
         Generate viral title.
         """
         prompt = prompts.TITLE_GENERATION_PROMPT.format(original_title=original_title)
-        title = await self.generate_text(prompt)
+        title = await self.generate_text(prompt, prompt_name="title_generation")
         return title.strip('"\'')
 
     async def generate_hashtags(self, original_title: str) -> List[str]:
@@ -107,7 +236,7 @@ class AIClient:
         Generate viral hashtags.
         """
         prompt = prompts.HASHTAG_GENERATION_PROMPT.format(original_title=original_title)
-        text = await self.generate_text(prompt)
+        text = await self.generate_text(prompt, prompt_name="hashtag_generation")
         tags = [tag.strip() for tag in text.split() if tag.startswith('#')]
         return tags[:10]
 
@@ -116,7 +245,7 @@ class AIClient:
         Generate list of cuss words for filtering.
         """
         try:
-            text = await self.generate_text(prompts.CUSS_WORD_LIST_PROMPT)
+            text = await self.generate_text(prompts.CUSS_WORD_LIST_PROMPT, prompt_name="cuss_word_list")
             text = text.replace("```json", "").replace("```", "").strip()
             try:
                 data = json.loads(text)
@@ -10,6 +10,8 @@ from typing import Dict, List, Optional
 from src.main import run_pipeline
 from src.config import settings
 from src.utils.logger import logger
+from src.utils.metrics import metrics
+from src.generators.render_engine import render_engine
 
 app = FastAPI(title="AI Slop Pipeline Control Panel")
 
@@ -60,7 +62,9 @@ def get_status():
         "last_run_start": state.last_run_start,
         "last_run_end": state.last_run_end,
         "last_error": state.last_error,
-        "current_stage": state.current_stage
+        "current_stage": state.current_stage,
+        "renders": render_engine.progress(),
+        "metrics": metrics.snapshot()
     }
 
 @app.post("/run")
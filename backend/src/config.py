@@ -32,6 +32,7 @@ class Settings:
     BASE_DIR: Path = Path(__file__).resolve().parent.parent
     LOGS_DIR: Path = BASE_DIR / "logs"
     TEMP_DIR: Path = BASE_DIR / "temp"
+    CACHE_DIR: Path = Path(os.getenv("CACHE_DIR", str(BASE_DIR / "cache")))
     ASSETS_DIR: Path = BASE_DIR / "assets"
     
     # Reddit Configuration
@@ -53,9 +54,54 @@ class Settings:
     # Groq Configuration (Free)
     GROQ_API_KEY: str = os.getenv("GROQ_API_KEY", "")
     
+    # Gemini Configuration (Legacy)
+    GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
+    
+    # TTS engine: "edge" (edge-tts, network) or "espeak" (local espeak-ng)
+    TTS_BACKEND: str = os.getenv("TTS_BACKEND", "edge")
+    TTS_FALLBACK_BACKEND: str = os.getenv("TTS_FALLBACK_BACKEND", "")  # Used when the primary fails
+    ESPEAK_PATH: str = os.getenv("ESPEAK_PATH", "espeak-ng")
+    ESPEAK_WPM: int = int(os.getenv("ESPEAK_WPM", "165"))
+    TTS_LOCAL_WORKERS: int = int(os.getenv("TTS_LOCAL_WORKERS", str(os.cpu_count() or 2)))
+    
     # Edge TTS configuration
     # No Auth Required
     TTS_VOICE: str = os.getenv("TTS_VOICE", "en-US-ChristopherNeural")  # Male: Christopher, Female: Aria
+    TTS_RATE: str = os.getenv("TTS_RATE", "+0%")  # edge-tts prosody rate, e.g. "+10%"
+    
+    # Long parts are synthesized as parallel sentence chunks and stitched
+    TTS_CHUNK_CHARS: int = int(os.getenv("TTS_CHUNK_CHARS", "400"))  # 0 disables chunking
+    TTS_MAX_CONNECTIONS: int = int(os.getenv("TTS_MAX_CONNECTIONS", "4"))
+    TTS_CHUNK_PAUSE_MS: int = int(os.getenv("TTS_CHUNK_PAUSE_MS", "350"))  # Silence between chunks
+    
+    # Synthesize multi-part stories in one request and slice it into parts
+    TTS_STORY_LEVEL: bool = os.getenv("TTS_STORY_LEVEL", "false").lower() == "true"
+    
+    # Per-request deadline = base + per-char * len(text); a stream with no chunk
+    # for TTS_STALL_SECONDS is abandoned and retried
+    TTS_DEADLINE_BASE_SECONDS: float = float(os.getenv("TTS_DEADLINE_BASE_SECONDS", "15"))
+    TTS_DEADLINE_PER_CHAR_SECONDS: float = float(os.getenv("TTS_DEADLINE_PER_CHAR_SECONDS", "0.05"))
+    TTS_STALL_SECONDS: float = float(os.getenv("TTS_STALL_SECONDS", "10"))
+    # Send a second request when the first is slower than this latency percentile (0 disables)
+    TTS_HEDGE_PERCENTILE: float = float(os.getenv("TTS_HEDGE_PERCENTILE", "95"))
+    TTS_HEDGE_MIN_SAMPLES: int = int(os.getenv("TTS_HEDGE_MIN_SAMPLES", "20"))
+    
+    # TTS cache (reruns of unchanged parts skip synthesis)
+    TTS_CACHE_DIR: Path = CACHE_DIR / "tts"
+    TTS_CACHE_MAX_MB: int = int(os.getenv("TTS_CACHE_MAX_MB", "1024"))
+    
+    # Silence the speech under each bleep instead of overlaying
+    BLEEP_MUTE_SPEECH: bool = os.getenv("BLEEP_MUTE_SPEECH", "false").lower() == "true"
+    
+    # Pause trimming: silence (below TRIM_SILENCE_DB) between words is
+    # shortened to TRIM_MAX_PAUSE_MS; leading/trailing silence to their own caps
+    TRIM_PAUSES: bool = os.getenv("TRIM_PAUSES", "true").lower() == "true"
+    TRIM_SILENCE_DB: float = float(os.getenv("TRIM_SILENCE_DB", "-45"))
+    TRIM_MAX_PAUSE_MS: int = int(os.getenv("TRIM_MAX_PAUSE_MS", "350"))
+    TRIM_LEAD_MS: int = int(os.getenv("TRIM_LEAD_MS", "100"))
+    TRIM_TAIL_MS: int = int(os.getenv("TRIM_TAIL_MS", "250"))
+    # Parts still over MAX_VIDEO_DURATION_SECONDS are re-synthesized up to this much faster (0 disables)
+    TTS_MAX_TEMPO_UP_PERCENT: int = int(os.getenv("TTS_MAX_TEMPO_UP_PERCENT", "0"))
     
     # FFmpeg Configuration
     # If set, will explicitly tell MoviePy and Pydub where FFmpeg is
@@ -90,8 +136,39 @@ class Settings:
     VIDEO_HEIGHT: int = int(os.getenv("VIDEO_HEIGHT", "1280"))
     VIDEO_FPS: int = int(os.getenv("VIDEO_FPS", "30"))
     VIDEO_BITRATE: str = os.getenv("VIDEO_BITRATE", "2M")
+    # Encoding profile (throughput/size/quality); empty = benchmark winner
+    VIDEO_ENCODING_PROFILE: str = os.getenv("VIDEO_ENCODING_PROFILE", "")
     WATERMARK_TEXT: str = os.getenv("WATERMARK_TEXT", "@YourChannel")
     OUTRO_DURATION_SECONDS: int = int(os.getenv("OUTRO_DURATION_SECONDS", "3"))
+    # Extra formats rendered from the same decode: "name:WxH[:bitrate][:watermark],..."
+    OUTPUT_VARIANTS: str = os.getenv("OUTPUT_VARIANTS", "")
+    
+    # Gameplay library: sources transcoded once to the output size/fps with a
+    # keyframe every GAMEPLAY_GOP_SECONDS (renders then skip crop/scale)
+    GAMEPLAY_INGEST: bool = os.getenv("GAMEPLAY_INGEST", "true").lower() == "true"
+    GAMEPLAY_LIBRARY_DIR: Path = CACHE_DIR / "gameplay"
+    GAMEPLAY_GOP_SECONDS: float = float(os.getenv("GAMEPLAY_GOP_SECONDS", "1.0"))
+    GAMEPLAY_CRF: int = int(os.getenv("GAMEPLAY_CRF", "18"))
+    # Local mezzanine cache budget (LRU) and clips fetched ahead of use
+    GAMEPLAY_CACHE_MAX_MB: int = int(os.getenv("GAMEPLAY_CACHE_MAX_MB", "5120"))
+    GAMEPLAY_PREFETCH: int = int(os.getenv("GAMEPLAY_PREFETCH", "2"))
+    
+    # Render executor: concurrent FFmpeg renders, their nice level and CPU set
+    # (e.g. "2-7" or "0,2,4"; empty = all), and a per-render timeout
+    RENDER_WORKERS: int = int(os.getenv("RENDER_WORKERS", "2"))
+    RENDER_NICE: int = int(os.getenv("RENDER_NICE", "10"))
+    RENDER_CPU_AFFINITY: str = os.getenv("RENDER_CPU_AFFINITY", "")
+    RENDER_TIMEOUT_SECONDS: float = float(os.getenv("RENDER_TIMEOUT_SECONDS", "900"))
+    # Render all parts of a story in one FFmpeg process (shared gameplay decode)
+    RENDER_BATCH_PARTS: bool = os.getenv("RENDER_BATCH_PARTS", "false").lower() == "true"
+    # Split long library renders into GOP-aligned segments encoded in parallel
+    RENDER_PARALLEL_SEGMENTS: bool = os.getenv("RENDER_PARALLEL_SEGMENTS", "false").lower() == "true"
+    RENDER_SEGMENT_THREADS: int = int(os.getenv("RENDER_SEGMENT_THREADS", "4"))
+    RENDER_SEGMENT_MIN_SECONDS: float = float(os.getenv("RENDER_SEGMENT_MIN_SECONDS", "10"))
+    
+    # Censoring
+    # How often workers check the cuss word dictionary version in the DB
+    CUSS_WORDS_REFRESH_SECONDS: int = int(os.getenv("CUSS_WORDS_REFRESH_SECONDS", "60"))
     
     # Subtitle Settings
     SUBTITLE_FONT: str = os.getenv("SUBTITLE_FONT", "DejaVu Sans")
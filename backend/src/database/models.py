@@ -5,7 +5,7 @@ from uuid import UUID, uuid4
 
 from sqlalchemy import (
     Boolean, Column, DateTime, Float, ForeignKey, Integer, String, Text, 
-    ARRAY, Date
+    ARRAY, Date, LargeBinary
 )
 from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
@@ -61,6 +61,8 @@ class StoryPart(Base):
     title: Mapped[Optional[str]] = mapped_column(String(500))
     caption: Mapped[Optional[str]] = mapped_column(Text)
     
+    voice_name: Mapped[Optional[str]] = mapped_column(String(100))
+    
     status: Mapped[str] = mapped_column(String(50), default="pending")
     error_message: Mapped[Optional[str]] = mapped_column(Text)
     retry_count: Mapped[int] = mapped_column(Integer, default=0)
@@ -84,6 +86,9 @@ class AudioFile(Base):
     
     character_count: Mapped[Optional[int]] = mapped_column(Integer)
     has_bleep_sounds: Mapped[bool] = mapped_column(Boolean, default=False)
+    tempo_factor: Mapped[float] = mapped_column(Float, default=1.0)
+    # Packed WordTimings blob (float32 starts/ends + word table), see generators/word_timings.py
+    word_timings: Mapped[Optional[bytes]] = mapped_column(LargeBinary)
     
     status: Mapped[str] = mapped_column(String(50), default="generated")
     
@@ -100,6 +105,8 @@ class Video(Base):
     audio_file_id: Mapped[Optional[UUID]] = mapped_column(ForeignKey("audio_files.id"))
     
     filename: Mapped[str] = mapped_column(String(255), nullable=False)
+    # Output format ("default" = VIDEO_WIDTH x VIDEO_HEIGHT, else an OUTPUT_VARIANTS name)
+    variant: Mapped[str] = mapped_column(String(30), default="default")
     local_path: Mapped[Optional[str]] = mapped_column(String(500))
     drive_file_id: Mapped[Optional[str]] = mapped_column(String(100))
     drive_download_url: Mapped[Optional[str]] = mapped_column(String(500))
@@ -112,6 +119,12 @@ class Video(Base):
     
     gameplay_filename: Mapped[Optional[str]] = mapped_column(String(255))
     
+    # Final FFmpeg encode stats (sizing render workers per profile/source)
+    encode_preset: Mapped[Optional[str]] = mapped_column(String(20))
+    encode_seconds: Mapped[Optional[float]] = mapped_column(Float)
+    encode_fps: Mapped[Optional[float]] = mapped_column(Float)
+    encode_speed: Mapped[Optional[float]] = mapped_column(Float)
+    
     status: Mapped[str] = mapped_column(String(50), default="generated")
     error_message: Mapped[Optional[str]] = mapped_column(Text)
     
@@ -212,11 +225,23 @@ class GameplayVideo(Base):
     filename: Mapped[str] = mapped_column(String(255), nullable=False)
     duration_seconds: Mapped[Optional[float]] = mapped_column(Float)
     file_size_bytes: Mapped[Optional[int]] = mapped_column(Integer)
+    source_md5: Mapped[Optional[str]] = mapped_column(String(32))
     
     is_active: Mapped[bool] = mapped_column(Boolean, default=True)
     usage_count: Mapped[int] = mapped_column(Integer, default=0)
     last_used_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
     
+    # Normalized mezzanine (output size/fps, fixed GOP) produced by the ingest step
+    mezzanine_path: Mapped[Optional[str]] = mapped_column(String(500))
+    mezzanine_sha256: Mapped[Optional[str]] = mapped_column(String(64))
+    mezzanine_mtime: Mapped[Optional[float]] = mapped_column(Float)
+    width: Mapped[Optional[int]] = mapped_column(Integer)
+    height: Mapped[Optional[int]] = mapped_column(Integer)
+    fps: Mapped[Optional[float]] = mapped_column(Float)
+    keyframe_times: Mapped[Optional[List[float]]] = mapped_column(ARRAY(Float))
+    recent_offsets: Mapped[Optional[List[float]]] = mapped_column(ARRAY(Float))
+    ingested_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    
     synced_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=func.now())
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=func.now())
 
@@ -239,12 +264,39 @@ class DailyStatistic(Base):
     upload_failures: Mapped[int] = mapped_column(Integer, default=0)
     
     gemini_requests: Mapped[int] = mapped_column(Integer, default=0)
+    llm_prompt_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    llm_completion_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    llm_latency_ms: Mapped[float] = mapped_column(Float, default=0)
+    llm_cost_usd: Mapped[float] = mapped_column(Float, default=0)
     tts_characters: Mapped[int] = mapped_column(Integer, default=0)
     youtube_quota_used: Mapped[int] = mapped_column(Integer, default=0)
     
     created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=func.now())
     updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
 
+class LlmUsage(Base):
+    __tablename__ = "llm_usage"
+
+    id: Mapped[UUID] = mapped_column(PG_UUID(as_uuid=True), primary_key=True, default=uuid4)
+    processing_job_id: Mapped[Optional[UUID]] = mapped_column(ForeignKey("processing_jobs.id", ondelete="SET NULL"))
+    
+    provider: Mapped[str] = mapped_column(String(50), nullable=False)
+    model: Mapped[str] = mapped_column(String(100), nullable=False)
+    prompt_name: Mapped[str] = mapped_column(String(100), nullable=False)
+    
+    prompt_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    completion_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    cached_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    latency_ms: Mapped[float] = mapped_column(Float, default=0)
+    retry_count: Mapped[int] = mapped_column(Integer, default=0)
+    cache_hit: Mapped[bool] = mapped_column(Boolean, default=False)
+    cost_usd: Mapped[float] = mapped_column(Float, default=0)
+    
+    status: Mapped[str] = mapped_column(String(50), default="success")
+    error_message: Mapped[Optional[str]] = mapped_column(Text)
+    
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), default=func.now())
+
 class AppSettings(Base):
     __tablename__ = "settings"
 
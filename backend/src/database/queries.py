@@ -1,16 +1,16 @@
 
 from datetime import datetime, date
-from typing import List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from uuid import UUID
 
-from sqlalchemy import select, update, func, delete, text
+from sqlalchemy import select, update, func, delete, text, cast, case, Integer, Text
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.orm import joinedload
 
 from src.database.models import (
-    Story, StoryPart, Video, ProcessingJob, DailyStatistic, 
-    CussWord, GameplayVideo, YoutubeUploadQueue, EmailLog, AppSettings
+    Story, StoryPart, Video, AudioFile, ProcessingJob, DailyStatistic, 
+    CussWord, GameplayVideo, YoutubeUploadQueue, EmailLog, AppSettings, LlmUsage
 )
 from src.utils.logger import logger
 
@@ -68,6 +68,40 @@ class DBQueries:
         )
         return list(result.scalars().all())
 
+    async def get_part_audio(self, story_part_id: UUID) -> Optional[AudioFile]:
+        """
+        Latest narration generated for a part but not used in a video yet
+        (its local file and packed word timings can be reused on retry).
+        """
+        result = await self.session.execute(
+            select(AudioFile)
+            .where(AudioFile.story_part_id == story_part_id)
+            .where(AudioFile.status == "generated")
+            .where(AudioFile.local_path.is_not(None))
+            .where(AudioFile.word_timings.is_not(None))
+            .order_by(AudioFile.created_at.desc())
+            .limit(1)
+        )
+        return result.scalars().first()
+
+    async def get_voice_duration_samples(self, limit: int = 2000) -> List[Tuple[str, int, float]]:
+        """
+        Recent (voice_name, character_count, duration_seconds) rows for the
+        duration model. Durations are normalized to normal tempo.
+        """
+        result = await self.session.execute(
+            select(
+                AudioFile.voice_name,
+                AudioFile.character_count,
+                AudioFile.duration_seconds * func.coalesce(AudioFile.tempo_factor, 1.0)
+            )
+            .where(AudioFile.voice_name.is_not(None))
+            .where(AudioFile.character_count > 0)
+            .order_by(AudioFile.created_at.desc())
+            .limit(limit)
+        )
+        return [tuple(row) for row in result.all()]
+
     async def get_active_gameplay_videos(self) -> List[GameplayVideo]:
         result = await self.session.execute(
             select(GameplayVideo)
@@ -76,15 +110,98 @@ class DBQueries:
         )
         return list(result.scalars().all())
 
+    async def sync_gameplay_listing(self, files: List[Dict[str, Any]]) -> None:
+        """
+        Mirror a Drive folder listing into gameplay_videos: new files get a
+        row, known ones are refreshed (a changed md5 drops the stale
+        mezzanine so it is fetched again) and files gone from Drive are
+        deactivated.
+        """
+        now = datetime.now()
+        if files:
+            stmt = insert(GameplayVideo).values([
+                {
+                    "drive_file_id": f["id"],
+                    "filename": f["name"],
+                    "source_md5": f.get("md5Checksum"),
+                    "is_active": True,
+                    "synced_at": now,
+                }
+                for f in files
+            ])
+            changed = GameplayVideo.source_md5.is_distinct_from(stmt.excluded.source_md5)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[GameplayVideo.drive_file_id],
+                set_={
+                    "filename": stmt.excluded.filename,
+                    "source_md5": stmt.excluded.source_md5,
+                    "is_active": True,
+                    "synced_at": stmt.excluded.synced_at,
+                    "mezzanine_path": case((changed, None), else_=GameplayVideo.mezzanine_path),
+                }
+            )
+            await self.session.execute(stmt)
+        await self.session.execute(
+            update(GameplayVideo)
+            .where(GameplayVideo.drive_file_id.not_in([f["id"] for f in files]))
+            .values(is_active=False)
+        )
+
+    async def upsert_gameplay_video(self, data: Dict[str, Any]) -> None:
+        """Insert or refresh a gameplay video row, keyed by drive_file_id."""
+        stmt = insert(GameplayVideo).values(**data)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[GameplayVideo.drive_file_id],
+            set_={k: stmt.excluded[k] for k in data if k != "drive_file_id"}
+        )
+        await self.session.execute(stmt)
+
+    async def clear_gameplay_mezzanine(self, drive_file_id: str) -> None:
+        """Forget an evicted or corrupt local mezzanine (the row and usage stay)."""
+        await self.session.execute(
+            update(GameplayVideo)
+            .where(GameplayVideo.drive_file_id == drive_file_id)
+            .values(mezzanine_path=None, mezzanine_sha256=None, mezzanine_mtime=None)
+        )
+
+    async def mark_gameplay_used(self, gameplay_id: UUID) -> None:
+        await self.session.execute(
+            update(GameplayVideo)
+            .where(GameplayVideo.id == gameplay_id)
+            .values(usage_count=GameplayVideo.usage_count + 1, last_used_at=func.now())
+        )
+
     async def update_daily_stats(self, field: str, increment: int = 1) -> None:
         """Increment daily statistic safely."""
+        await self.increment_daily_stats({field: increment})
+
+    async def increment_daily_stats(self, increments: Dict[str, float]) -> None:
+        """Increment several daily statistics in a single upsert."""
+        if not increments:
+            return
         today = date.today()
-        stmt = insert(DailyStatistic).values(date=today).on_conflict_do_update(
+        columns = DailyStatistic.__table__.c
+        stmt = insert(DailyStatistic).values(date=today, **increments).on_conflict_do_update(
             index_elements=['date'],
-            set_={field: DailyStatistic.__table__.c[field] + increment}
+            set_={field: columns[field] + value for field, value in increments.items()}
         )
         await self.session.execute(stmt)
 
+    async def record_llm_usage(self, calls: List[dict], job_id: Optional[UUID] = None) -> None:
+        """
+        Persist LLM call records and roll them up into today's counters.
+        """
+        if not calls:
+            return
+        self.session.add_all([LlmUsage(processing_job_id=job_id, **call) for call in calls])
+        await self.increment_daily_stats({
+            "gemini_requests": len(calls),
+            "llm_prompt_tokens": sum(c["prompt_tokens"] for c in calls),
+            "llm_completion_tokens": sum(c["completion_tokens"] for c in calls),
+            "llm_latency_ms": sum(c["latency_ms"] for c in calls),
+            "llm_cost_usd": sum(c["cost_usd"] for c in calls),
+        })
+
     async def create_processing_job(self, job_type: str) -> ProcessingJob:
         job = ProcessingJob(job_type=job_type, status="started")
         self.session.add(job)
@@ -102,16 +219,55 @@ class DBQueries:
         result = await self.session.execute(select(CussWord.word))
         return list(result.scalars().all())
 
+    async def get_cuss_words_since(self, since: Optional[datetime] = None) -> List[Tuple[str, datetime]]:
+        """(word, created_at) rows, optionally only those added after `since`."""
+        stmt = select(CussWord.word, CussWord.created_at)
+        if since is not None:
+            stmt = stmt.where(CussWord.created_at > since)
+        result = await self.session.execute(stmt)
+        return [tuple(row) for row in result.all()]
+
+    async def count_cuss_words(self) -> int:
+        result = await self.session.execute(select(func.count()).select_from(CussWord))
+        return result.scalar_one()
+
     async def bulk_add_cuss_words(self, words: List[str]) -> int:
-        count = 0
-        for word in words:
-            word = word.lower().strip()
-            stmt = insert(CussWord).values(word=word, replacement="****").on_conflict_do_nothing()
-            result = await self.session.execute(stmt)
-            if result.rowcount > 0:
-                count += 1
+        """
+        Insert words in a single multi-row statement.
+        Bumps the dictionary version when anything new was added.
+        """
+        unique_words = list(dict.fromkeys(w.lower().strip() for w in words if w and w.strip()))
+        if not unique_words:
+            return 0
+        
+        stmt = (
+            insert(CussWord)
+            .values([{"word": w, "replacement": "****"} for w in unique_words])
+            .on_conflict_do_nothing()
+            .returning(CussWord.id)
+        )
+        result = await self.session.execute(stmt)
+        count = len(result.all())
+        
+        if count:
+            await self.bump_setting_version("cuss_words_version")
         return count
 
+    async def get_setting(self, key: str) -> Optional[str]:
+        result = await self.session.execute(
+            select(AppSettings.value).where(AppSettings.key == key)
+        )
+        return result.scalars().first()
+
+    async def bump_setting_version(self, key: str) -> int:
+        """Atomically increment an integer setting, creating it at 1."""
+        stmt = insert(AppSettings).values(key=key, value="1").on_conflict_do_update(
+            index_elements=['key'],
+            set_={"value": cast(cast(AppSettings.value, Integer) + 1, Text)}
+        ).returning(AppSettings.value)
+        result = await self.session.execute(stmt)
+        return int(result.scalar_one())
+
     async def get_youtube_queue(self, limit: int = 6) -> List[YoutubeUploadQueue]:
         result = await self.session.execute(
              select(YoutubeUploadQueue)
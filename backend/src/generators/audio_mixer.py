@@ -1,84 +1,92 @@
 
-from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
 from pydub import AudioSegment
 
 from src.config import settings
 from src.utils.logger import logger
 from src.processors.censor import censor_engine
+from src.generators.word_aligner import word_aligner
+from src.generators.sound_bank import FADE_MS, sound_bank
 
 class AudioMixer:
     def __init__(self):
-        self.bleep_path = settings.ASSETS_DIR / "bleep.mp3"
-        self._bleep_sound = None
+        # Bleeps come pre-rendered in the speech format (assets/bleep.* or a 1kHz tone)
+        self.sound_bank = sound_bank
         
         # Configure FFmpeg path for pydub if provided
         if settings.FFMPEG_PATH:
             logger.info(f"Setting Pydub FFmpeg converter to: {settings.FFMPEG_PATH}")
             AudioSegment.converter = settings.FFMPEG_PATH
 
-    def _load_bleep(self):
-        if not self._bleep_sound:
-            if self.bleep_path.exists():
-                self._bleep_sound = AudioSegment.from_mp3(str(self.bleep_path))
-            else:
-                # Fallback: Sine wave if file missing
-                from pydub.generators import Sine
-                self._bleep_sound = Sine(1000).to_audio_segment(duration=300).apply_gain(-5)
-
-    async def mix_audio(self, story_content: str, tts_audio_path: str, word_timings: list) -> str:
+    async def mix_audio(
+        self, 
+        story_content: str, 
+        tts_audio_path: str, 
+        word_timings: list, 
+        bleep_intervals: Optional[List[Tuple[float, float]]] = None,
+        audio: Optional[Tuple[np.ndarray, int]] = None
+    ) -> Optional[Tuple[np.ndarray, int]]:
         """
         Insert bleep sounds at cuss word locations.
-        Overwrite the original audio file with mixed version.
-        Returns path to mixed audio.
+        bleep_intervals are (start_sec, end_sec) pairs from WordAligner; when
+        omitted they are computed from story_content and word_timings.
+        audio is already-decoded (samples, sample_rate) (e.g. pause-trimmed);
+        otherwise the TTS file is decoded once. The mix stays in memory (PCM)
+        for the video encoder; nothing is re-encoded to MP3.
+        Returns the mixed (samples, sample_rate), or the given audio / None
+        (TTS file usable as-is) when there is nothing to bleep.
         """
-        self._load_bleep()
-        
-        original_audio = AudioSegment.from_mp3(tts_audio_path)
-        mixed_audio = original_audio
-        
-        # Find cuss words to bleep
-        bleep_words = await censor_engine.get_bleep_locations(story_content)
+        if bleep_intervals is None:
+            bleep_words = await censor_engine.get_bleep_locations(story_content)
+            spans = [(b["start"], b["end"]) for b in bleep_words]
+            bleep_intervals, _ = word_aligner.bleep_intervals(story_content, spans, word_timings)
         
-        # Match censor locations to word timings
-        # This is heuristic: we assume 'get_bleep_locations' returns word list
-        # and 'word_timings' has matching sequence.
+        if not bleep_intervals:
+            return audio
         
-        # We need to map the words. Since censoring replaced chars with '*',
-        # we check the text content. Wait, `story_content` passed here 
-        # should be the *original* uncensored text for detection, 
-        # OR `story_content` is censored text and we check for asterisks?
-        # The `tts_generator` receives CENSORED text (from story processor). 
-        # So TTS pronounces "star star star star".
-        # We want to overlay bleep on that.
+        if audio is None:
+            segment = AudioSegment.from_mp3(tts_audio_path)
+            audio = (pcm_to_float(segment), segment.frame_rate)
+        return self.mix(audio[0], audio[1], bleep_intervals)
+
+    def mix(self, samples: np.ndarray, rate: int, bleep_intervals: List[Tuple[float, float]]) -> Tuple[np.ndarray, int]:
+        """
+        Apply all bleeps in place to float32 samples shaped (frames, channels).
+        Each bleep is a ready-made buffer from the sound bank (covering the
+        word, min 200ms, tapered) added with a slice write; with
+        BLEEP_MUTE_SPEECH the speech under it is faded out.
+        Returns (float32 samples shaped (frames, channels) in [-1, 1], sample_rate),
+        ready for the video encoder.
+        """
+        channels = samples.shape[1]
+        fade = max(1, rate * FADE_MS // 1000)
+        total = len(samples)
         
-        bleep_indices = []
-        words = story_content.split()
-        for i, word in enumerate(words):
-            if "****" in word or "*" * len(word) in word:
-                bleep_indices.append(i)
+        for start, end in bleep_intervals:
+            first = int(start * rate)
+            bleep = self.sound_bank.get("bleep", end - start, rate, channels)
+            length = min(len(bleep), total - first)
+            if first < 0 or length <= 0:
+                continue
+            
+            window = samples[first:first + length]
+            if settings.BLEEP_MUTE_SPEECH:
+                envelope = np.ones(length, dtype=np.float32)
+                ramp = min(fade, length // 2)
+                envelope[:ramp] = np.linspace(0, 1, ramp, endpoint=False, dtype=np.float32)
+                envelope[length - ramp:] = envelope[:ramp][::-1]
+                window *= (1 - envelope)[:, None]
+            window += bleep[:length]
         
-        # Overlay bleeps
-        for idx in bleep_indices:
-            if idx < len(word_timings):
-                timing = word_timings[idx]
-                start_ms = int(timing["start"] * 1000)
-                end_ms = int(timing["end"] * 1000)
-                duration_ms = end_ms - start_ms
-                
-                # Resize bleep to fit word duration (min 200ms)
-                bleep_dur = max(200, duration_ms)
-                bleep_segment = self._bleep_sound[:bleep_dur]
-                
-                # Overlay (mute original section + overlay bleep)
-                # Muting original is effectively done since it's just silence/unintelligible "asterisk"
-                # But creating a clean censor: 
-                # Crossfade or just overlay? Overlay is simpler.
-                
-                mixed_audio = mixed_audio.overlay(bleep_segment, position=start_ms)
+        np.clip(samples, -1.0, 1.0, out=samples)
+        return samples, rate
 
-        # Export over original
-        mixed_audio.export(tts_audio_path, format="mp3")
-        return tts_audio_path
+def pcm_to_float(audio: AudioSegment) -> np.ndarray:
+    """AudioSegment -> float32 array shaped (frames, channels) in [-1, 1]."""
+    samples = np.array(audio.get_array_of_samples(), dtype=np.float32)
+    return samples.reshape(-1, audio.channels) / float(1 << (8 * audio.sample_width - 1))
 
 # Global instance
 audio_mixer = AudioMixer()
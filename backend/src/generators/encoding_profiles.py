@@ -0,0 +1,85 @@
+import json
+import re
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from src.config import settings
+from src.utils.logger import logger
+
+# Named x264 settings for the final render. crf is the quality target;
+# maxrate (VIDEO_BITRATE when "video_bitrate") caps spikes for upload size.
+# threads 0 = FFmpeg picks per core count.
+ENCODING_PROFILES: Dict[str, Dict] = {
+    "throughput": {"preset": "ultrafast", "crf": 23, "maxrate": None, "threads": 0, "tune": "fastdecode"},
+    "size": {"preset": "medium", "crf": 28, "maxrate": "video_bitrate", "threads": 0, "tune": None},
+    "quality": {"preset": "slow", "crf": 18, "maxrate": None, "threads": 0, "tune": "film"},
+}
+
+DEFAULT_PROFILE = "throughput"
+
+def codec_args(name: str, maxrate: Optional[str] = None) -> List[str]:
+    """FFmpeg video encoder arguments for a profile (maxrate overrides its cap)."""
+    profile = ENCODING_PROFILES[name]
+    args = ["-c:v", "libx264", "-preset", profile["preset"], "-crf", str(profile["crf"])]
+    if not maxrate and profile["maxrate"]:
+        maxrate = settings.VIDEO_BITRATE if profile["maxrate"] == "video_bitrate" else profile["maxrate"]
+    if maxrate:
+        args += ["-maxrate", maxrate, "-bufsize", _double_rate(maxrate)]
+    if profile["tune"]:
+        args += ["-tune", profile["tune"]]
+    if profile["threads"]:
+        args += ["-threads", str(profile["threads"])]
+    return args + ["-pix_fmt", "yuv420p"]
+
+def _double_rate(rate: str) -> str:
+    """"2M" -> "4M" (VBV buffer of two seconds at maxrate)."""
+    match = re.fullmatch(r"([\d.]+)([kKmM]?)", rate.strip())
+    if not match:
+        return rate
+    return f"{float(match.group(1)) * 2:g}{match.group(2)}"
+
+def benchmark_path() -> Path:
+    return settings.CACHE_DIR / "encoding_benchmark.json"
+
+def default_profile() -> str:
+    """
+    VIDEO_ENCODING_PROFILE if set, else the winner recorded by
+    benchmark_encoding.py on this machine, else DEFAULT_PROFILE.
+    """
+    if settings.VIDEO_ENCODING_PROFILE:
+        if settings.VIDEO_ENCODING_PROFILE in ENCODING_PROFILES:
+            return settings.VIDEO_ENCODING_PROFILE
+        logger.warning(f"Unknown VIDEO_ENCODING_PROFILE {settings.VIDEO_ENCODING_PROFILE!r}, using {DEFAULT_PROFILE}")
+        return DEFAULT_PROFILE
+    try:
+        winner = json.loads(benchmark_path().read_text(encoding="utf-8"))["winner"]
+        if winner in ENCODING_PROFILES:
+            return winner
+    except (OSError, ValueError, KeyError):
+        pass
+    return DEFAULT_PROFILE
+
+def pick_winner(results: Dict[str, Dict], min_ssim: float) -> Optional[str]:
+    """
+    Fastest profile (encode fps) whose SSIM meets min_ssim; smaller output
+    breaks ties. None if no profile qualifies.
+    """
+    qualified = [(name, r) for name, r in results.items() if r.get("ssim") is not None and r["ssim"] >= min_ssim]
+    if not qualified:
+        return None
+    return max(qualified, key=lambda item: (item[1]["fps"], -item[1]["bytes"]))[0]
+
+def record_winner(results: Dict[str, Dict], winner: str) -> None:
+    path = benchmark_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps({"winner": winner, "results": results}, indent=2), encoding="utf-8")
+
+def parse_ssim(stderr: str) -> Optional[float]:
+    """Overall SSIM from the ssim filter's summary line ("... All:0.987654 (19.1)")."""
+    matches = re.findall(r"SSIM .*?All:([\d.]+)", stderr)
+    return float(matches[-1]) if matches else None
+
+def parse_vmaf(stderr: str) -> Optional[float]:
+    """Pooled score from libvmaf's summary line ("VMAF score: 95.12")."""
+    matches = re.findall(r"VMAF score[:=]\s*([\d.]+)", stderr)
+    return float(matches[-1]) if matches else None
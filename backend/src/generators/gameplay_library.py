@@ -0,0 +1,419 @@
+import asyncio
+import json
+import math
+import os
+import random
+import time
+from collections import deque
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.config import settings
+from src.generators.output_variants import mezzanine_size
+from src.utils.helpers import file_checksum
+from src.utils.logger import logger
+from src.utils.metrics import metrics
+
+# Start offsets remembered per gameplay video (to spread out reuse)
+RECENT_OFFSETS = 8
+
+class GameplayLibrary:
+    """
+    Gameplay sources transcoded once into "mezzanine" files at the output
+    frame rate and the largest output size (720x1280@30 by default, larger
+    when OUTPUT_VARIANTS need it, see mezzanine_size) with short fixed GOPs
+    and no audio. Probe metadata (duration, size, keyframe times) is stored in
+    gameplay_videos, so per-part renders skip crop/scale, start at a random
+    keyframe (input-side seek, nothing decoded before it) and chain short
+    sources with the concat demuxer instead of looping.
+
+    The local directory is a checksummed LRU cache over the whole Drive
+    folder: sync() mirrors the full listing into gameplay_videos, selection
+    favours the least used / longest unused clips, the next ones are
+    prefetched in the background while a part renders, and the least
+    recently used mezzanines are evicted beyond GAMEPLAY_CACHE_MAX_MB.
+    """
+
+    def __init__(self, library_dir: Path = None, max_bytes: int = None):
+        self.library_dir = Path(library_dir or settings.GAMEPLAY_LIBRARY_DIR)
+        self.max_bytes = max_bytes if max_bytes is not None else settings.GAMEPLAY_CACHE_MAX_MB * 1024 * 1024
+        # Mezzanines handed to recent renders are never evicted under them
+        self._recent_paths = deque(maxlen=max(1, settings.RENDER_WORKERS) * 4)
+        self._prefetch_task: Optional[asyncio.Task] = None
+        # In-flight ingests by Drive file id, shared by concurrent callers
+        self._ingests: Dict[str, asyncio.Task] = {}
+
+    def transcode_command(self, source_path: str, output_path: str) -> List[str]:
+        (width, height), fps = mezzanine_size(), settings.VIDEO_FPS
+        gop = max(1, round(fps * settings.GAMEPLAY_GOP_SECONDS))
+        return [
+            settings.FFMPEG_PATH or "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+            "-i", source_path,
+            "-an",
+            "-vf", (
+                f"crop=w=min(iw\\,ih*{width}/{height}):h=min(ih\\,iw*{height}/{width}),"
+                f"scale={width}:{height},setsar=1,fps={fps}"
+            ),
+            "-c:v", "libx264", "-preset", "medium", "-crf", str(settings.GAMEPLAY_CRF),
+            "-pix_fmt", "yuv420p",
+            # Fixed GOP: a keyframe every GAMEPLAY_GOP_SECONDS, none added at scene cuts
+            "-g", str(gop), "-keyint_min", str(gop), "-sc_threshold", "0",
+            "-movflags", "+faststart",
+            output_path
+        ]
+
+    @staticmethod
+    def probe_command(path: str) -> List[str]:
+        ffprobe = "ffprobe"
+        if settings.FFMPEG_PATH:
+            ffprobe = str(Path(settings.FFMPEG_PATH).with_name("ffprobe" + Path(settings.FFMPEG_PATH).suffix))
+        return [
+            ffprobe, "-v", "error", "-select_streams", "v:0",
+            "-skip_frame", "nokey", "-show_frames",
+            "-show_entries", "frame=pts_time:stream=width,height,avg_frame_rate:format=duration,size",
+            "-of", "json", path
+        ]
+
+    @staticmethod
+    def parse_probe(output: str) -> Dict:
+        """ffprobe JSON -> gameplay_videos columns."""
+        data = json.loads(output)
+        stream = data["streams"][0]
+        num, _, den = stream.get("avg_frame_rate", "0/1").partition("/")
+        fps = float(num) / float(den or 1) if float(den or 1) else None
+        keyframes = sorted(
+            round(float(frame["pts_time"]), 3) for frame in data.get("frames", []) if "pts_time" in frame
+        )
+        return {
+            "duration_seconds": float(data["format"]["duration"]),
+            "file_size_bytes": int(data["format"]["size"]),
+            "width": int(stream["width"]),
+            "height": int(stream["height"]),
+            "fps": fps,
+            "keyframe_times": keyframes,
+        }
+
+    async def _run(self, cmd: List[str]) -> bytes:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            out, err = await proc.communicate()
+        except asyncio.CancelledError:
+            # Don't leave a transcode running while the caller deletes its files
+            proc.kill()
+            await proc.wait()
+            raise
+        if proc.returncode != 0:
+            raise RuntimeError(f"{Path(cmd[0]).name} failed ({proc.returncode}): {err.decode(errors='replace').strip()[-2000:]}")
+        return out
+
+    async def ingest(self, drive_file: Dict) -> Dict:
+        """
+        Download, transcode, probe and record one Drive gameplay file.
+        Concurrent calls for the same file (a background prefetch and a
+        sync) share one ingest instead of writing the same paths.
+        """
+        file_id = drive_file["id"]
+        task = self._ingests.get(file_id)
+        if task is None:
+            task = asyncio.ensure_future(self._ingest(drive_file))
+            self._ingests[file_id] = task
+
+            def done(finished: asyncio.Task) -> None:
+                self._ingests.pop(file_id, None)
+                if not finished.cancelled():
+                    finished.exception()  # Retrieved even if every caller was cancelled
+            task.add_done_callback(done)
+        return await asyncio.shield(task)
+
+    async def _ingest(self, drive_file: Dict) -> Dict:
+        from src.database.connection import get_db_session
+        from src.database.queries import DBQueries
+        from src.uploaders.drive_uploader import drive_uploader
+
+        self.library_dir.mkdir(parents=True, exist_ok=True)
+        source_path = self.library_dir / f"{drive_file['id']}.{os.getpid()}.source"
+        output_path = self.library_dir / f"{drive_file['id']}.mp4"
+        tmp_output = self.library_dir / f"{drive_file['id']}.{os.getpid()}.tmp.mp4"
+
+        try:
+            logger.info(f"Ingesting gameplay {drive_file['name']} ({drive_file['id']})")
+            await drive_uploader.download_file(drive_file["id"], str(source_path))
+            expected = drive_file.get("md5Checksum")
+            if expected and await asyncio.to_thread(file_checksum, source_path, "md5") != expected:
+                metrics.increment("gameplay.checksum_failures")
+                raise RuntimeError("download does not match Drive md5Checksum")
+            await self._run(self.transcode_command(str(source_path), str(tmp_output)))
+            os.replace(tmp_output, output_path)
+            meta = self.parse_probe((await self._run(self.probe_command(str(output_path)))).decode())
+            sha256 = await asyncio.to_thread(file_checksum, output_path)
+        finally:
+            for path in (source_path, tmp_output):
+                path.unlink(missing_ok=True)
+
+        row = {
+            "drive_file_id": drive_file["id"],
+            "filename": drive_file["name"],
+            "source_md5": drive_file.get("md5Checksum"),
+            "mezzanine_path": str(output_path),
+            "mezzanine_sha256": sha256,
+            "mezzanine_mtime": output_path.stat().st_mtime,
+            "is_active": True,
+            "ingested_at": datetime.now(timezone.utc),
+            "synced_at": datetime.now(timezone.utc),
+            **meta,
+        }
+        async with get_db_session() as session:
+            await DBQueries(session).upsert_gameplay_video(row)
+        metrics.increment("gameplay.ingested")
+        logger.info(
+            f"Gameplay {drive_file['name']} ready: {meta['duration_seconds']:.0f}s, "
+            f"{meta['width']}x{meta['height']}, {len(meta['keyframe_times'])} keyframes"
+        )
+        return row
+
+    async def sync(self) -> int:
+        """
+        Mirror the full Drive listing into gameplay_videos, drop local
+        mezzanines that fail verification or are not at mezzanine_size()
+        (OUTPUT_VARIANTS changed), evict to the size budget and
+        fetch the next GAMEPLAY_PREFETCH clips. Returns how many were ingested.
+        """
+        from src.database.connection import get_db_session
+        from src.database.queries import DBQueries
+        from src.uploaders.drive_uploader import drive_uploader
+
+        try:
+            drive_files = await drive_uploader.list_gameplay_videos()
+            async with get_db_session() as session:
+                queries = DBQueries(session)
+                if drive_files:
+                    # An empty listing is more likely an auth/API problem than an empty folder
+                    await queries.sync_gameplay_listing(drive_files)
+                for video in await queries.get_active_gameplay_videos():
+                    if not video.mezzanine_path:
+                        continue
+                    if (video.width, video.height) != mezzanine_size():
+                        logger.info(f"Dropping gameplay mezzanine {video.mezzanine_path} at {video.width}x{video.height}; "
+                                    "it will be fetched again at the current size")
+                    elif not await self._verify(video):
+                        logger.warning(f"Dropping corrupt gameplay mezzanine {video.mezzanine_path}")
+                        metrics.increment("gameplay.checksum_failures")
+                    else:
+                        continue
+                    Path(video.mezzanine_path).unlink(missing_ok=True)
+                    await queries.clear_gameplay_mezzanine(video.drive_file_id)
+        except Exception as e:
+            logger.warning(f"Gameplay library sync skipped: {e}")
+            return 0
+
+        await self.evict()
+        return await self.prefetch()
+
+    @staticmethod
+    async def _verify(video) -> bool:
+        """
+        Local mezzanine exists and is unchanged. Size and mtime matching the
+        row is enough; otherwise the file is re-hashed (off the event loop)
+        against its recorded sha256, and the new mtime kept if it matches.
+        """
+        try:
+            stat = os.stat(video.mezzanine_path)
+        except OSError:
+            return False
+        if stat.st_size == video.file_size_bytes and stat.st_mtime == video.mezzanine_mtime:
+            return True
+        if video.mezzanine_sha256:
+            if await asyncio.to_thread(file_checksum, video.mezzanine_path) != video.mezzanine_sha256:
+                return False
+        video.mezzanine_mtime = stat.st_mtime
+        return True
+
+    @staticmethod
+    def usage_rank(video) -> Tuple[int, float]:
+        """Sort key: fewest uses first, then longest since last use."""
+        last_used = video.last_used_at.timestamp() if video.last_used_at else 0.0
+        return (video.usage_count or 0, last_used)
+
+    def choose_balanced(self, videos: List, rng: random.Random = random):
+        """Random pick among the least used quarter of videos."""
+        ranked = sorted(videos, key=self.usage_rank)
+        return rng.choice(ranked[:max(1, math.ceil(len(ranked) / 4))])
+
+    async def prefetch(self, count: int = None) -> int:
+        """
+        Ingest the `count` least used active clips that are not local yet
+        (the ones selection will want next), then evict to budget.
+        Returns how many were ingested.
+        """
+        from src.database.connection import get_db_session
+        from src.database.queries import DBQueries
+
+        count = settings.GAMEPLAY_PREFETCH if count is None else count
+        try:
+            async with get_db_session() as session:
+                videos = await DBQueries(session).get_active_gameplay_videos()
+        except Exception as e:
+            logger.warning(f"Gameplay prefetch skipped: {e}")
+            return 0
+
+        missing = sorted(
+            (v for v in videos if not (v.mezzanine_path and os.path.exists(v.mezzanine_path))),
+            key=self.usage_rank
+        )
+        added = 0
+        for video in missing[:count]:
+            try:
+                await self.ingest({"id": video.drive_file_id, "name": video.filename, "md5Checksum": video.source_md5})
+                added += 1
+            except Exception as e:
+                logger.error(f"Failed to ingest gameplay {video.filename}: {e}")
+        if added:
+            await self.evict()
+        return added
+
+    def schedule_prefetch(self) -> None:
+        """Start a background prefetch unless one is already running."""
+        if self._prefetch_task is None or self._prefetch_task.done():
+            self._prefetch_task = asyncio.create_task(self.prefetch())
+
+    async def evict(self) -> int:
+        """
+        Delete least recently used mezzanines (by atime, refreshed on each
+        pick) until the library fits max_bytes. Returns how many were removed.
+        """
+        from src.database.connection import get_db_session
+        from src.database.queries import DBQueries
+
+        entries = []
+        total = 0
+        for path in self.library_dir.glob("*.mp4"):
+            if ".tmp" in path.suffixes:
+                continue
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_atime, path, stat.st_size))
+            total += stat.st_size
+
+        removed = []
+        for _, path, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if str(path) in self._recent_paths:
+                continue
+            path.unlink(missing_ok=True)
+            removed.append(path.stem)
+            total -= size
+            metrics.increment("gameplay.evictions")
+        metrics.set("gameplay.cache_bytes", total)
+
+        if removed:
+            try:
+                async with get_db_session() as session:
+                    queries = DBQueries(session)
+                    for drive_file_id in removed:
+                        await queries.clear_gameplay_mezzanine(drive_file_id)
+            except Exception as e:
+                logger.warning(f"Could not record gameplay evictions: {e}")
+        return len(removed)
+
+    @staticmethod
+    def choose_offset(
+        keyframes: List[float], source_duration: float, needed: float,
+        recent: List[float], rng: random.Random = random
+    ) -> float:
+        """
+        Random keyframe to start at. Only keyframes leaving `needed` seconds
+        before the end qualify (the first keyframe if none do); when recent
+        starts are known, the pick is among the quarter of candidates
+        farthest from all of them, so consecutive videos look different.
+        """
+        keyframes = np.asarray(keyframes or [0.0], dtype=np.float64)
+        candidates = keyframes[keyframes + needed <= source_duration]
+        if not len(candidates):
+            return float(keyframes[0])
+        if recent:
+            distance = np.min(np.abs(candidates[:, None] - np.asarray(recent)[None, :]), axis=1)
+            candidates = candidates[distance >= np.quantile(distance, 0.75)]
+        return float(rng.choice(list(candidates)))
+
+    def plan_segments(
+        self, first, others: List, needed: float, rng: random.Random = random
+    ) -> List[Tuple[object, float, float]]:
+        """
+        (video, inpoint, outpoint) segments covering `needed` seconds.
+        Starts at a random keyframe of `first`; a source too short for the
+        rest is followed by another library video (or itself again),
+        each from a keyframe, so nothing is decoded that is not shown.
+        """
+        segments = []
+        remaining = needed
+        video = first
+        while remaining > 1e-3:
+            start = self.choose_offset(
+                video.keyframe_times, video.duration_seconds, remaining, video.recent_offsets or [], rng
+            )
+            end = min(video.duration_seconds, start + remaining)
+            if end - start <= 1e-3:
+                start, end = 0.0, min(video.duration_seconds, remaining)
+            if end - start <= 1e-3:
+                break  # Zero-length source; renderer falls back to looping
+            segments.append((video, start, end))
+            remaining -= end - start
+            video = self.choose_balanced(others, rng) if others else first
+        return segments
+
+    async def plan(
+        self, needed: float, gameplay_video_id: Optional[str] = None
+    ) -> Optional[List[Tuple[str, float, float]]]:
+        """
+        Gameplay for `needed` seconds from ingested mezzanines, as
+        (path, inpoint, outpoint) segments, or None if the library cannot
+        serve it. Usage and start offsets are recorded per video.
+        """
+        from src.database.connection import get_db_session
+        from src.database.queries import DBQueries
+
+        try:
+            async with get_db_session() as session:
+                queries = DBQueries(session)
+                videos = [
+                    v for v in await queries.get_active_gameplay_videos()
+                    if v.mezzanine_path and os.path.exists(v.mezzanine_path) and v.duration_seconds
+                    and (v.width, v.height) == mezzanine_size()
+                ]
+                candidates = videos
+                if gameplay_video_id:
+                    candidates = [v for v in videos if str(v.id) == str(gameplay_video_id)]
+                if not candidates:
+                    return None
+                first = self.choose_balanced(candidates)
+                others = [v for v in videos if v.id != first.id]
+                segments = self.plan_segments(first, others, needed)
+                if not segments:
+                    return None
+
+                for video, start, _ in segments:
+                    # Keep the last few start offsets so the next pick avoids them
+                    video.recent_offsets = list(video.recent_offsets or [])[-(RECENT_OFFSETS - 1):] + [start]
+                    await queries.mark_gameplay_used(video.id)
+                    # LRU touch (atime only; mtime is part of the integrity check),
+                    # and protect from eviction while it renders
+                    os.utime(video.mezzanine_path, (time.time(), os.stat(video.mezzanine_path).st_mtime))
+                    self._recent_paths.append(video.mezzanine_path)
+        except Exception as e:
+            logger.warning(f"Gameplay library unavailable, using raw gameplay: {e}")
+            return None
+
+        # Fetch the next clips while this part renders
+        self.schedule_prefetch()
+        return [(video.mezzanine_path, start, end) for video, start, end in segments]
+
+# Global instance
+gameplay_library = GameplayLibrary()
@@ -0,0 +1,52 @@
+import math
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+from src.config import settings
+from src.utils.logger import logger
+
+def parse_variants(spec: str) -> List[Dict]:
+    """
+    "reels:1080x1920:4M:watermark,square:1080x1080" -> variant dicts
+    {"name", "width", "height", "bitrate", "watermark"}. The bitrate (an
+    x264 maxrate) and "watermark" flag are optional; malformed entries
+    are skipped with a warning.
+    """
+    variants = []
+    for entry in filter(None, (e.strip() for e in spec.split(","))):
+        fields = [f.strip() for f in entry.split(":")]
+        try:
+            name, size = fields[0], fields[1]
+            width, height = (int(v) for v in size.lower().split("x"))
+        except (IndexError, ValueError):
+            logger.warning(f"Ignoring malformed output variant {entry!r} (expected name:WxH[:bitrate][:watermark])")
+            continue
+        extras = fields[2:]
+        variants.append({
+            "name": name,
+            # Even dimensions for yuv420p
+            "width": width - width % 2,
+            "height": height - height % 2,
+            "bitrate": next((f for f in extras if f and f.lower() != "watermark"), None),
+            "watermark": "watermark" in (f.lower() for f in extras),
+        })
+    return variants
+
+def output_variants() -> List[Dict]:
+    """Extra outputs rendered alongside the primary VIDEO_WIDTH x VIDEO_HEIGHT video."""
+    return parse_variants(settings.OUTPUT_VARIANTS)
+
+def mezzanine_size() -> Tuple[int, int]:
+    """
+    Frame size gameplay mezzanines are transcoded at: VIDEO_WIDTH x
+    VIDEO_HEIGHT, enlarged (same aspect) until every variant can be cropped
+    from it without upscaling. 720x1280 with reels:1080x1920 -> 1080x1920.
+    """
+    width, height = settings.VIDEO_WIDTH, settings.VIDEO_HEIGHT
+    scale = max([1.0] + [max(v["width"] / width, v["height"] / height) for v in output_variants()])
+    return math.ceil(width * scale / 2 - 1e-6) * 2, math.ceil(height * scale / 2 - 1e-6) * 2
+
+def variant_path(path: str, name: str) -> str:
+    """a/b/story_1.mp4 + "square" -> a/b/story_1_square.mp4 (also for .ass files)."""
+    p = Path(path)
+    return str(p.with_name(f"{p.stem}_{name}{p.suffix}"))
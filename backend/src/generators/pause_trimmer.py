@@ -0,0 +1,135 @@
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.config import settings
+
+# Analysis window for the loudness envelope
+WINDOW_MS = 10
+
+class PauseTrimmer:
+    """
+    Shortens silences in synthesized speech. A loudness envelope (RMS per
+    10ms window) is computed in one vectorized pass; only silence inside
+    the gaps between words (and before the first / after the last word) is
+    removed, so speech is never cut. Word timings are remapped onto the
+    shortened audio.
+    """
+
+    def trim_file(self, audio_path: str, word_timings: List[Dict]) -> Tuple[Tuple[np.ndarray, int], List[Dict]]:
+        """Decode a TTS file and trim it. Returns ((samples, sample_rate), remapped timings)."""
+        from pydub import AudioSegment
+        from src.generators.audio_mixer import pcm_to_float
+
+        segment = AudioSegment.from_mp3(audio_path)
+        samples, word_timings = self.trim(pcm_to_float(segment), segment.frame_rate, word_timings)
+        return (samples, segment.frame_rate), word_timings
+
+    def trim(
+        self, samples: np.ndarray, rate: int, word_timings: List[Dict]
+    ) -> Tuple[np.ndarray, List[Dict]]:
+        """
+        samples: float32 (frames, channels). Pauses longer than
+        TRIM_MAX_PAUSE_MS are cut down to it; leading/trailing silence to
+        TRIM_LEAD_MS / TRIM_TAIL_MS. Returns (trimmed samples, remapped timings).
+        """
+        if not word_timings or not len(samples):
+            return samples, word_timings
+
+        silent = self._silent_windows(samples, rate)
+        total = len(samples) / rate
+        gaps = [(0.0, word_timings[0]["start"], settings.TRIM_LEAD_MS, "lead")]
+        gaps += [
+            (prev["end"], nxt["start"], settings.TRIM_MAX_PAUSE_MS, "pause")
+            for prev, nxt in zip(word_timings, word_timings[1:])
+        ]
+        gaps.append((word_timings[-1]["end"], total, settings.TRIM_TAIL_MS, "tail"))
+
+        removals = []
+        for gap_start, gap_end, keep_ms, kind in gaps:
+            cut = self._removable(silent, gap_start, gap_end, keep_ms, kind)
+            if cut:
+                start, end = cut
+                end = len(samples) if kind == "tail" and end >= len(silent) * WINDOW_MS / 1000 else int(end * rate)
+                removals.append((int(start * rate), end))
+
+        if not removals:
+            return samples, word_timings
+
+        kept = []
+        cursor = 0
+        for start, end in removals:
+            kept.append(samples[cursor:start])
+            cursor = end
+        kept.append(samples[cursor:])
+        trimmed = np.concatenate(kept)
+
+        return trimmed, self._remap(word_timings, removals, rate)
+
+    @staticmethod
+    def _silent_windows(samples: np.ndarray, rate: int) -> np.ndarray:
+        """Boolean per WINDOW_MS window: RMS below TRIM_SILENCE_DB."""
+        mono = samples.mean(axis=1) if samples.shape[1] > 1 else samples[:, 0]
+        window = max(1, rate * WINDOW_MS // 1000)
+        count = len(mono) // window
+        frames = mono[:count * window].reshape(count, window)
+        rms = np.sqrt(np.mean(frames * frames, axis=1))
+        return rms < 10 ** (settings.TRIM_SILENCE_DB / 20)
+
+    @staticmethod
+    def _removable(
+        silent: np.ndarray, gap_start: float, gap_end: float, keep_ms: int, kind: str
+    ) -> Optional[Tuple[float, float]]:
+        """
+        Longest silent run inside the gap, minus the silence to keep.
+        Pauses keep half on each side; lead keeps silence before speech,
+        tail after it. Returns (start_sec, end_sec) to remove, or None.
+        """
+        first = int(np.ceil(gap_start * 1000 / WINDOW_MS))
+        last = min(len(silent), int(gap_end * 1000 / WINDOW_MS))
+        keep = int(np.ceil(keep_ms / WINDOW_MS))
+        if last - first <= keep:
+            return None
+
+        run = np.concatenate(([False], silent[first:last], [False])).astype(np.int8)
+        edges = np.flatnonzero(np.diff(run))
+        starts, ends = edges[0::2], edges[1::2]
+        if not len(starts):
+            return None
+        longest = int(np.argmax(ends - starts))
+        run_start, run_end = first + starts[longest], first + ends[longest]
+        if run_end - run_start <= keep:
+            return None
+
+        if kind == "lead":
+            cut = (run_start, run_end - keep)
+        elif kind == "tail":
+            cut = (run_start + keep, run_end)
+        else:
+            cut = (run_start + keep // 2, run_end - (keep - keep // 2))
+        return cut[0] * WINDOW_MS / 1000, cut[1] * WINDOW_MS / 1000
+
+    @staticmethod
+    def _remap(word_timings: List[Dict], removals: List[Tuple[int, int]], rate: int) -> List[Dict]:
+        """Shift every time by the total removed before it."""
+        starts = np.array([s for s, _ in removals], dtype=np.float64) / rate
+        ends = np.array([e for _, e in removals], dtype=np.float64) / rate
+        removed_before = np.concatenate(([0.0], np.cumsum(ends - starts)))
+
+        def remap(times: np.ndarray) -> np.ndarray:
+            idx = np.searchsorted(ends, times, side="right")
+            shifted = times - removed_before[idx]
+            # Times inside a removed range collapse onto its start
+            inside = (idx < len(starts)) & (times > starts[np.minimum(idx, len(starts) - 1)])
+            shifted[inside] = starts[idx[inside]] - removed_before[idx[inside]]
+            return shifted
+
+        new_starts = remap(np.array([t["start"] for t in word_timings], dtype=np.float64))
+        new_ends = remap(np.array([t["end"] for t in word_timings], dtype=np.float64))
+        return [
+            {**t, "start": float(s), "end": float(e)}
+            for t, s, e in zip(word_timings, new_starts, new_ends)
+        ]
+
+# Global instance
+pause_trimmer = PauseTrimmer()
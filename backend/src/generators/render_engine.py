@@ -0,0 +1,610 @@
+import asyncio
+import contextlib
+import math
+import os
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from src.config import settings
+from src.generators.encoding_profiles import codec_args, default_profile
+from src.generators.output_variants import mezzanine_size
+from src.utils.logger import logger
+from src.utils.metrics import metrics
+
+def parse_cpu_list(spec: str) -> Set[int]:
+    """ "0-3,6" -> {0, 1, 2, 3, 6} (empty spec -> empty set = no pinning)."""
+    cpus = set()
+    for chunk in filter(None, (c.strip() for c in spec.split(","))):
+        low, _, high = chunk.partition("-")
+        cpus.update(range(int(low), int(high or low) + 1))
+    return cpus
+
+def parse_progress(block: Dict[str, str]) -> Dict[str, float]:
+    """
+    One FFmpeg -progress block (key=value lines up to progress=...) ->
+    {"frame", "fps", "speed", "out_seconds", "bytes"}. Missing or "N/A"
+    values are 0.
+    """
+    def number(key: str) -> float:
+        try:
+            return float(block.get(key, "0").rstrip("x"))
+        except ValueError:
+            return 0.0
+
+    return {
+        "frame": number("frame"),
+        "fps": number("fps"),
+        "speed": number("speed"),
+        # out_time_us (out_time_ms is also microseconds, kept by older builds)
+        "out_seconds": (number("out_time_us") or number("out_time_ms")) / 1e6,
+        "bytes": number("total_size"),
+    }
+
+def _ass_filter_path(path: str) -> str:
+    """Subtitle path escaped for the ass filter (forward slashes, escaped drive colon)."""
+    return path.replace('\\', '/').replace(':', '\\:')
+
+class RenderEngine:
+    """
+    Renders a part (or, with render_batch, every part of a story) in a
+    single FFmpeg process: one filter graph takes the
+    gameplay (a keyframe-seeked range, a concat-demuxer chain of ranges, or
+    a looped raw file), crops it to the output aspect ratio, scales, burns
+    in the ASS subtitles and muxes the narration. Video and audio are
+    encoded exactly once, with no intermediate file.
+
+    FFmpeg runs as an async child process, so the event loop (heartbeats,
+    TTS streams, the API) keeps running during encodes. At most `workers`
+    renders run at once; children are niced and optionally CPU-pinned,
+    and are killed on timeout or when the awaiting task is cancelled.
+
+    FFmpeg reports on stdout via -progress; live per-job fps, speed, output
+    bytes and ETA are in `jobs` (shown on the API /status), and the final
+    stats of each render stay in `results` until popped.
+
+    Video is encoded with a named profile from encoding_profiles (by
+    default the one benchmark_encoding.py found best on this machine).
+
+    With RENDER_PARALLEL_SEGMENTS, a long part from a library mezzanine is
+    cut at GOP boundaries into as many segments as there are idle cores
+    for; each is encoded video-only by its own FFmpeg process with
+    identical settings, then the segments are stream-copied together and
+    muxed with the narration.
+    """
+
+    def __init__(
+        self, workers: int = None, nice: int = None, cpu_affinity: str = None,
+        timeout: float = None, profile: str = None
+    ):
+        self.profile = profile or default_profile()
+        self.workers = max(1, workers or settings.RENDER_WORKERS)
+        self.nice = settings.RENDER_NICE if nice is None else nice
+        self.cpus = parse_cpu_list(settings.RENDER_CPU_AFFINITY if cpu_affinity is None else cpu_affinity)
+        self.timeout = timeout or settings.RENDER_TIMEOUT_SECONDS
+        self._slots = asyncio.Semaphore(self.workers)
+        self.jobs: Dict[str, Dict] = {}
+        self.results: Dict[str, Dict] = {}
+
+    def build_command(
+        self,
+        gameplay_path: str,
+        subtitle_path: str,
+        output_path: str,
+        duration: float,
+        audio_path: Optional[str] = None,
+        audio_format: Optional[Tuple[int, int]] = None,
+        start_offset: float = 0.0,
+        normalized: bool = False,
+        loop: bool = True,
+        concat: bool = False,
+        variants: Optional[List[Dict]] = None
+    ) -> List[str]:
+        """
+        FFmpeg argv. Audio comes from audio_path, or, when audio_format
+        (sample_rate, channels) is given, as float32 PCM on stdin.
+        normalized gameplay (a library mezzanine) is already at the output
+        frame rate and aspect, so outputs of mezzanine_size() only get the
+        subtitles and the rest are scaled down from it.
+        With concat, gameplay_path is a concat-demuxer list (see concat_list).
+        variants (dicts with width, height, bitrate, subtitle_path and
+        output_path) are extra outputs: the decoded gameplay and narration
+        are split, and each variant is cropped, scaled and subtitled for
+        its own size.
+        """
+        if audio_format:
+            rate, channels = audio_format
+            audio_input = ["-f", "f32le", "-ar", str(rate), "-ac", str(channels), "-i", "pipe:0"]
+        else:
+            audio_input = ["-i", audio_path]
+
+        variants = variants or []
+        count = len(variants) + 1
+        chains = [f"{self._conform_filter(normalized)}ass='{_ass_filter_path(subtitle_path)}'"]
+        chains += [
+            f"{self._conform_filter(normalized, v['width'], v['height'])}ass='{_ass_filter_path(v['subtitle_path'])}'"
+            for v in variants
+        ]
+        if count == 1:
+            graph = [f"[0:v]{chains[0]}[v0]", "[1:a]apad[a0]"]
+        else:
+            graph = [
+                f"[0:v]split={count}" + "".join(f"[g{i}]" for i in range(count)),
+                # Narration is padded with silence through the outro
+                f"[1:a]apad,asplit={count}" + "".join(f"[a{i}]" for i in range(count)),
+            ]
+            graph += [f"[g{i}]{chain}[v{i}]" for i, chain in enumerate(chains)]
+
+        outputs = []
+        for i, (path, bitrate) in enumerate([(output_path, None)] + [(v["output_path"], v.get("bitrate")) for v in variants]):
+            outputs += ["-map", f"[v{i}]", "-map", f"[a{i}]", *self._output_args(duration, path, bitrate)]
+
+        return [
+            *self._command_head(gameplay_path, start_offset, loop, concat),
+            *audio_input,
+            "-filter_complex", ";".join(graph),
+            *outputs
+        ]
+
+    def build_batch_command(
+        self,
+        gameplay_path: str,
+        parts: List[Tuple[str, str, float, int]],
+        audio_format: Tuple[int, int],
+        start_offset: float = 0.0,
+        normalized: bool = False,
+        loop: bool = True,
+        concat: bool = False
+    ) -> List[str]:
+        """
+        One FFmpeg argv producing several outputs. parts are (subtitle_path,
+        output_path, duration, audio_frames); their narrations arrive
+        back to back as one float32 PCM stream on stdin. The gameplay is
+        decoded (and conformed) once and split: part i gets the next
+        `duration` seconds of it and its own slice of the audio.
+        """
+        rate, channels = audio_format
+        count = len(parts)
+        graph = [
+            f"[0:v]{self._conform_filter(normalized)}split={count}" + "".join(f"[g{i}]" for i in range(count)),
+            f"[1:a]asplit={count}" + "".join(f"[s{i}]" for i in range(count)),
+        ]
+        outputs = []
+        video_start = 0.0
+        audio_start = 0
+        for i, (subtitle_path, output_path, duration, audio_frames) in enumerate(parts):
+            graph.append(
+                f"[g{i}]trim=start={video_start:.3f}:duration={duration:.3f},setpts=PTS-STARTPTS,"
+                f"ass='{_ass_filter_path(subtitle_path)}'[v{i}]"
+            )
+            graph.append(
+                f"[s{i}]atrim=start_sample={audio_start}:end_sample={audio_start + audio_frames},"
+                f"asetpts=PTS-STARTPTS,apad[a{i}]"
+            )
+            outputs += ["-map", f"[v{i}]", "-map", f"[a{i}]", *self._output_args(duration, output_path)]
+            video_start += duration
+            audio_start += audio_frames
+
+        return [
+            *self._command_head(gameplay_path, start_offset, loop, concat),
+            "-f", "f32le", "-ar", str(rate), "-ac", str(channels), "-i", "pipe:0",
+            "-filter_complex", ";".join(graph),
+            *outputs
+        ]
+
+    @staticmethod
+    def _command_head(gameplay_path: str, start_offset: float, loop: bool, concat: bool) -> List[str]:
+        """FFmpeg binary, global options and the gameplay input."""
+        if concat:
+            gameplay_input = ["-f", "concat", "-safe", "0", "-i", gameplay_path]
+        else:
+            # Input-side seek: decoding starts at the keyframe at/before start_offset
+            gameplay_input = ["-ss", f"{start_offset:.3f}", *(["-stream_loop", "-1"] if loop else []), "-i", gameplay_path]
+        return [
+            settings.FFMPEG_PATH or "ffmpeg", "-y", "-hide_banner", "-loglevel", "error",
+            "-nostats", "-progress", "pipe:1",
+            *gameplay_input
+        ]
+
+    @staticmethod
+    def _conform_filter(normalized: bool, width: int = None, height: int = None) -> str:
+        """
+        Filter prefix bringing gameplay to an output size (default
+        VIDEO_WIDTH x VIDEO_HEIGHT) and fps ("" for mezzanines at that size).
+        """
+        width, height = width or settings.VIDEO_WIDTH, height or settings.VIDEO_HEIGHT
+        if normalized and (width, height) == mezzanine_size():
+            return ""
+        # Centered crop to the output aspect ratio (whichever side is too long)
+        return (
+            f"crop=w=min(iw\\,ih*{width}/{height}):h=min(ih\\,iw*{height}/{width}),"
+            f"scale={width}:{height},setsar=1,fps={settings.VIDEO_FPS},"
+        )
+
+    def _output_args(self, duration: float, output_path: str, maxrate: Optional[str] = None) -> List[str]:
+        return [
+            "-t", f"{duration:.3f}",
+            *codec_args(self.profile, maxrate),
+            "-c:a", "aac", "-b:a", "128k",
+            "-movflags", "+faststart",
+            output_path
+        ]
+
+    @staticmethod
+    def concat_list(segments: List[Tuple[str, float, float]]) -> str:
+        """Concat-demuxer script playing each (path, inpoint, outpoint) in turn."""
+        lines = []
+        for path, inpoint, outpoint in segments:
+            escaped = os.path.abspath(path).replace("\\", "/").replace("'", "'\\''")
+            lines += [f"file '{escaped}'", f"inpoint {inpoint:.3f}", f"outpoint {outpoint:.3f}"]
+        return "\n".join(lines) + "\n"
+
+    async def render(
+        self,
+        gameplay_path: Optional[str],
+        subtitle_path: str,
+        output_path: str,
+        duration: float,
+        audio_path: Optional[str] = None,
+        audio_samples: Optional[Tuple[np.ndarray, int]] = None,
+        start_offset: float = 0.0,
+        normalized: bool = False,
+        segments: Optional[List[Tuple[str, float, float]]] = None,
+        variants: Optional[List[Dict]] = None
+    ) -> str:
+        """
+        Render to output_path (plus any variants, see build_command, in the
+        same pass). audio_samples is in-memory (float32 samples
+        shaped (frames, channels), sample_rate) and takes precedence over
+        audio_path. segments ((path, inpoint, outpoint) ranges, e.g. from
+        GameplayLibrary.plan) replace gameplay_path: one range is seeked
+        directly, several are chained with the concat demuxer.
+        Raises RuntimeError if FFmpeg fails. Encode stats are then available
+        from pop_result(output_path).
+        """
+        audio_format = None
+        stdin_data = None
+        if audio_samples is not None:
+            samples, rate = audio_samples
+            audio_format = (rate, samples.shape[1])
+            stdin_data = np.ascontiguousarray(samples, dtype="<f4").tobytes()
+
+        if settings.RENDER_PARALLEL_SEGMENTS and normalized and segments and len(segments) == 1 and not variants:
+            count = self.segment_count(duration)
+            if count > 1:
+                return await self._render_segmented(
+                    segments[0], subtitle_path, output_path, duration, count,
+                    audio_path=audio_path, audio_format=audio_format, stdin_data=stdin_data
+                )
+
+        gameplay_path, start_offset, loop, concat, list_path = self._gameplay_source(
+            gameplay_path, start_offset, segments, output_path
+        )
+        cmd = self.build_command(
+            gameplay_path, subtitle_path, output_path, duration,
+            audio_path=audio_path, audio_format=audio_format,
+            start_offset=start_offset, normalized=normalized,
+            loop=loop, concat=concat, variants=variants
+        )
+        logger.info(f"Running FFmpeg: {' '.join(cmd)}")
+
+        source = os.path.basename(segments[0][0] if segments else gameplay_path)
+        try:
+            stats = await self._run(cmd, stdin_data, job=output_path, duration=duration)
+            for path in [output_path] + [v["output_path"] for v in variants or []]:
+                self.results[path] = {**stats, "preset": self.profile, "source": source}
+        finally:
+            if list_path and os.path.exists(list_path):
+                os.remove(list_path)
+        return output_path
+
+    async def render_batch(
+        self,
+        gameplay_path: Optional[str],
+        parts: List[Tuple[str, str, float, Tuple[np.ndarray, int]]],
+        start_offset: float = 0.0,
+        normalized: bool = False,
+        segments: Optional[List[Tuple[str, float, float]]] = None
+    ) -> List[str]:
+        """
+        Render several parts, (subtitle_path, output_path, duration,
+        audio_samples), in one FFmpeg process sharing the gameplay decode
+        (see build_batch_command). The gameplay must cover the summed
+        durations. All narrations must share one sample rate and channel
+        count. Raises RuntimeError if FFmpeg fails; every output's stats
+        (elapsed apportioned by duration) are then available from pop_result.
+        """
+        formats = {(rate, samples.shape[1]) for _, _, _, (samples, rate) in parts}
+        if len(formats) != 1:
+            raise ValueError(f"Batch parts have different audio formats: {sorted(formats)}")
+        stdin_data = b"".join(
+            np.ascontiguousarray(samples, dtype="<f4").tobytes() for _, _, _, (samples, _) in parts
+        )
+        first_output = parts[0][1]
+        total = sum(duration for _, _, duration, _ in parts)
+
+        gameplay_path, start_offset, loop, concat, list_path = self._gameplay_source(
+            gameplay_path, start_offset, segments, first_output
+        )
+        cmd = self.build_batch_command(
+            gameplay_path,
+            [(subtitle_path, output_path, duration, len(audio[0])) for subtitle_path, output_path, duration, audio in parts],
+            formats.pop(), start_offset=start_offset, normalized=normalized, loop=loop, concat=concat
+        )
+        logger.info(f"Running FFmpeg batch ({len(parts)} parts): {' '.join(cmd)}")
+
+        source = os.path.basename(segments[0][0] if segments else gameplay_path)
+        try:
+            stats = await self._run(cmd, stdin_data, job=first_output, duration=total)
+        finally:
+            if list_path and os.path.exists(list_path):
+                os.remove(list_path)
+        for _, output_path, duration, _ in parts:
+            # One process encoded every part: wall time is split by each part's
+            # share of the timeline (fps/speed are batch rates, size is per file)
+            share = duration / total if total else 1 / len(parts)
+            self.results[output_path] = {
+                **stats, "elapsed": stats["elapsed"] * share, "out_seconds": duration, "bytes": None,
+                "preset": self.profile, "source": source, "batch_size": len(parts)
+            }
+        return [output_path for _, output_path, _, _ in parts]
+
+    def idle_cores(self) -> float:
+        """
+        Cores not in use: CPU count minus the 1-minute load average (or, where
+        there is none, the threads of renders already running).
+        """
+        cpus = len(self.cpus) or os.cpu_count() or 1
+        busy = len(self.jobs) * settings.RENDER_SEGMENT_THREADS
+        if hasattr(os, "getloadavg"):
+            busy = max(busy, os.getloadavg()[0])
+        return max(0.0, cpus - busy)
+
+    def segment_count(self, duration: float) -> int:
+        """
+        Segments for a render of `duration` seconds: one per
+        RENDER_SEGMENT_THREADS idle cores, each at least
+        RENDER_SEGMENT_MIN_SECONDS long (1 = no split).
+        """
+        by_cores = int(self.idle_cores() // max(1, settings.RENDER_SEGMENT_THREADS))
+        by_length = int(duration // max(settings.RENDER_SEGMENT_MIN_SECONDS, 1e-3))
+        return max(1, min(by_cores, by_length))
+
+    @staticmethod
+    def split_timeline(duration: float, count: int, gop_seconds: float) -> List[Tuple[float, float]]:
+        """
+        (start, length) of `count` near-equal segments whose starts are
+        whole multiples of gop_seconds, so each begins on a source keyframe
+        and the encoder's own first keyframe.
+        """
+        gops = max(1, math.floor(duration / gop_seconds + 1e-6))
+        count = max(1, min(count, gops))
+        starts = sorted({round(i * gops / count) * gop_seconds for i in range(count)})
+        bounds = starts + [duration]
+        return [(start, bounds[i + 1] - start) for i, start in enumerate(starts)]
+
+    def build_segment_command(
+        self, gameplay_path: str, subtitle_path: str, output_path: str,
+        start_offset: float, segment_start: float, length: float
+    ) -> List[str]:
+        """
+        Video-only encode of [segment_start, segment_start + length) of the
+        timeline. Timestamps are shifted so the subtitles line up, then
+        reset so the segment starts at 0.
+        """
+        video_filter = (
+            f"[0:v]{self._conform_filter(True)}setpts=PTS+{segment_start:.3f}/TB,"
+            f"ass='{_ass_filter_path(subtitle_path)}',setpts=PTS-STARTPTS[v]"
+        )
+        return [
+            *self._command_head(gameplay_path, start_offset + segment_start, False, False),
+            "-filter_complex", video_filter,
+            "-map", "[v]", "-an",
+            "-t", f"{length:.3f}",
+            *codec_args(self.profile), "-threads", str(settings.RENDER_SEGMENT_THREADS),
+            output_path
+        ]
+
+    def build_mux_command(
+        self, segment_list: str, output_path: str, duration: float,
+        audio_path: Optional[str] = None, audio_format: Optional[Tuple[int, int]] = None
+    ) -> List[str]:
+        """Stream-copy the concatenated video segments and encode the narration alongside."""
+        if audio_format:
+            rate, channels = audio_format
+            audio_input = ["-f", "f32le", "-ar", str(rate), "-ac", str(channels), "-i", "pipe:0"]
+        else:
+            audio_input = ["-i", audio_path]
+        return [
+            *self._command_head(segment_list, 0.0, False, True),
+            *audio_input,
+            "-filter_complex", "[1:a]apad[a]",
+            "-map", "0:v", "-map", "[a]",
+            "-t", f"{duration:.3f}",
+            "-c:v", "copy",
+            "-c:a", "aac", "-b:a", "128k",
+            "-movflags", "+faststart",
+            output_path
+        ]
+
+    async def _render_segmented(
+        self, segment: Tuple[str, float, float], subtitle_path: str, output_path: str,
+        duration: float, count: int, audio_path: Optional[str] = None,
+        audio_format: Optional[Tuple[int, int]] = None, stdin_data: Optional[bytes] = None
+    ) -> str:
+        """Parallel GOP-aligned segment encodes + stream-copy concat; holds one worker slot."""
+        gameplay_path, start_offset, _ = segment
+        timeline = self.split_timeline(duration, count, settings.GAMEPLAY_GOP_SECONDS)
+        parts = [f"{output_path}.seg{i}.mp4" for i in range(len(timeline))]
+        list_path = f"{output_path}.segments.txt"
+        logger.info(f"Encoding {output_path} as {len(timeline)} parallel segments")
+
+        started = time.monotonic()
+        try:
+            async with self._slots:
+                # A failed segment cancels the others, killing their FFmpeg
+                # children before the finally below removes the files
+                try:
+                    async with asyncio.TaskGroup() as group:
+                        for part, (start, length) in zip(parts, timeline):
+                            group.create_task(self._run(
+                                self.build_segment_command(gameplay_path, subtitle_path, part, start_offset, start, length),
+                                job=part, duration=length, bounded=False
+                            ))
+                except ExceptionGroup as failed:
+                    raise failed.exceptions[0]
+                with open(list_path, "w", encoding="utf-8") as f:
+                    f.write(self.concat_list([(part, 0.0, length) for part, (_, length) in zip(parts, timeline)]))
+                stats = await self._run(
+                    self.build_mux_command(list_path, output_path, duration, audio_path, audio_format),
+                    stdin_data, job=output_path, duration=duration, bounded=False
+                )
+        finally:
+            for path in (*parts, list_path):
+                if os.path.exists(path):
+                    os.remove(path)
+
+        elapsed = time.monotonic() - started
+        metrics.increment("render.segmented")
+        self.results[output_path] = {
+            **stats,
+            "elapsed": elapsed,
+            "fps": duration * settings.VIDEO_FPS / elapsed,
+            "speed": duration / elapsed,
+            "preset": self.profile,
+            "source": os.path.basename(gameplay_path),
+            "segments": len(timeline),
+        }
+        return output_path
+
+    def _gameplay_source(
+        self, gameplay_path: Optional[str], start_offset: float,
+        segments: Optional[List[Tuple[str, float, float]]], output_path: str
+    ) -> Tuple[str, float, bool, bool, Optional[str]]:
+        """
+        (gameplay_path, start_offset, loop, concat, list_path) for the
+        command: one segment is seeked directly, several are written to a
+        concat list next to the output (removed by the caller).
+        """
+        if segments and len(segments) == 1:
+            path, inpoint, _ = segments[0]
+            return path, inpoint, False, False, None
+        if segments:
+            list_path = f"{output_path}.concat.txt"
+            with open(list_path, "w", encoding="utf-8") as f:
+                f.write(self.concat_list(segments))
+            return list_path, 0.0, False, True, list_path
+        return gameplay_path, start_offset, True, False, None
+
+    def _apply_limits(self, pid: int) -> None:
+        """
+        Apply nice/affinity to a started child from the parent (POSIX only).
+        Not a preexec_fn, which can deadlock children forked from this
+        threaded process; FFmpeg starts its worker threads later, and they
+        inherit both.
+        """
+        if os.name != "posix":
+            return
+        try:
+            if self.nice:
+                os.setpriority(os.PRIO_PROCESS, pid, os.getpriority(os.PRIO_PROCESS, 0) + self.nice)
+            if self.cpus and hasattr(os, "sched_setaffinity"):
+                os.sched_setaffinity(pid, self.cpus)
+        except OSError as e:
+            # Already exited, or not permitted: the render still runs
+            logger.warning(f"Could not apply render nice/affinity to pid {pid}: {e}")
+
+    async def _run(
+        self, cmd: List[str], stdin_data: Optional[bytes] = None,
+        job: Optional[str] = None, duration: Optional[float] = None,
+        bounded: bool = True
+    ) -> Dict[str, float]:
+        """
+        Run one FFmpeg child once a worker slot is free (immediately if not
+        bounded, for children of a render already holding one), tracking
+        its -progress output under `job`. Returns the final stats (as in
+        parse_progress, plus "elapsed" wall seconds). Raises RuntimeError
+        on failure or timeout; cancellation kills the child before re-raising.
+        """
+        job = job or str(id(cmd))
+        async with (self._slots if bounded else contextlib.nullcontext()):
+            metrics.increment("render.active")
+            started = time.monotonic()
+            status = self.jobs[job] = {"fps": 0.0, "speed": 0.0, "out_seconds": 0.0, "bytes": 0.0, "eta_seconds": None}
+            proc = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdin=asyncio.subprocess.PIPE if stdin_data is not None else asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            self._apply_limits(proc.pid)
+            try:
+                err = await asyncio.wait_for(self._communicate(proc, stdin_data, status, duration), timeout=self.timeout)
+            except asyncio.TimeoutError:
+                await self._kill(proc)
+                metrics.increment("render.timeouts")
+                raise RuntimeError(f"FFmpeg render timed out after {self.timeout:.0f}s")
+            except asyncio.CancelledError:
+                await self._kill(proc)
+                metrics.increment("render.cancelled")
+                raise
+            finally:
+                metrics.increment("render.active", -1)
+                self.jobs.pop(job, None)
+
+        if proc.returncode != 0:
+            metrics.increment("render.failures")
+            raise RuntimeError(f"FFmpeg render failed ({proc.returncode}): {err.decode(errors='replace').strip()[-2000:]}")
+
+        status["elapsed"] = time.monotonic() - started
+        metrics.observe("render.fps", status["fps"])
+        metrics.observe("render.speed", status["speed"])
+        return status
+
+    async def _communicate(self, proc, stdin_data: Optional[bytes], status: Dict, duration: Optional[float]) -> bytes:
+        """Feed stdin, follow -progress on stdout and collect stderr concurrently."""
+        async def feed():
+            if stdin_data is not None:
+                try:
+                    proc.stdin.write(stdin_data)
+                    await proc.stdin.drain()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # FFmpeg exited early; its stderr says why
+                finally:
+                    proc.stdin.close()
+
+        async def follow():
+            block: Dict[str, str] = {}
+            async for raw in proc.stdout:
+                key, _, value = raw.decode(errors="replace").strip().partition("=")
+                block[key] = value
+                if key == "progress":
+                    status.update(parse_progress(block))
+                    if duration and status["speed"] > 0:
+                        status["eta_seconds"] = max(0.0, duration - status["out_seconds"]) / status["speed"]
+                    block = {}
+
+        _, err, _ = await asyncio.gather(feed(), proc.stderr.read(), follow())
+        await proc.wait()
+        return err
+
+    def progress(self) -> Dict[str, Dict]:
+        """Snapshot of running renders keyed by output path."""
+        return {job: dict(status) for job, status in self.jobs.items()}
+
+    def pop_result(self, output_path: str) -> Optional[Dict]:
+        """Final stats of a finished render (fps, speed, elapsed, bytes, preset = profile name, source)."""
+        return self.results.pop(output_path, None)
+
+    @staticmethod
+    async def _kill(proc) -> None:
+        if proc.returncode is None:
+            try:
+                proc.kill()
+            except ProcessLookupError:
+                pass
+            await proc.wait()
+
+# Global instance
+render_engine = RenderEngine()
@@ -0,0 +1,126 @@
+import hashlib
+import os
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from pydub import AudioSegment
+
+from src.config import settings
+from src.utils.logger import logger
+
+# Pre-rendered lengths: multiples of QUANTUM_MS from MIN_MS up to MAX_MS
+QUANTUM_MS = 40
+MIN_MS = 200
+MAX_MS = 2000
+
+# Taper at both ends of every rendered buffer (avoids clicks)
+FADE_MS = 5
+
+# Built-in tones used when an asset file is missing: name -> (frequency_hz, gain_db)
+GENERATED_TONES = {
+    "bleep": (1000, -5.0),
+}
+
+class SoundBank:
+    """
+    Sound effects decoded and resampled once to the speech format, with
+    tapered buffers pre-rendered at quantized durations. Sources shorter
+    than a requested duration are looped. Resampled asset PCM is cached on
+    disk (raw .npy), so later runs skip decoding entirely.
+    """
+
+    def __init__(self, cache_dir: Path = None, assets_dir: Path = None):
+        self.cache_dir = Path(cache_dir or settings.CACHE_DIR / "sounds")
+        self.assets_dir = Path(assets_dir or settings.ASSETS_DIR)
+        # (name, rate, channels) -> {duration_ms: float32 (frames, channels)}
+        self._banks: Dict[Tuple[str, int, int], Dict[int, np.ndarray]] = {}
+        self._sources: Dict[Tuple[str, int, int], np.ndarray] = {}
+
+    @staticmethod
+    def quantize_ms(seconds: float) -> int:
+        """Smallest quantized duration covering `seconds`."""
+        ms = max(MIN_MS, int(np.ceil(seconds * 1000 / QUANTUM_MS - 1e-9)) * QUANTUM_MS)
+        return ms
+
+    def get(self, name: str, seconds: float, rate: int, channels: int = 1) -> np.ndarray:
+        """
+        Buffer of at least `seconds` (rounded up to the quantum, min MIN_MS)
+        in the requested format. Do not modify the returned array.
+        """
+        key = (name, rate, channels)
+        if key not in self._banks:
+            self._banks[key] = self._render_bank(key)
+        duration_ms = self.quantize_ms(seconds)
+        buffer = self._banks[key].get(duration_ms)
+        if buffer is None:
+            # Longer than the pre-rendered range: render on demand
+            buffer = self._render(self._sources[key], duration_ms * rate // 1000, rate)
+        return buffer
+
+    def _render_bank(self, key: Tuple[str, int, int]) -> Dict[int, np.ndarray]:
+        name, rate, channels = key
+        source = self._load_source(name, rate, channels)
+        self._sources[key] = source
+        bank = {
+            ms: self._render(source, ms * rate // 1000, rate)
+            for ms in range(MIN_MS, MAX_MS + 1, QUANTUM_MS)
+        }
+        logger.info(f"Sound bank '{name}' ready at {rate}Hz/{channels}ch ({len(bank)} durations)")
+        return bank
+
+    @staticmethod
+    def _render(source: np.ndarray, frames: int, rate: int) -> np.ndarray:
+        """Loop/cut the source to `frames` and taper both ends."""
+        reps = -(-frames // len(source))
+        buffer = np.tile(source, (reps, 1))[:frames].copy()
+        ramp = min(max(1, rate * FADE_MS // 1000), frames // 2)
+        if ramp:
+            taper = np.linspace(0, 1, ramp, endpoint=False, dtype=np.float32)[:, None]
+            buffer[:ramp] *= taper
+            buffer[frames - ramp:] *= taper[::-1]
+        buffer.setflags(write=False)
+        return buffer
+
+    def _load_source(self, name: str, rate: int, channels: int) -> np.ndarray:
+        """Source PCM as float32 (frames, channels), from disk cache, asset or generated tone."""
+        asset = self._find_asset(name)
+        if asset is None:
+            if name not in GENERATED_TONES:
+                raise FileNotFoundError(f"No asset for sound '{name}' in {self.assets_dir}")
+            frequency, gain_db = GENERATED_TONES[name]
+            # One second holds a whole number of cycles, so looping is seamless
+            t = np.arange(rate, dtype=np.float32) / rate
+            tone = np.sin(2 * np.pi * frequency * t) * (10 ** (gain_db / 20))
+            return np.repeat(tone.astype(np.float32)[:, None], channels, axis=1)
+
+        digest = hashlib.sha256(asset.read_bytes()).hexdigest()[:16]
+        cache_path = self.cache_dir / f"{name}-{digest}-{rate}-{channels}.npy"
+        if cache_path.exists():
+            try:
+                return np.load(cache_path)
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable sound cache {cache_path.name}: {e}")
+
+        segment = AudioSegment.from_file(str(asset)).set_frame_rate(rate).set_channels(channels)
+        samples = np.array(segment.get_array_of_samples(), dtype=np.float32)
+        source = samples.reshape(-1, channels) / float(1 << (8 * segment.sample_width - 1))
+
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp.npy")
+            np.save(tmp_path, source)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            logger.warning(f"Could not cache sound '{name}': {e}")
+        return source
+
+    def _find_asset(self, name: str) -> Optional[Path]:
+        for ext in (".wav", ".mp3", ".ogg"):
+            path = self.assets_dir / f"{name}{ext}"
+            if path.exists():
+                return path
+        return None
+
+# Global instance
+sound_bank = SoundBank()
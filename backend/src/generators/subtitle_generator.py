@@ -1,5 +1,5 @@
 
-from typing import List, Dict
+from typing import Iterable, List, Dict, Optional
 
 from src.config import settings
 from src.utils.helpers import format_duration
@@ -9,12 +9,23 @@ class SubtitleGenerator:
     Generates ASS (Advanced Substation Alpha) subtitle files for TikTok-style captions.
     """
     
-    def generate_ass(self, word_timings: List[Dict], output_path: str) -> str:
+    def generate_ass(
+        self, 
+        word_timings: List[Dict], 
+        output_path: str, 
+        masked_indices: Optional[Iterable[int]] = None,
+        width: Optional[int] = None,
+        height: Optional[int] = None,
+        watermark: bool = True
+    ) -> str:
         """
         Create .ass file from word timings.
+        Words at masked_indices (censored, from WordAligner) are shown as ****.
+        width/height lay the script out for another output size (default
+        VIDEO_WIDTH x VIDEO_HEIGHT); watermark=False leaves the watermark out.
         """
-        header = self._get_header()
-        events = self._get_events(word_timings)
+        header = self._get_header(width or settings.VIDEO_WIDTH, height or settings.VIDEO_HEIGHT)
+        events = self._get_events(word_timings, set(masked_indices or ()), watermark)
         
         content = header + "\n" + events
         
@@ -23,15 +34,15 @@ class SubtitleGenerator:
             
         return output_path
 
-    def _get_header(self) -> str:
+    def _get_header(self, width: int, height: int) -> str:
         return f"""[Script Info]
 Title: AI Slop Subtitles
 ScriptType: v4.00+
 WrapStyle: 0
 ScaledBorderAndShadow: yes
 YCbCr Matrix: TV.601
-PlayResX: {settings.VIDEO_WIDTH}
-PlayResY: {settings.VIDEO_HEIGHT}
+PlayResX: {width}
+PlayResY: {height}
 
 [V4+ Styles]
 Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
@@ -43,7 +54,7 @@ Style: Watermark,{settings.SUBTITLE_FONT},30,&H80FFFFFF,&H000000FF,&H00000000,&H
 [Events]
 Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text"""
 
-    def _get_events(self, word_timings: List[Dict]) -> str:
+    def _get_events(self, word_timings: List[Dict], masked_indices: set = frozenset(), watermark: bool = True) -> str:
         events = []
         
         # We display one word at a time or small phrase?
@@ -52,10 +63,10 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text"
         # Or allow grouping if words are very short.
         # Let's stick to 1 word per line for "word by word" requirement.
         
-        for timing in word_timings:
+        for i, timing in enumerate(word_timings):
             start_time = self._format_ass_time(timing["start"])
             end_time = self._format_ass_time(timing["end"])
-            word = timing["word"]
+            word = "****" if i in masked_indices else timing["word"]
             
             # Simple keyword highlighting heuristic:
             # Words > 5 chars or CAPSLOCK words get highlighted
@@ -71,7 +82,8 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text"
         if settings.WATERMARK_TEXT:
             # We want it to last the whole video. We'll use a very long duration or just enough for the story.
             total_duration = word_timings[-1]["end"] + 5 if word_timings else 3600
-            events.append(f"Dialogue: 1,0:00:00.00,{self._format_ass_time(total_duration)},Watermark,,0,0,0,,{settings.WATERMARK_TEXT}")
+            if watermark:
+                events.append(f"Dialogue: 1,0:00:00.00,{self._format_ass_time(total_duration)},Watermark,,0,0,0,,{settings.WATERMARK_TEXT}")
             
             # Add Outro Text (last 3 seconds)
             outro_start = total_duration - 3 if total_duration > 3 else total_duration
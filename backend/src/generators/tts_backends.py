@@ -0,0 +1,398 @@
+import asyncio
+import math
+import re
+import edge_tts
+import numpy as np
+from typing import Dict, List, Optional, Protocol, Tuple
+
+from src.config import settings
+from src.utils.logger import logger
+from src.utils.metrics import metrics
+from src.utils.retry import with_retry
+
+# edge-tts default output: audio-24khz-48kbitrate-mono-mp3 (CBR).
+# MPEG-2 Layer III at 24kHz: 576 samples (24ms) per 144-byte frame.
+EDGE_TTS_BYTES_PER_SECOND = 48_000 // 8
+MP3_FRAME_BYTES = 144
+MP3_FRAME_SECONDS = 0.024
+
+# LAME encoder + decoder delay (samples at 24kHz) in locally encoded MP3
+LAME_DELAY_SECONDS = 1105 / 24_000
+
+# Samples quieter than this (int16) count as silence when locating speech
+SILENCE_THRESHOLD = 500
+
+def rate_percent(rate: str) -> int:
+    """Edge-style prosody rate ("+10%", "-5%") as a signed percent."""
+    match = re.fullmatch(r"([+-]?\d+)%", rate.strip())
+    return int(match.group(1)) if match else 0
+
+def scale_rate(rate: str, tempo: float) -> str:
+    """Prosody rate that speaks `tempo` times faster than `rate`."""
+    return f"{round(((1 + rate_percent(rate) / 100) * tempo - 1) * 100):+d}%"
+
+class TTSBackend(Protocol):
+    """
+    A speech engine. Every backend returns the same structure: CBR MP3 bytes
+    (24kHz, 48kbps, mono) and word timings [{"word", "start", "end"}] in
+    seconds, so caching, stitching, bleeps and subtitles work unchanged.
+    """
+    name: str
+    voices: List[str]
+
+    async def synthesize(self, text: str, voice: str, rate: Optional[str] = None) -> Tuple[bytes, List[Dict]]:
+        """rate is an edge-style prosody rate ("+10%"); defaults to TTS_RATE."""
+        ...
+
+    def voice_for(self, voice: str) -> str:
+        """Closest voice of this backend for a voice of another backend."""
+        ...
+
+class EdgeTTSBackend:
+    """
+    Microsoft Edge neural voices over websocket (edge-tts).
+    Long texts are synthesized as sentence chunks in parallel and stitched.
+    """
+    name = "edge"
+
+    def __init__(self):
+        # Edge TTS voices (High Quality Neural)
+        # We can dynamically fetch these, but for speed we list popular English ones
+        self.voices = [
+            "en-US-GuyNeural",
+            "en-US-ChristopherNeural",
+            "en-US-EricNeural",
+            "en-US-AriaNeural",
+            "en-US-JennyNeural",
+            "en-US-MichelleNeural"
+        ]
+        # Limits concurrent edge-tts connections (created lazily inside the event loop)
+        self._connections: Optional[asyncio.Semaphore] = None
+
+    def voice_for(self, voice: str) -> str:
+        if voice in self.voices:
+            return voice
+        female = voice.endswith(("+f1", "+f2", "+f3", "+f4", "+f5"))
+        return "en-US-AriaNeural" if female else "en-US-ChristopherNeural"
+
+    async def synthesize(self, text: str, voice: str, rate: Optional[str] = None) -> Tuple[bytes, List[Dict]]:
+        chunks = self._split_chunks(text)
+        if len(chunks) == 1:
+            return await self._synthesize_stream(text, voice, rate=rate)
+        logger.info(f"Synthesizing {len(chunks)} chunks in parallel")
+        return await self._synthesize_chunked(chunks, voice, rate=rate)
+
+    async def synthesize_single(self, text: str, voice: str, rate: Optional[str] = None) -> Tuple[bytes, List[Dict]]:
+        """The whole text in one request (no chunking)."""
+        return await self._synthesize_stream(text, voice, rate=rate)
+
+    def _split_chunks(self, text: str) -> List[str]:
+        """
+        Group sentences into chunks of about TTS_CHUNK_CHARS characters.
+        Returns [text] when chunking is disabled or the text is short.
+        """
+        if settings.TTS_CHUNK_CHARS <= 0 or len(text) <= settings.TTS_CHUNK_CHARS:
+            return [text]
+        
+        chunks = []
+        current = ""
+        for sentence in re.split(r'(?<=[.!?])\s+', text.strip()):
+            if current and len(current) + len(sentence) + 1 > settings.TTS_CHUNK_CHARS:
+                chunks.append(current)
+                current = sentence
+            else:
+                current = f"{current} {sentence}" if current else sentence
+        if current:
+            chunks.append(current)
+        return chunks
+
+    async def _synthesize_chunked(self, chunks: List[str], voice: str, rate: Optional[str] = None) -> Tuple[bytes, List[Dict]]:
+        """
+        Synthesize chunks concurrently (at most TTS_MAX_CONNECTIONS streams)
+        and concatenate them with a uniform pause, rebasing word timings.
+        """
+        if self._connections is None:
+            self._connections = asyncio.Semaphore(settings.TTS_MAX_CONNECTIONS)
+        
+        async def limited(chunk: str):
+            async with self._connections:
+                return await self._synthesize_stream(chunk, voice, rate=rate)
+        
+        results = await asyncio.gather(*(limited(chunk) for chunk in chunks))
+        
+        audio_parts = []
+        word_timings = []
+        offset = 0.0
+        pause = settings.TTS_CHUNK_PAUSE_MS / 1000
+        for i, (audio, timings) in enumerate(results):
+            # Trim each chunk's own leading/trailing silence to half the pause,
+            # so every chunk boundary has the same gap
+            lead = None if i == 0 else pause / 2
+            tail = None if i == len(results) - 1 else pause / 2
+            audio, shift = self._trim_frames(audio, timings, lead, tail)
+            
+            for t in timings:
+                word_timings.append({
+                    "word": t["word"],
+                    "start": t["start"] - shift + offset,
+                    "end": t["end"] - shift + offset
+                })
+            audio_parts.append(audio)
+            offset += len(audio) / EDGE_TTS_BYTES_PER_SECOND
+        
+        return b"".join(audio_parts), word_timings
+
+    @staticmethod
+    def _trim_frames(audio: bytes, timings: List[Dict], lead: Optional[float], tail: Optional[float]) -> Tuple[bytes, float]:
+        """
+        Cut whole MP3 frames of silence so at most `lead` seconds remain
+        before the first word and `tail` after the last (None = keep all).
+        Returns (audio, seconds removed from the start).
+        """
+        if not timings or len(audio) % MP3_FRAME_BYTES or audio[:1] != b"\xff":
+            return audio, 0.0  # Not the CBR stream we expect; leave untouched
+        
+        frames = len(audio) // MP3_FRAME_BYTES
+        first = 0
+        last = frames
+        if lead is not None:
+            first = max(0, int((timings[0]["start"] - lead) / MP3_FRAME_SECONDS))
+        if tail is not None:
+            last = min(frames, math.ceil((timings[-1]["end"] + tail) / MP3_FRAME_SECONDS))
+        if last <= first:
+            return audio, 0.0
+        return audio[first * MP3_FRAME_BYTES:last * MP3_FRAME_BYTES], first * MP3_FRAME_SECONDS
+
+    @with_retry(max_attempts=3)
+    async def _synthesize_stream(self, text: str, voice: str, rate: Optional[str] = None) -> Tuple[bytes, List[Dict]]:
+        """
+        One edge-tts request, bounded by a deadline derived from text length.
+        If it runs longer than the hedge threshold (a high percentile of past
+        latency per character), a second identical request is started on a
+        fresh connection and whichever finishes first is used.
+        Returns (mp3_bytes, word_timings).
+        """
+        deadline = settings.TTS_DEADLINE_BASE_SECONDS + settings.TTS_DEADLINE_PER_CHAR_SECONDS * len(text)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        deadline_at = started + deadline
+        
+        tasks = {asyncio.ensure_future(self._stream_once(text, voice, rate=rate))}
+        hedge_after = self._hedge_threshold(text)
+        hedged = None
+        try:
+            while True:
+                timeout = deadline_at - loop.time()
+                if hedged is None and hedge_after is not None:
+                    timeout = min(timeout, started + hedge_after - loop.time())
+                done, _ = await asyncio.wait(tasks, timeout=max(0.0, timeout), return_when=asyncio.FIRST_COMPLETED)
+                
+                for task in done:
+                    tasks.discard(task)
+                    if task.exception() is None:
+                        if task is hedged:
+                            metrics.increment("tts.hedge_wins")
+                        elapsed = loop.time() - started
+                        metrics.observe("tts.latency_seconds", elapsed)
+                        metrics.observe("tts.latency_per_char", elapsed / max(len(text), 1))
+                        return task.result()
+                    if not tasks:
+                        raise task.exception()
+                
+                if loop.time() >= deadline_at:
+                    metrics.increment("tts.deadline_exceeded")
+                    raise asyncio.TimeoutError(f"edge-tts exceeded {deadline:.1f}s deadline for {len(text)} chars")
+                
+                if hedged is None and hedge_after is not None and loop.time() >= started + hedge_after:
+                    logger.info(f"TTS request slower than p{settings.TTS_HEDGE_PERCENTILE:g} ({hedge_after:.1f}s), hedging")
+                    metrics.increment("tts.hedges")
+                    hedged = asyncio.ensure_future(self._stream_once(text, voice, rate=rate))
+                    tasks.add(hedged)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _hedge_threshold(self, text: str) -> Optional[float]:
+        """Seconds after which to hedge this request, or None (disabled / too few samples)."""
+        if settings.TTS_HEDGE_PERCENTILE <= 0:
+            return None
+        if len(metrics.samples.get("tts.latency_per_char", ())) < settings.TTS_HEDGE_MIN_SAMPLES:
+            return None
+        return metrics.percentile("tts.latency_per_char", settings.TTS_HEDGE_PERCENTILE) * max(len(text), 1)
+
+    async def _stream_once(self, text: str, voice: str, rate: Optional[str] = None) -> Tuple[bytes, List[Dict]]:
+        """
+        Read one edge-tts stream, failing if no chunk arrives within TTS_STALL_SECONDS.
+        """
+        communicate = edge_tts.Communicate(text, voice, rate=rate or settings.TTS_RATE)
+        stream = communicate.stream()
+        
+        audio = bytearray()
+        word_timings = []
+        
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), timeout=settings.TTS_STALL_SECONDS)
+                except StopAsyncIteration:
+                    break
+                except asyncio.TimeoutError:
+                    metrics.increment("tts.stalls")
+                    raise asyncio.TimeoutError(f"edge-tts stream stalled for {settings.TTS_STALL_SECONDS:g}s")
+                
+                if chunk["type"] == "audio":
+                    audio.extend(chunk["data"])
+                elif chunk["type"] == "WordBoundary":
+                    # Offset/duration are in 100-nanosecond units (ticks).
+                    # 1 second = 10,000,000 ticks.
+                    start_sec = chunk["offset"] / 10_000_000
+                    dur_sec = chunk["duration"] / 10_000_000
+                    
+                    word_timings.append({
+                        "word": chunk["text"],
+                        "start": start_sec,
+                        "end": start_sec + dur_sec
+                    })
+        finally:
+            await stream.aclose()
+        
+        return bytes(audio), word_timings
+
+class LocalTTSBackend:
+    """
+    Offline espeak-ng engine run as a bounded pool of subprocesses
+    (TTS_LOCAL_WORKERS at once). Each sentence is rendered separately, so
+    sentence start/end times are exact; words within a sentence are spread
+    over its voiced region in proportion to their length.
+    """
+    name = "espeak"
+
+    # edge voice -> espeak-ng voice+variant of the same accent and gender
+    EDGE_VOICE_MAP = {
+        "en-US-GuyNeural": "espeak:en-us+m3",
+        "en-US-ChristopherNeural": "espeak:en-us+m1",
+        "en-US-EricNeural": "espeak:en-us+m2",
+        "en-US-AriaNeural": "espeak:en-us+f3",
+        "en-US-JennyNeural": "espeak:en-us+f1",
+        "en-US-MichelleNeural": "espeak:en-us+f2",
+    }
+
+    def __init__(self):
+        self.voices = list(dict.fromkeys(self.EDGE_VOICE_MAP.values()))
+        self._workers: Optional[asyncio.Semaphore] = None
+
+    def voice_for(self, voice: str) -> str:
+        if voice in self.voices:
+            return voice
+        return self.EDGE_VOICE_MAP.get(voice, "espeak:en-us+m3")
+
+    @staticmethod
+    def _words_per_minute(rate: Optional[str] = None) -> int:
+        """ESPEAK_WPM scaled by an edge-style prosody rate ("+10%")."""
+        return max(80, round(settings.ESPEAK_WPM * (1 + rate_percent(rate or settings.TTS_RATE) / 100)))
+
+    async def synthesize(self, text: str, voice: str, rate: Optional[str] = None) -> Tuple[bytes, List[Dict]]:
+        if self._workers is None:
+            self._workers = asyncio.Semaphore(settings.TTS_LOCAL_WORKERS)
+        
+        espeak_voice = voice.split(":", 1)[-1]
+        sentences = [s for s in re.split(r'(?<=[.!?])\s+', text.strip()) if s]
+        words_per_minute = self._words_per_minute(rate)
+        rendered = await asyncio.gather(*(self._render(s, espeak_voice, words_per_minute) for s in sentences))
+        
+        sample_rate = rendered[0][1] if rendered else 22050
+        pcm_parts = []
+        word_timings = []
+        offset = 0.0
+        for sentence, (pcm, pcm_rate) in zip(sentences, rendered):
+            word_timings.extend(self._spread_words(sentence, pcm, pcm_rate, offset))
+            pcm_parts.append(pcm)
+            offset += len(pcm) / pcm_rate
+        
+        pcm = np.concatenate(pcm_parts) if pcm_parts else np.zeros(0, dtype=np.int16)
+        audio = await self._encode_mp3(pcm, sample_rate)
+        for t in word_timings:
+            t["start"] += LAME_DELAY_SECONDS
+            t["end"] += LAME_DELAY_SECONDS
+        return audio, word_timings
+
+    @staticmethod
+    def _spread_words(sentence: str, pcm: np.ndarray, rate: int, offset: float) -> List[Dict]:
+        """Word timings for one sentence: its voiced span split by word length."""
+        words = sentence.split()
+        if not words:
+            return []
+        voiced = np.flatnonzero(np.abs(pcm.astype(np.int32)) > SILENCE_THRESHOLD)
+        if len(voiced):
+            start, end = voiced[0] / rate, (voiced[-1] + 1) / rate
+        else:
+            start, end = 0.0, len(pcm) / rate
+        
+        weights = [len(w) + 1 for w in words]
+        per_unit = (end - start) / sum(weights)
+        timings = []
+        cursor = start
+        for word, weight in zip(words, weights):
+            timings.append({"word": word, "start": offset + cursor, "end": offset + cursor + weight * per_unit})
+            cursor += weight * per_unit
+        return timings
+
+    async def _render(self, sentence: str, espeak_voice: str, words_per_minute: int) -> Tuple[np.ndarray, int]:
+        """One espeak-ng process for one sentence. Returns (int16 samples, sample_rate)."""
+        async with self._workers:
+            proc = await asyncio.create_subprocess_exec(
+                settings.ESPEAK_PATH, "-v", espeak_voice, "-s", str(words_per_minute),
+                "--stdin", "--stdout",
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+            out, err = await proc.communicate(sentence.encode("utf-8"))
+        if proc.returncode != 0:
+            raise RuntimeError(f"espeak-ng failed ({proc.returncode}): {err.decode(errors='replace').strip()}")
+        return self._parse_wav(out)
+
+    @staticmethod
+    def _parse_wav(data: bytes) -> Tuple[np.ndarray, int]:
+        """
+        Parse espeak-ng's streamed 16-bit mono WAV. The header's size fields
+        are placeholders when writing to a pipe, so read to the end of data.
+        """
+        if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+            raise ValueError("espeak-ng did not return a WAV stream")
+        sample_rate = int.from_bytes(data[24:28], "little")
+        pos = 12
+        while pos + 8 <= len(data):
+            chunk_id = data[pos:pos + 4]
+            size = int.from_bytes(data[pos + 4:pos + 8], "little")
+            if chunk_id == b"data":
+                samples = data[pos + 8:]
+                samples = samples[:len(samples) - len(samples) % 2]
+                return np.frombuffer(samples, dtype="<i2").astype(np.int16), sample_rate
+            pos += 8 + size + (size % 2)
+        raise ValueError("WAV stream has no data chunk")
+
+    async def _encode_mp3(self, pcm: np.ndarray, sample_rate: int) -> bytes:
+        """
+        Encode to the same CBR MP3 as edge-tts (24kHz 48kbps mono, no
+        Xing/ID3 headers) so frame-based trimming and slicing still apply.
+        """
+        proc = await asyncio.create_subprocess_exec(
+            settings.FFMPEG_PATH or "ffmpeg", "-hide_banner", "-loglevel", "error",
+            "-f", "s16le", "-ar", str(sample_rate), "-ac", "1", "-i", "pipe:0",
+            "-ar", "24000", "-ac", "1", "-c:a", "libmp3lame", "-b:a", "48k",
+            "-write_xing", "0", "-id3v2_version", "0", "-f", "mp3", "pipe:1",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        out, err = await proc.communicate(pcm.astype("<i2").tobytes())
+        if proc.returncode != 0:
+            raise RuntimeError(f"ffmpeg MP3 encode failed: {err.decode(errors='replace').strip()}")
+        return out
+
+def create_backend(name: str) -> TTSBackend:
+    backends = {"edge": EdgeTTSBackend, "espeak": LocalTTSBackend}
+    if name not in backends:
+        raise ValueError(f"Unknown TTS backend '{name}' (choose from {', '.join(backends)})")
+    return backends[name]()
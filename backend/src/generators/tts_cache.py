@@ -0,0 +1,131 @@
+
+import hashlib
+import json
+import os
+import shutil
+import unicodedata
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from src.config import settings
+from src.utils.helpers import file_checksum
+from src.utils.logger import logger
+from src.utils.metrics import metrics
+
+class TTSCache:
+    """
+    Content-addressed on-disk cache of synthesized audio.
+    Key: sha256 of (normalized text, voice, rate, pitch). Each entry is
+    <key>.mp3 plus <key>.json (checksum, duration, voice, word timings).
+    Entries are evicted least-recently-used once the size budget is exceeded.
+    """
+
+    def __init__(self, cache_dir: Path = None, max_bytes: int = None):
+        self.cache_dir = Path(cache_dir or settings.TTS_CACHE_DIR)
+        self.max_bytes = max_bytes if max_bytes is not None else settings.TTS_CACHE_MAX_MB * 1024 * 1024
+
+    @staticmethod
+    def make_key(text: str, voice: str, rate: str = "+0%", pitch: str = "+0Hz") -> str:
+        normalized = " ".join(unicodedata.normalize("NFC", text).split())
+        payload = json.dumps([normalized, voice, rate, pitch], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _paths(self, key: str):
+        shard = self.cache_dir / key[:2]
+        return shard / f"{key}.mp3", shard / f"{key}.json"
+
+    def has(self, key: str) -> bool:
+        """Cheap existence check (no integrity verification, no metrics)."""
+        audio_path, meta_path = self._paths(key)
+        return audio_path.exists() and meta_path.exists()
+
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Returns {"audio_path", "duration", "voice", "word_timings"} or None.
+        Corrupt entries (size or checksum mismatch) are removed and count as misses.
+        """
+        audio_path, meta_path = self._paths(key)
+        if not meta_path.exists() or not audio_path.exists():
+            metrics.increment("tts_cache.misses")
+            return None
+
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            if audio_path.stat().st_size != meta["size"] or file_checksum(audio_path) != meta["sha256"]:
+                raise ValueError("checksum mismatch")
+        except Exception as e:
+            logger.warning(f"Dropping corrupt TTS cache entry {key[:12]}: {e}")
+            self._remove(key)
+            metrics.increment("tts_cache.corrupt")
+            metrics.increment("tts_cache.misses")
+            return None
+
+        # Touch for LRU ordering
+        os.utime(meta_path)
+        metrics.increment("tts_cache.hits")
+        return {
+            "audio_path": str(audio_path),
+            "duration": meta["duration"],
+            "voice": meta["voice"],
+            "word_timings": meta["word_timings"],
+        }
+
+    def put(self, key: str, source_audio_path: str, duration: float, voice: str, word_timings: List[Dict]) -> None:
+        """Copy a finished audio file into the cache (atomic per file)."""
+        audio_path, meta_path = self._paths(key)
+        try:
+            audio_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_audio = audio_path.with_suffix(f".mp3.{os.getpid()}.tmp")
+            shutil.copyfile(source_audio_path, tmp_audio)
+            os.replace(tmp_audio, audio_path)
+
+            meta = {
+                "size": audio_path.stat().st_size,
+                "sha256": file_checksum(audio_path),
+                "duration": duration,
+                "voice": voice,
+                "word_timings": word_timings,
+            }
+            tmp_meta = meta_path.with_suffix(f".json.{os.getpid()}.tmp")
+            tmp_meta.write_text(json.dumps(meta), encoding="utf-8")
+            os.replace(tmp_meta, meta_path)
+            metrics.increment("tts_cache.writes")
+        except Exception as e:
+            logger.warning(f"Failed to write TTS cache entry {key[:12]}: {e}")
+            self._remove(key)
+            return
+
+        self._evict()
+
+    def _remove(self, key: str) -> None:
+        for path in self._paths(key):
+            try:
+                path.unlink(missing_ok=True)
+            except OSError:
+                pass
+
+    def _evict(self) -> None:
+        """Delete least recently used entries until under the size budget."""
+        entries = []
+        total = 0
+        for meta_path in self.cache_dir.glob("*/*.json"):
+            audio_path = meta_path.with_suffix(".mp3")
+            try:
+                size = meta_path.stat().st_size + (audio_path.stat().st_size if audio_path.exists() else 0)
+                entries.append((meta_path.stat().st_mtime, meta_path.stem, size))
+                total += size
+            except OSError:
+                continue
+
+        if total > self.max_bytes:
+            for _, key, size in sorted(entries):
+                self._remove(key)
+                total -= size
+                metrics.increment("tts_cache.evictions")
+                if total <= self.max_bytes:
+                    break
+
+        metrics.set("tts_cache.bytes", total)
+
+# Global instance
+tts_cache = TTSCache()
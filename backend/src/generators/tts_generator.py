@@ -1,24 +1,41 @@
-
+import os
 import random
-import edge_tts
-from typing import Tuple, List, Dict
+import shutil
+import tempfile
+from typing import Tuple, List, Dict, Optional
 
 from src.config import settings
 from src.utils.logger import logger
-from src.utils.retry import with_retry
+from src.utils.metrics import metrics
+from src.generators.tts_backends import (
+    MP3_FRAME_BYTES, MP3_FRAME_SECONDS, EdgeTTSBackend, TTSBackend, create_backend, scale_rate
+)
+from src.generators.tts_cache import tts_cache
+from src.generators.word_aligner import word_aligner
 
 class TTSGenerator:
     def __init__(self):
-        # Edge TTS voices (High Quality Neural)
-        # We can dynamically fetch these, but for speed we list popular English ones
-        self.voices = [
-            "en-US-GuyNeural",
-            "en-US-ChristopherNeural",
-            "en-US-EricNeural",
-            "en-US-AriaNeural",
-            "en-US-JennyNeural",
-            "en-US-MichelleNeural"
-        ]
+        # Primary engine (TTS_BACKEND) and optional fallback used when it fails
+        self.backend: TTSBackend = create_backend(settings.TTS_BACKEND)
+        self.fallback: Optional[TTSBackend] = None
+        if settings.TTS_FALLBACK_BACKEND and settings.TTS_FALLBACK_BACKEND != settings.TTS_BACKEND:
+            self.fallback = create_backend(settings.TTS_FALLBACK_BACKEND)
+
+    @property
+    def voices(self) -> List[str]:
+        return self.backend.voices
+
+    def _resolve_voice(self, voice: str) -> str:
+        """The voice itself if a configured backend owns it, else the primary's closest voice."""
+        if voice in self.backend.voices or (self.fallback and voice in self.fallback.voices):
+            return voice
+        return self.backend.voice_for(voice)
+
+    def _backend_for(self, voice: str) -> TTSBackend:
+        """The configured backend that owns this voice (the primary if neither does)."""
+        if self.fallback and voice in self.fallback.voices and voice not in self.backend.voices:
+            return self.fallback
+        return self.backend
 
     def _get_random_voice(self) -> str:
         """
@@ -34,56 +51,126 @@ class TTSGenerator:
             
         return random.choice(self.voices)
 
-    @with_retry(max_attempts=3)
-    async def generate_audio(self, text: str, output_path: str) -> Tuple[float, str, List[Dict]]:
+    async def generate_audio(
+        self, text: str, output_path: str, voice: Optional[str] = None, tempo: float = 1.0
+    ) -> Tuple[float, str, List[Dict]]:
         """
-        Generate audio from text using Edge TTS.
+        Generate audio from text with the voice's backend.
+        voice is normally the one chosen at split time; random if not given.
+        Unchanged (text, voice, rate) is served from the on-disk TTS cache.
+        If the backend fails and a fallback backend is configured, the text is
+        synthesized with the fallback's closest voice instead.
+        tempo > 1 speaks faster than TTS_RATE (via the prosody rate, not
+        time-stretching).
         Returns: (duration_seconds, voice_name, word_timings)
         """
-        voice = self._get_random_voice()
-        communicate = edge_tts.Communicate(text, voice)
+        voice = self._resolve_voice(voice or self._get_random_voice())
+        backend = self._backend_for(voice)
+        rate = scale_rate(settings.TTS_RATE, tempo) if tempo != 1.0 else settings.TTS_RATE
         
-        word_timings = []
-        duration_sec = 0.0
+        cached = self._from_cache(text, voice, rate, output_path)
+        if cached:
+            return cached
         
-        # We need to capture audio and timing events
-        # edge-tts streaming yields (offset, chunk, type) or similar objects
-        # Official API: 
-        # async for chunk in communicate.stream():
-        #   if chunk["type"] == "audio": ...
-        #   elif chunk["type"] == "WordBoundary": ...
+        try:
+            audio, word_timings = await backend.synthesize(text, voice, rate=rate)
+        except Exception as e:
+            if not self.fallback or backend is self.fallback:
+                raise
+            fallback_voice = self.fallback.voice_for(voice)
+            logger.warning(f"{backend.name} TTS failed ({e}); falling back to {self.fallback.name} voice {fallback_voice}")
+            metrics.increment("tts.fallbacks")
+            backend, voice = self.fallback, fallback_voice
+            cached = self._from_cache(text, voice, rate, output_path)
+            if cached:
+                return cached
+            audio, word_timings = await backend.synthesize(text, voice, rate=rate)
         
         with open(output_path, "wb") as f:
-            async for chunk in communicate.stream():
-                if chunk["type"] == "audio":
-                    f.write(chunk["data"])
-                elif chunk["type"] == "WordBoundary":
-                    # Chunk structure: 
-                    # {
-                    #   "type": "WordBoundary",
-                    #   "offset": 12345 (ticks? 100ns units usually),
-                    #   "duration": 123,
-                    #   "text": "word"
-                    # }
-                    # Microsoft typically uses 100-nanosecond units (ticks) for offset/duration.
-                    # 1 second = 10,000,000 ticks.
-                    
-                    start_sec = chunk["offset"] / 10_000_000
-                    dur_sec = chunk["duration"] / 10_000_000
-                    
-                    word_timings.append({
-                        "word": chunk["text"],
-                        "start": start_sec,
-                        "end": start_sec + dur_sec
-                    })
-                    
-                    # Track max duration from last word end
-                    if (start_sec + dur_sec) > duration_sec:
-                        duration_sec = start_sec + dur_sec
-
-        logger.info(f"Generated TTS audio ({duration_sec:.2f}s) with voice {voice}")
+            f.write(audio)
+        
+        # Track max duration from last word end
+        duration_sec = max((t["end"] for t in word_timings), default=0.0)
+        
+        logger.info(f"Generated TTS audio ({duration_sec:.2f}s) with {backend.name} voice {voice} at rate {rate}")
+        tts_cache.put(tts_cache.make_key(text, voice, rate), output_path, duration_sec, voice, word_timings)
         
         return duration_sec, voice, word_timings
 
+    def _from_cache(self, text: str, voice: str, rate: str, output_path: str) -> Optional[Tuple[float, str, List[Dict]]]:
+        cached = tts_cache.get(tts_cache.make_key(text, voice, rate))
+        if not cached:
+            return None
+        shutil.copyfile(cached["audio_path"], output_path)
+        logger.info(f"TTS cache hit ({cached['duration']:.2f}s, voice {voice})")
+        return cached["duration"], voice, cached["word_timings"]
+
+    async def synthesize_story(self, part_texts: List[str], voice: str) -> bool:
+        """
+        Synthesize all parts of a story in one edge-tts request, then cut the
+        audio between parts at word-boundary offsets (on MP3 frame edges).
+        Each slice, with timings rebased to zero, is stored in the TTS cache
+        under its part's key, so generate_audio for each part becomes a hit.
+        Returns False if nothing was cached (caller falls back to per part).
+        Only edge-tts benefits; local backends return False.
+        """
+        voice = self._resolve_voice(voice)
+        backend = self._backend_for(voice)
+        if not isinstance(backend, EdgeTTSBackend):
+            return False
+        
+        keys = [tts_cache.make_key(text, voice, settings.TTS_RATE) for text in part_texts]
+        if all(tts_cache.has(key) for key in keys):
+            return True
+        
+        full_text = " ".join(part_texts)
+        audio, word_timings = await backend.synthesize_single(full_text, voice)
+        if not word_timings or len(audio) % MP3_FRAME_BYTES or audio[:1] != b"\xff":
+            logger.warning("Story-level TTS output is not frame-aligned CBR MP3; falling back to per-part synthesis")
+            return False
+        
+        # First boundary spoken for each part, via token alignment on the full text
+        token_spans, owned = word_aligner.align(full_text, word_timings)
+        part_starts = []
+        cursor = 0
+        for text in part_texts:
+            part_starts.append(cursor)
+            cursor += len(text) + 1
+        first_boundary = [None] * len(part_texts)
+        part_idx = 0
+        for (start, _), span in zip(token_spans, owned):
+            while part_idx + 1 < len(part_texts) and start >= part_starts[part_idx + 1]:
+                part_idx += 1
+            if span is not None and first_boundary[part_idx] is None:
+                first_boundary[part_idx] = span[0]
+        if None in first_boundary or first_boundary != sorted(first_boundary):
+            logger.warning("Could not locate every part in story-level TTS; falling back to per-part synthesis")
+            return False
+        
+        # Cut midway through the pause before each part's first word
+        total_frames = len(audio) // MP3_FRAME_BYTES
+        cut_frames = [0]
+        for b in first_boundary[1:]:
+            gap_mid = (word_timings[b - 1]["end"] + word_timings[b]["start"]) / 2
+            cut_frames.append(min(total_frames, round(gap_mid / MP3_FRAME_SECONDS)))
+        cut_frames.append(total_frames)
+        boundary_ranges = list(zip(first_boundary, first_boundary[1:] + [len(word_timings)]))
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            for i, (key, (b0, b1)) in enumerate(zip(keys, boundary_ranges)):
+                offset = cut_frames[i] * MP3_FRAME_SECONDS
+                part_timings = [
+                    {"word": t["word"], "start": t["start"] - offset, "end": t["end"] - offset}
+                    for t in word_timings[b0:b1]
+                ]
+                part_path = os.path.join(tmp_dir, f"part_{i}.mp3")
+                with open(part_path, "wb") as f:
+                    f.write(audio[cut_frames[i] * MP3_FRAME_BYTES:cut_frames[i + 1] * MP3_FRAME_BYTES])
+                duration = max((t["end"] for t in part_timings), default=0.0)
+                tts_cache.put(key, part_path, duration, voice, part_timings)
+        
+        logger.info(f"Story-level TTS: 1 request for {len(part_texts)} parts (voice {voice})")
+        return True
+
 # Global instance
 tts_engine = TTSGenerator()
@@ -1,32 +1,20 @@
-
-import os
 import random
 from pathlib import Path
-from typing import Optional
-
-from moviepy.editor import VideoFileClip, AudioFileClip, ColorClip, ImageClip
+from typing import Dict, List, Optional, Tuple
 
+import numpy as np
 
 from src.config import settings
 from src.utils.logger import logger
 from src.database.connection import get_db_session
 from src.database.queries import DBQueries
+from src.generators.gameplay_library import gameplay_library
+from src.generators.render_engine import render_engine
 
 class VideoGenerator:
     def __init__(self):
-        # Configure FFmpeg path for MoviePy if provided
-        if settings.FFMPEG_PATH:
-            logger.info(f"Setting MoviePy FFmpeg binary to: {settings.FFMPEG_PATH}")
-            # MoviePy uses an internal config/env variable for binary path
-            os.environ["IMAGEIO_FFMPEG_EXE"] = settings.FFMPEG_PATH
-            # Also try to set for moviepy specifically if IMAGEIO_FFMPEG_EXE isn't enough
-            # We can't import moviepy.config directly until after importing it generally
-            # But we can try to find and set it.
-            try:
-                from moviepy.config import change_settings
-                change_settings({"FFMPEG_BINARY": settings.FFMPEG_PATH})
-            except Exception as e:
-                logger.warning(f"Failed to set MoviePy FFMPEG_BINARY explicitly: {e}")
+        self.render_engine = render_engine
+        self.gameplay_library = gameplay_library
 
     async def generate_video(
         self, 
@@ -34,110 +22,81 @@ class VideoGenerator:
         subtitle_path: str, 
         output_path: str,
         duration: float,
-        gameplay_video_id: str = None
+        gameplay_video_id: str = None,
+        audio_samples: Optional[Tuple[np.ndarray, int]] = None,
+        variants: Optional[List[Dict]] = None
     ) -> Optional[str]:
         """
-        Generate final video using MoviePy.
+        Generate final video with one FFmpeg pass (see RenderEngine).
+        audio_samples is the already-mixed (float32 samples, sample_rate) from
+        AudioMixer; when given it is piped in instead of reading audio_path.
+        variants are extra formats (see output_variants; each with its own
+        subtitle_path and output_path) produced in the same pass.
         """
         try:
-            # 1. Load Audio
-            audio = AudioFileClip(audio_path)
-            
-            # 2. Get Gameplay Video
-            gameplay_path = await self._get_gameplay_video_path(gameplay_video_id)
-            if not gameplay_path:
-                logger.error("No gameplay video found")
-                return None
-                
-            video = VideoFileClip(gameplay_path)
-            
-            # 3. Process Video (Loop/Crop)
-            # Add 3 seconds for the outro
+            # Add the outro after the narration
             video_duration = duration + settings.OUTRO_DURATION_SECONDS
             
-            if video.duration < video_duration:
-                # Loop video
-                loops = int(video_duration / video.duration) + 1
-                video = video.loop(n=loops)
-            
-            # Crop to duration
-            video = video.subclip(0, video_duration)
-            
-            # Resize/Crop to 9:16 vertical
-            target_ratio = settings.VIDEO_WIDTH / settings.VIDEO_HEIGHT
-            current_ratio = video.w / video.h
-            
-            if current_ratio > target_ratio:
-                # Too wide
-                new_width = int(video.h * target_ratio)
-                center_x = video.w / 2
-                video = video.crop(
-                    x1=center_x - new_width/2, 
-                    x2=center_x + new_width/2
-                )
-            else:
-                # Too tall
-                new_height = int(video.w / target_ratio)
-                center_y = video.h / 2
-                video = video.crop(
-                    y1=center_y - new_height/2, 
-                    y2=center_y + new_height/2
-                )
-                
-            video = video.resize((settings.VIDEO_WIDTH, settings.VIDEO_HEIGHT))
-            
-            # 4. Mix Audio
-            video = video.set_audio(audio)
-            
-            # Export temp video without subtitles
-            temp_video_path = output_path.replace(".mp4", "_temp.mp4")
-            
-            logger.info(f"Exporting base video: {temp_video_path}")
-            video.write_videofile(
-                temp_video_path, 
-                codec='libx264', 
-                audio_codec='aac', 
-                fps=settings.VIDEO_FPS,
-                preset='ultrafast',
-                threads=4,
-                logger=None 
+            # Prefer random keyframe-aligned ranges of normalized library
+            # mezzanines; fall back to raw gameplay looped from the start
+            segments = await self.gameplay_library.plan(video_duration, gameplay_video_id)
+            gameplay_path = None
+            if not segments:
+                gameplay_path = await self._get_gameplay_video_path(gameplay_video_id)
+                if not gameplay_path:
+                    logger.error("No gameplay video found")
+                    return None
+            
+            return await self.render_engine.render(
+                gameplay_path,
+                subtitle_path,
+                output_path,
+                video_duration,
+                audio_path=audio_path,
+                audio_samples=audio_samples,
+                normalized=bool(segments),
+                segments=segments,
+                variants=variants
             )
-            
-            # Close clips to free memory
-            video.close()
-            audio.close()
-            
-            # 8. Burn Subtitles, Watermark, and Outro via FFmpeg (all in ASS file)
-
-            ass_path_unix = subtitle_path.replace('\\', '/').replace(':', '\\:')
-            
-            ffmpeg_bin = settings.FFMPEG_PATH or 'ffmpeg'
-            
-            import subprocess
-            cmd = [
-                ffmpeg_bin, '-y',
-                '-i', temp_video_path,
-                '-vf', f"ass='{ass_path_unix}'",
-                '-c:a', 'copy',
-                output_path
-            ]
-            
-            logger.info(f"Running FFmpeg: {' '.join(cmd)}")
-            subprocess.run(cmd, check=True)
-            
-            # Cleanup temp
-            if os.path.exists(temp_video_path):
-                os.remove(temp_video_path)
-                
-            return output_path
 
         except Exception as e:
             logger.error(f"Video generation failed: {e}")
-            # Ensure cleanup
-            if 'temp_video_path' in locals() and os.path.exists(temp_video_path):
-                os.remove(temp_video_path)
             return None
 
+    async def generate_batch(self, parts: List[Dict]) -> List[Optional[str]]:
+        """
+        Render several parts (dicts with audio_path, subtitle_path,
+        output_path, duration, audio_samples) with one FFmpeg process over
+        consecutive stretches of one gameplay plan. Parts without in-memory
+        audio, or a failed batch, fall back to per-part renders.
+        Returns the output path (or None) per part.
+        """
+        if len(parts) < 2 or any(p["audio_samples"] is None for p in parts):
+            return [await self.generate_video(**p) for p in parts]
+
+        try:
+            durations = [p["duration"] + settings.OUTRO_DURATION_SECONDS for p in parts]
+            segments = await self.gameplay_library.plan(sum(durations))
+            gameplay_path = None
+            if not segments:
+                gameplay_path = await self._get_gameplay_video_path()
+                if not gameplay_path:
+                    logger.error("No gameplay video found")
+                    return [None] * len(parts)
+            
+            return await self.render_engine.render_batch(
+                gameplay_path,
+                [
+                    (p["subtitle_path"], p["output_path"], duration, p["audio_samples"])
+                    for p, duration in zip(parts, durations)
+                ],
+                normalized=bool(segments),
+                segments=segments
+            )
+        except Exception as e:
+            logger.warning(f"Batch render of {len(parts)} parts failed, rendering separately: {e}")
+            return [await self.generate_video(**p) for p in parts]
+
     async def _get_gameplay_video_path(self, video_id: str = None) -> Optional[str]:
         """
         Get local path to a gameplay video.
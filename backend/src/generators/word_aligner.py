@@ -0,0 +1,212 @@
+import re
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+TOKEN_RE = re.compile(r"[\w'*@$]+")
+STRIP_RE = re.compile(r"[^\w*]")
+
+# How far (in tokens, per side) to look for the next exact match after a
+# mismatch; the window doubles up to MAX_GAP before giving up
+RESYNC_WINDOW = 6
+# Largest gap (tokens per side) handed to the DP, which keeps alignment
+# bounded when the streams diverge for good
+MAX_GAP = 24
+# Most spoken words one text token can own ("$1,234" -> "one thousand two hundred thirty four")
+MAX_GROUP = 8
+
+def normalize_token(token: str) -> str:
+    """Lowercase and drop punctuation/apostrophes ("Don't," -> "dont")."""
+    return STRIP_RE.sub("", token.lower())
+
+class WordAligner:
+    """
+    Aligns the words of a text with the edge-tts WordBoundary stream.
+
+    Exact token matches are used as anchors (linear time on clean text);
+    each mismatched gap between anchors is solved with a small DP that
+    splits the gap's boundaries into contiguous groups, one per text token.
+    This absorbs punctuation, numbers read as several words, and masks
+    like "****" that TTS skips or spells out. Gaps are at most MAX_GAP
+    tokens per side and groups at most MAX_GROUP words, so text that never
+    lines up again still aligns in linear time.
+    """
+
+    def align(self, text: str, word_timings: List[Dict]) -> Tuple[List[Tuple[int, int]], List[Optional[Tuple[int, int]]]]:
+        """
+        Returns (token_spans, owned) where token_spans are the (start, end)
+        character spans of the text tokens and owned[i] is the inclusive
+        range of boundary indices spoken for token i (None if not spoken).
+        """
+        token_spans = []
+        tokens = []
+        for m in TOKEN_RE.finditer(text):
+            norm = normalize_token(m.group())
+            if norm:
+                token_spans.append(m.span())
+                tokens.append(norm)
+
+        spoken = [normalize_token(t["word"]) for t in word_timings]
+        owned: List[Optional[Tuple[int, int]]] = [None] * len(tokens)
+
+        n, m = len(tokens), len(spoken)
+        i = j = 0
+        while i < n and j < m:
+            if tokens[i] == spoken[j]:
+                owned[i] = (j, j)
+                i += 1
+                j += 1
+                continue
+
+            di, dj = self._resync(tokens, spoken, i, j)
+            self._align_gap(tokens, spoken, i, i + di, j, j + dj, owned)
+            i += di
+            j += dj
+
+        if i < n and j < m:
+            self._align_gap(tokens, spoken, i, n, j, m, owned)
+
+        return token_spans, owned
+
+    def _resync(self, tokens: Sequence[str], spoken: Sequence[str], i: int, j: int) -> Tuple[int, int]:
+        """
+        Smallest (di, dj) such that tokens[i+di] == spoken[j+dj] again,
+        confirmed by the following pair, searching ever wider windows up to
+        MAX_GAP. Falls back to the rest of both streams when that is short,
+        else to a MAX_GAP-sized step that keeps their relative pace.
+        """
+        n, m = len(tokens), len(spoken)
+        window = RESYNC_WINDOW
+        while True:
+            for d in range(1, 2 * window + 1):
+                for di in range(max(0, d - window), min(d, window) + 1):
+                    dj = d - di
+                    a, b = i + di, j + dj
+                    if a >= n or b >= m or tokens[a] != spoken[b]:
+                        continue
+                    if a + 1 >= n or b + 1 >= m or tokens[a + 1] == spoken[b + 1]:
+                        return di, dj
+            if window >= MAX_GAP:
+                break
+            window = min(window * 2, MAX_GAP)
+
+        rest_tokens, rest_spoken = n - i, m - j
+        longest = max(rest_tokens, rest_spoken)
+        if longest <= MAX_GAP:
+            return rest_tokens, rest_spoken
+        return max(1, round(rest_tokens * MAX_GAP / longest)), max(1, round(rest_spoken * MAX_GAP / longest))
+
+    def _align_gap(
+        self, tokens: Sequence[str], spoken: Sequence[str],
+        i0: int, i1: int, j0: int, j1: int,
+        owned: List[Optional[Tuple[int, int]]]
+    ) -> None:
+        """
+        DP over the gap: assign spoken[j0:j1] as contiguous (possibly empty)
+        groups of at most MAX_GROUP words to tokens[i0:i1] in order,
+        minimizing mismatch cost. Spoken words no group can take are left
+        unowned at the cost of an unspoken token.
+        """
+        gap_tokens = tokens[i0:i1]
+        gap_spoken = spoken[j0:j1]
+        nt, ns = len(gap_tokens), len(gap_spoken)
+        if nt == 0 or ns == 0:
+            return
+
+        inf = float("inf")
+        # cost[a][b]: first a tokens consumed first b spoken words;
+        # back[a][b] is the group start k, or -1 if spoken[b-1] was skipped
+        cost = [[inf] * (ns + 1) for _ in range(nt + 1)]
+        back = [[-1] * (ns + 1) for _ in range(nt + 1)]
+        for b in range(ns + 1):
+            cost[0][b] = float(b)
+        for a in range(1, nt + 1):
+            token = gap_tokens[a - 1]
+            for b in range(ns + 1):
+                best, best_k = inf, -1
+                for k in range(max(0, b - MAX_GROUP), b + 1):  # group = spoken[k:b]
+                    c = cost[a - 1][k] + self._group_cost(token, gap_spoken[k:b])
+                    if c < best:
+                        best, best_k = c, k
+                if b and cost[a][b - 1] + 1.0 < best:
+                    best, best_k = cost[a][b - 1] + 1.0, -1
+                cost[a][b] = best
+                back[a][b] = best_k
+
+        a, b = nt, ns
+        while a:
+            k = back[a][b]
+            if k < 0:
+                b -= 1
+                continue
+            if k < b:
+                owned[i0 + a - 1] = (j0 + k, j0 + b - 1)
+            a, b = a - 1, k
+
+    @staticmethod
+    def _group_cost(token: str, group: Sequence[str]) -> float:
+        if not group:
+            return 1.0  # token not spoken
+        if set(token) == {"*"}:
+            return 0.5 * (len(group) - 1)  # masks absorb whatever TTS said for them
+        joined = "".join(group)
+        if joined == token:
+            return 0.0
+        prefix = 0
+        for x, y in zip(joined, token):
+            if x != y:
+                break
+            prefix += 1
+        return 1.0 + len(group) - 1 - prefix / max(len(token), 1)
+
+    def bleep_intervals(
+        self, text: str, spans: List[Tuple[int, int]], word_timings: List[Dict]
+    ) -> Tuple[List[Tuple[float, float]], Set[int]]:
+        """
+        Map censor character spans in text onto audio time.
+        Returns ((start_sec, end_sec) intervals, boundary indices to mask).
+        Tokens TTS did not speak get the silence between their neighbours.
+        """
+        if not spans or not word_timings:
+            return [], set()
+
+        token_spans, owned = self.align(text, word_timings)
+        intervals = []
+        masked: Set[int] = set()
+
+        span_idx = 0
+        for t, (t_start, t_end) in enumerate(token_spans):
+            while span_idx < len(spans) and spans[span_idx][1] <= t_start:
+                span_idx += 1
+            if span_idx == len(spans):
+                break
+            s_start, s_end = spans[span_idx]
+            if not (t_start < s_end and t_end > s_start):
+                continue
+
+            if owned[t] is not None:
+                first, last = owned[t]
+                intervals.append((word_timings[first]["start"], word_timings[last]["end"]))
+                masked.update(range(first, last + 1))
+            else:
+                prev_end = next(
+                    (word_timings[owned[p][1]]["end"] for p in range(t - 1, -1, -1) if owned[p]), 0.0
+                )
+                next_start = next(
+                    (word_timings[owned[q][0]]["start"] for q in range(t + 1, len(owned)) if owned[q]),
+                    prev_end
+                )
+                intervals.append((prev_end, max(prev_end, next_start)))
+
+        return self._merge(intervals), masked
+
+    @staticmethod
+    def _merge(intervals: List[Tuple[float, float]]) -> List[Tuple[float, float]]:
+        merged: List[Tuple[float, float]] = []
+        for start, end in sorted(intervals):
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+            else:
+                merged.append((start, end))
+        return merged
+
+# Global instance
+word_aligner = WordAligner()
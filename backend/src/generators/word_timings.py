@@ -0,0 +1,70 @@
+import struct
+import zlib
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+# Blob layout: header, float32 starts[n], float32 ends[n], zlib(words joined by WORD_SEP)
+MAGIC = b"WTS1"
+HEADER = struct.Struct("<4sI")
+WORD_SEP = "\x1f"
+
+class WordTimings:
+    """
+    Compact word timings: parallel float32 start/end arrays (seconds) plus a
+    word table. Serialized as one small blob stored on the AudioFile row,
+    so subtitles, bleeps and re-renders can reload a part's timings without
+    a TTS call. Loading is a zero-copy view over the blob.
+    """
+
+    def __init__(self, words: Sequence[str], starts: np.ndarray, ends: np.ndarray):
+        if not (len(words) == len(starts) == len(ends)):
+            raise ValueError("words, starts and ends must have the same length")
+        self.words = list(words)
+        self.starts = np.asarray(starts, dtype=np.float32)
+        self.ends = np.asarray(ends, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    @property
+    def duration(self) -> float:
+        return float(self.ends.max()) if len(self.ends) else 0.0
+
+    @classmethod
+    def from_dicts(cls, word_timings: List[Dict]) -> "WordTimings":
+        return cls(
+            [t["word"] for t in word_timings],
+            np.fromiter((t["start"] for t in word_timings), dtype=np.float32, count=len(word_timings)),
+            np.fromiter((t["end"] for t in word_timings), dtype=np.float32, count=len(word_timings)),
+        )
+
+    def to_dicts(self) -> List[Dict]:
+        """The [{"word", "start", "end"}] form used by the aligner and subtitles."""
+        return [
+            {"word": w, "start": s, "end": e}
+            for w, s, e in zip(self.words, self.starts.tolist(), self.ends.tolist())
+        ]
+
+    def to_bytes(self) -> bytes:
+        if any(WORD_SEP in w for w in self.words):
+            raise ValueError("word contains the separator character")
+        words = zlib.compress(WORD_SEP.join(self.words).encode("utf-8"))
+        return (
+            HEADER.pack(MAGIC, len(self.words))
+            + self.starts.astype("<f4").tobytes()
+            + self.ends.astype("<f4").tobytes()
+            + words
+        )
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> "WordTimings":
+        magic, count = HEADER.unpack_from(blob)
+        if magic != MAGIC:
+            raise ValueError("not a word timing blob")
+        offset = HEADER.size
+        starts = np.frombuffer(blob, dtype="<f4", count=count, offset=offset)
+        ends = np.frombuffer(blob, dtype="<f4", count=count, offset=offset + 4 * count)
+        text = zlib.decompress(blob[offset + 8 * count:]).decode("utf-8")
+        words = text.split(WORD_SEP) if count else []
+        return cls(words, starts, ends)
@@ -14,15 +14,60 @@ from src.database.queries import DBQueries
 # Components
 from src.scrapers.reddit_scraper import scraper
 from src.processors.story_processor import processor
+from src.ai.gemini_client import gemini_client
 from src.generators.tts_generator import tts_engine
 from src.generators.audio_mixer import audio_mixer
+from src.generators.pause_trimmer import pause_trimmer
+from src.generators.word_aligner import word_aligner
+from src.generators.word_timings import WordTimings
+from src.processors.censor import censor_engine
 from src.generators.subtitle_generator import subtitle_generator
 from src.generators.video_generator import video_generator
+from src.generators.gameplay_library import gameplay_library
+from src.generators.render_engine import render_engine
+from src.generators.output_variants import output_variants, variant_path
 from src.uploaders.drive_uploader import drive_uploader
 from src.uploaders.youtube_uploader import youtube_uploader
 from src.notifiers.email_notifier import email_notifier
 
-from src.database.models import StoryPart, Video
+from sqlalchemy import update
+
+from src.database.models import AudioFile, StoryPart, Video
+
+# Narration of parts that failed after TTS is kept this long for their retry
+NARRATION_KEEP_SECONDS = 3 * 24 * 3600
+
+async def load_narration(part, audio_path: str):
+    """
+    (audio_file_id, voice, tempo, word_timings) of the narration an earlier,
+    unfinished attempt stored for this part, if its file is still at
+    audio_path and the text is unchanged; None otherwise.
+    """
+    async with get_db_session() as session:
+        audio = await DBQueries(session).get_part_audio(part.id)
+    if (
+        not audio or audio.local_path != audio_path or not os.path.exists(audio_path)
+        or audio.character_count != len(part.content)
+    ):
+        return None
+    return audio.id, audio.voice_name, audio.tempo_factor or 1.0, WordTimings.from_bytes(audio.word_timings).to_dicts()
+
+async def record_narration(part, audio_path: str, duration: float, voice: str, tempo: float, word_timings: List[Dict]):
+    """Store a part's TTS output (file path and word timings) so a retry skips TTS. Returns the audio_files id."""
+    async with get_db_session() as session:
+        audio = AudioFile(
+            story_part_id=part.id,
+            local_path=audio_path,
+            duration_seconds=duration,
+            voice_name=voice,
+            character_count=len(part.content),
+            tempo_factor=tempo,
+            word_timings=WordTimings.from_dicts(word_timings).to_bytes(),
+            status="generated"
+        )
+        session.add(audio)
+        await session.flush()
+        return audio.id
 
 async def run_pipeline():
     """
@@ -30,6 +75,8 @@ async def run_pipeline():
     """
     start_time = time.time()
     logger.info(f"Pipeline started at {time.ctime()} (Test Mode: {settings.TEST_MODE})")
+    # The API process runs the pipeline repeatedly; report this run's LLM usage only
+    gemini_client.run_usage.clear()
     
     # Create temp dirs
     settings.TEMP_DIR.mkdir(parents=True, exist_ok=True)
@@ -41,12 +88,13 @@ async def run_pipeline():
         "videos_created": 0,
         "successful_videos": []
     }
+    job = None
     
     try:
         # ==========================================
         # 0. Startup & Cleaning
         # ==========================================
-        cleanup_temp_files(settings.TEMP_DIR, "*.mp3")
+        cleanup_temp_files(settings.TEMP_DIR, "*.mp3", min_age_seconds=NARRATION_KEEP_SECONDS)
         cleanup_temp_files(settings.TEMP_DIR, "*.mp4")
         cleanup_temp_files(settings.TEMP_DIR, "*.ass")
         
@@ -74,6 +122,9 @@ async def run_pipeline():
         process_limit = 1 if settings.TEST_MODE else 10 # Batch size
         stats["processed_stories"] = await processor.process_scraped_stories(limit=process_limit)
         
+        # Persist LLM usage for this stage (per run + daily counters)
+        await gemini_client.flush_usage(job.id)
+        
         await queries.update_job_heartbeat(job.id)
 
         # ==========================================
@@ -91,129 +142,309 @@ async def run_pipeline():
             logger.info("No stories need video generation. Skipping stage.")
         else:
             email_notifier.send_progress_update(0, len(pending_parts), "Starting Content Generation")
+
+        if pending_parts and settings.GAMEPLAY_INGEST:
+            # Transcode new Drive gameplay into the normalized library (once per file)
+            ingested = await gameplay_library.sync()
+            if ingested:
+                logger.info(f"Ingested {ingested} new gameplay videos")
+
+        if settings.TTS_STORY_LEVEL:
+            # One TTS request per story; the per-part calls below then hit the TTS cache
+            stories: Dict[tuple, list] = {}
+            for part in pending_parts:
+                stories.setdefault((part.story_id, part.voice_name), []).append(part)
+            for (story_id, voice), parts in stories.items():
+                if len(parts) < 2 or not voice:
+                    continue
+                parts.sort(key=lambda p: p.part_number)
+                try:
+                    await tts_engine.synthesize_story([p.content for p in parts], voice)
+                except Exception as e:
+                    logger.warning(f"Story-level TTS failed for story {story_id}, synthesizing per part: {e}")
+
+        # Parts are produced concurrently so one part's TTS/mixing overlaps
+        # another's encode; FFmpeg processes are bounded by the render engine
+        part_slots = asyncio.Semaphore(settings.RENDER_WORKERS)
+        completed = 0
+
+        async def prepare(part) -> Dict:
+            """Steps A-C: narration, bleeps and subtitles for one part."""
+            logger.info(f"Generating content for Part {part.id}...")
         
-        for i, part in enumerate(pending_parts):
-            try:
-                logger.info(f"Generating content for Part {part.id}...")
-                
-                # --- A. TTS Generation ---
-                audio_filename = f"{part.id}_audio.mp3"
-                audio_path = str(settings.TEMP_DIR / audio_filename)
-                
+            # --- A. TTS Generation ---
+            audio_filename = f"{part.id}_audio.mp3"
+            audio_path = str(settings.TEMP_DIR / audio_filename)
+        
+            # Narration left by an earlier failed attempt is reused without TTS
+            stored = await load_narration(part, audio_path)
+            if stored:
+                audio_file_id, voice, tempo, word_timings = stored
+                duration = max((t["end"] for t in word_timings), default=0.0)
+                logger.info(f"Reusing stored narration for Part {part.id} ({duration:.1f}s, voice {voice})")
+            else:
+                audio_file_id, tempo = None, 1.0
                 duration, voice, word_timings = await tts_engine.generate_audio(
-                    part.content, audio_path
+                    part.content, audio_path, voice=part.voice_name
                 )
-                
-                # --- B. Audio Mixing (Bleeps) ---
-                # Note: tts_generator.generate_audio already saved file.
-                # Now we operate on it.
-                # In censor module, 'get_bleep_locations' works on text. 
-                # We need original or censored text? Censored text has stars.
-                # The 'word_timings' are for spoken text.
-                # Audio mixer will overlay bleeps.
-                audio_path = await audio_mixer.mix_audio(part.content, audio_path, word_timings)
-                
-                # --- C. Subtitles ---
-                ass_filename = f"{part.id}_subs.ass"
-                ass_path = str(settings.TEMP_DIR / ass_filename)
-                subtitle_generator.generate_ass(word_timings, ass_path)
-                
-                # --- D. Video Generation ---
-                video_filename = f"{part.story.subreddit}_{part.story.reddit_id}_{part.part_number}.mp4"
-                video_path = str(settings.TEMP_DIR / video_filename)
-                
-                final_video = await video_generator.generate_video(
-                    audio_path=audio_path,
-                    subtitle_path=ass_path,
-                    output_path=video_path,
-                    duration=duration
+            tts_duration, tts_timings = duration, word_timings
+        
+            # --- A2. Pause trimming / tempo fit ---
+            # Shorter audio = fewer gameplay seconds encoded; a part still over
+            # the cap is re-synthesized faster (bounded by TTS_MAX_TEMPO_UP_PERCENT)
+            audio_pcm = None
+            if settings.TRIM_PAUSES:
+                audio_pcm, word_timings = pause_trimmer.trim_file(audio_path, word_timings)
+                duration = len(audio_pcm[0]) / audio_pcm[1]
+        
+            max_tempo = 1 + settings.TTS_MAX_TEMPO_UP_PERCENT / 100
+            if audio_file_id is None and duration > settings.MAX_VIDEO_DURATION_SECONDS and max_tempo > 1:
+                tempo = min(max_tempo, duration / settings.MAX_VIDEO_DURATION_SECONDS)
+                logger.info(f"Part {part.id} is {duration:.1f}s; re-synthesizing at {tempo:.2f}x tempo")
+                duration, voice, word_timings = await tts_engine.generate_audio(
+                    part.content, audio_path, voice=voice, tempo=tempo
                 )
-                
-                if not final_video:
-                    raise RuntimeError("Video generation returned None")
-                    
-                stats["videos_created"] += 1
-                
-                # --- E. Upload to Drive ---
-                drive_res = None
+                tts_duration, tts_timings = duration, word_timings
+                if settings.TRIM_PAUSES:
+                    audio_pcm, word_timings = pause_trimmer.trim_file(audio_path, word_timings)
+                    duration = len(audio_pcm[0]) / audio_pcm[1]
+            if audio_file_id is None:
+                audio_file_id = await record_narration(part, audio_path, tts_duration, voice, tempo, tts_timings)
+        
+            # --- B. Audio Mixing (Bleeps) ---
+            # part.content is the censored text TTS spoke; align its "****"
+            # masks onto the word boundaries to get exact bleep intervals.
+            bleep_words = await censor_engine.get_bleep_locations(part.content)
+            bleep_intervals, masked_indices = word_aligner.bleep_intervals(
+                part.content, [(b["start"], b["end"]) for b in bleep_words], word_timings
+            )
+            # Mixed audio stays in memory (None = use the TTS file as-is)
+            mixed_audio = await audio_mixer.mix_audio(
+                part.content, audio_path, word_timings, bleep_intervals, audio=audio_pcm
+            )
+        
+            # --- C. Subtitles ---
+            ass_filename = f"{part.id}_subs.ass"
+            ass_path = str(settings.TEMP_DIR / ass_filename)
+            subtitle_generator.generate_ass(word_timings, ass_path, masked_indices)
+        
+            video_filename = f"{part.story.subreddit}_{part.story.reddit_id}_{part.part_number}.mp4"
+            video_path = str(settings.TEMP_DIR / video_filename)
+            
+            # Extra formats (rendered in the same pass), each with subtitles laid out for its size
+            variants = []
+            if not settings.RENDER_BATCH_PARTS:
+                for variant in output_variants():
+                    variant_ass = variant_path(ass_path, variant["name"])
+                    subtitle_generator.generate_ass(
+                        word_timings, variant_ass, masked_indices,
+                        width=variant["width"], height=variant["height"], watermark=variant["watermark"]
+                    )
+                    variants.append({
+                        **variant,
+                        "subtitle_path": variant_ass,
+                        "output_path": variant_path(video_path, variant["name"]),
+                    })
+            return {
+                "audio_path": audio_path,
+                "audio_file_id": audio_file_id,
+                "ass_path": ass_path,
+                "video_filename": video_filename,
+                "video_path": video_path,
+                "variants": variants,
+                "duration": duration,
+                "voice": voice,
+                "tempo": tempo,
+                "word_timings": word_timings,
+                "bleep_intervals": bleep_intervals,
+                # Batch renders need PCM for every part
+                "audio": mixed_audio if mixed_audio is not None else audio_pcm,
+                "mixed_audio": mixed_audio,
+            }
+
+        async def finish(part, item: Dict, final_video: str) -> None:
+            """Steps E-F: upload, DB records, report and cleanup for one rendered part (and its variants)."""
+            nonlocal completed
+            duration = item["duration"]
+            # Primary video first; variants that failed to appear are skipped
+            outputs = [(
+                {"name": "default", "width": settings.VIDEO_WIDTH, "height": settings.VIDEO_HEIGHT},
+                final_video, item["video_filename"]
+            )]
+            outputs += [
+                (variant, variant["output_path"], os.path.basename(variant["output_path"]))
+                for variant in item.get("variants", [])
+                if os.path.exists(variant["output_path"])
+            ]
+            
+            stats["videos_created"] += 1
+        
+            # --- E. Upload to Drive ---
+            drive_results = []
+            for _, path, filename in outputs:
                 if not settings.TEST_MODE:
-                    drive_res = await drive_uploader.upload_video(final_video, video_filename)
+                    drive_results.append(await drive_uploader.upload_video(path, filename))
                 else:
-                    logger.info(f"[TEST] Skipping Drive upload for {video_filename}")
-                    drive_res = {"download_url": "http://test-url.com", "id": "test_id"}
-                
-                # --- F. Queue for YouTube ---
-                if not settings.TEST_MODE and settings.YOUTUBE_DAILY_UPLOAD_LIMIT > 0:
-                    # Logic to queue video
-                    # Needs db interaction.
-                    # We need to Create Video record first.
-                    pass 
-                    
-                # Store Video Record
-                # We have to reconnect session/refresh to ensure we are adding correctly
-                # Or just use the 'queries' object if session is valid. 
-                # But loop might take long, better to use short sessions or refresh
-                # Let's do a quick update session per item
-                
-                async with get_db_session() as update_sess:
-                    q = DBQueries(update_sess)
-                    
-                    # Create Video DB Entry
+                    logger.info(f"[TEST] Skipping Drive upload for {filename}")
+                    drive_results.append({"download_url": "http://test-url.com", "id": "test_id"})
+            drive_res = drive_results[0]
+        
+            # --- F. Queue for YouTube ---
+            if not settings.TEST_MODE and settings.YOUTUBE_DAILY_UPLOAD_LIMIT > 0:
+                # Logic to queue video
+                # Needs db interaction.
+                # We need to Create Video record first.
+                pass 
+            
+            # Store Video Record
+            # We have to reconnect session/refresh to ensure we are adding correctly
+            # Or just use the 'queries' object if session is valid. 
+            # But loop might take long, better to use short sessions or refresh
+            # Let's do a quick update session per item
+        
+            async with get_db_session() as update_sess:
+                q = DBQueries(update_sess)
+            
+                # Narration record (also feeds the per-voice duration model) now
+                # holds the timings as used in the video; its temp file is removed below
+                await update_sess.execute(
+                    update(AudioFile).where(AudioFile.id == item["audio_file_id"]).values(
+                        local_path=None,
+                        duration_seconds=duration,
+                        has_bleep_sounds=bool(item["bleep_intervals"]),
+                        word_timings=WordTimings.from_dicts(item["word_timings"]).to_bytes(),
+                        status="used"
+                    )
+                )
+            
+                # Create Video DB Entries (one per output format)
+                primary_db = None
+                for (variant, path, filename), drive_file in zip(outputs, drive_results):
+                    encode = render_engine.pop_result(path) or {}
                     video_db = Video(
                         story_part_id=part.id,
-                        filename=video_filename,
+                        audio_file_id=item["audio_file_id"],
+                        filename=filename,
+                        variant=variant["name"],
+                        width=variant["width"],
+                        height=variant["height"],
                         duration_seconds=duration,
-                        drive_file_id=drive_res.get("id"),
-                        drive_download_url=drive_res.get("download_url"),
+                        drive_file_id=drive_file.get("id"),
+                        drive_download_url=drive_file.get("download_url"),
+                        file_size_bytes=os.path.getsize(path) if os.path.exists(path) else None,
+                        gameplay_filename=encode.get("source"),
+                        encode_preset=encode.get("preset"),
+                        encode_seconds=encode.get("elapsed"),
+                        encode_fps=encode.get("fps"),
+                        encode_speed=encode.get("speed"),
                         status="uploaded_to_drive" if not settings.TEST_MODE else "generated"
                     )
                     update_sess.add(video_db)
-                    await update_sess.flush()
-                    
-                    # Add to YouTube Queue
-                    if not settings.TEST_MODE:
-                        from src.database.models import YoutubeUploadQueue
-                        
-                        queue_item = YoutubeUploadQueue(
-                            video_id=video_db.id,
-                            title=part.title or "Reddit Story",
-                            description=f"{part.caption}\n\n{part.story.suggested_caption}",
-                            tags=part.story.hashtags or []
-                        )
-                        update_sess.add(queue_item)
-                        
-                    # Update Part Status
-                    await update_sess.execute(
-                        "UPDATE story_parts SET status='completed' WHERE id=:id",
-                        {"id": part.id}
-                    ) 
-                    # Note: Using raw SQL for quick status update to avoid detach issues or just query fetch
-                    # Re-fetching part in new session helps.
+                    primary_db = primary_db or video_db
+                await update_sess.flush()
+            
+                # Add to YouTube Queue (primary format only)
+                if not settings.TEST_MODE:
+                    from src.database.models import YoutubeUploadQueue
                 
-                # Add to report
-                stats["successful_videos"].append({
-                    "title": part.title,
-                    "download_url": drive_res.get("download_url"),
-                    "caption": part.caption or part.story.suggested_caption,
-                    "hashtags": " ".join(part.story.hashtags or [])
-                })
+                    queue_item = YoutubeUploadQueue(
+                        video_id=primary_db.id,
+                        title=part.title or "Reddit Story",
+                        description=f"{part.caption}\n\n{part.story.suggested_caption}",
+                        tags=part.story.hashtags or []
+                    )
+                    update_sess.add(queue_item)
                 
-                # Progress Update
-                if (i + 1) % 5 == 0:
-                    email_notifier.send_progress_update(i + 1, len(pending_parts), "Video Generation")
-                    
-                 # Cleanup loop temp
-                if os.path.exists(audio_path): os.remove(audio_path)
-                if os.path.exists(ass_path): os.remove(ass_path)
-                if os.path.exists(video_path): os.remove(video_path)
+                # Update Part Status
+                await update_sess.execute(
+                    update(StoryPart).where(StoryPart.id == part.id).values(status="completed")
+                )
+        
+            # Add to report
+            stats["successful_videos"].append({
+                "title": part.title,
+                "download_url": drive_res.get("download_url"),
+                "caption": part.caption or part.story.suggested_caption,
+                "hashtags": " ".join(part.story.hashtags or [])
+            })
+        
+            # Progress Update
+            completed += 1
+            if completed % 5 == 0:
+                email_notifier.send_progress_update(completed, len(pending_parts), "Video Generation")
+            
+            # Cleanup loop temp
+            temp_paths = [item["audio_path"], item["ass_path"], item["video_path"]]
+            for variant in item.get("variants", []):
+                temp_paths += [variant["subtitle_path"], variant["output_path"]]
+            for path in temp_paths:
+                if os.path.exists(path): os.remove(path)
+
+        async def produce(part):
+            async with part_slots:
+                try:
+                    item = await prepare(part)
+                
+                    # --- D. Video Generation ---
+                    final_video = await video_generator.generate_video(
+                        audio_path=item["audio_path"],
+                        subtitle_path=item["ass_path"],
+                        output_path=item["video_path"],
+                        duration=item["duration"],
+                        audio_samples=item["mixed_audio"],
+                        variants=item["variants"]
+                    )
+                
+                    if not final_video:
+                        raise RuntimeError("Video generation returned None")
+                    await finish(part, item, final_video)
                     
-            except Exception as e:
-                logger.error(f"Failed to generate content for Part {part.id}: {e}")
-                # Update status to failed
-                async with get_db_session() as err_sess:
-                    # q = DBQueries(err_sess)
-                    # Use sql needed
-                    pass
+                except Exception as e:
+                    logger.error(f"Failed to generate content for Part {part.id}: {e}")
+                    # Update status to failed
+                    async with get_db_session() as err_sess:
+                        # q = DBQueries(err_sess)
+                        # Use sql needed
+                        pass
+
+        async def produce_batch(parts):
+            """All parts of a story rendered by one FFmpeg process (see RenderEngine.render_batch)."""
+            async with part_slots:
+                ready = []
+                for part in parts:
+                    try:
+                        ready.append((part, await prepare(part)))
+                    except Exception as e:
+                        logger.error(f"Failed to generate content for Part {part.id}: {e}")
+                if not ready:
+                    return
+                
+                # --- D. Video Generation (batched) ---
+                outputs = await video_generator.generate_batch([
+                    {
+                        "audio_path": item["audio_path"],
+                        "subtitle_path": item["ass_path"],
+                        "output_path": item["video_path"],
+                        "duration": item["duration"],
+                        "audio_samples": item["audio"],
+                    }
+                    for _, item in ready
+                ])
+                for (part, item), final_video in zip(ready, outputs or [None] * len(ready)):
+                    try:
+                        if not final_video:
+                            raise RuntimeError("Video generation returned None")
+                        await finish(part, item, final_video)
+                    except Exception as e:
+                        logger.error(f"Failed to generate content for Part {part.id}: {e}")
+
+        if settings.RENDER_BATCH_PARTS:
+            batches: Dict[str, list] = {}
+            for part in pending_parts:
+                batches.setdefault(part.story_id, []).append(part)
+            await asyncio.gather(*(produce_batch(parts) for parts in batches.values()))
+        else:
+            await asyncio.gather(*(produce(part) for part in pending_parts))
 
         # Use update_job status
         
@@ -225,6 +456,10 @@ async def run_pipeline():
         duration = time.time() - start_time
         logger.info(f"Pipeline finished in {duration:.2f}s")
         
+        await gemini_client.flush_usage(job.id if job else None)
+        if gemini_client.run_usage:
+            logger.info(f"LLM usage this run:\n{gemini_client.usage_summary()}")
+        
         # Send completion report
         if stats["successful_videos"]:
             email_notifier.send_completion_report(stats["successful_videos"])
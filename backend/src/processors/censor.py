@@ -1,74 +1,175 @@
 
+import os
 import re
-from typing import List, Tuple
-from better_profanity import profanity
+import time
+import pickle
+from bisect import bisect_right
+from datetime import datetime
+from typing import List, Optional, Tuple
 
 from src.ai.gemini_client import gemini_client
+from src.config import settings
 from src.database.connection import get_db_session
 from src.database.queries import DBQueries
+from src.processors.profanity_matcher import ProfanityMatcher, default_words
 from src.utils.logger import logger
 
+VERSION_KEY = "cuss_words_version"
+CACHE_FORMAT = 1
+
 class Censor:
     def __init__(self):
         self._custom_words_loaded = False
-        # Set default replacement
-        profanity.load_censor_words()
+        # Single-pass matcher seeded with better_profanity's default word list
+        self.matcher = ProfanityMatcher(default_words())
+        
+        # Dictionary state mirrored in the on-disk cache
+        self.cache_path = settings.CACHE_DIR / "cuss_words.pkl"
+        self.version: Optional[str] = None
+        self.synced_at: Optional[datetime] = None
+        self.db_word_count = 0
+        self._last_version_check = 0.0
         
     async def load_custom_words(self):
         """
-        Load cuss words from database into profanity filter.
+        Load cuss words from database into the matcher.
+        Starts from the local compiled cache, then applies words added since
+        the cache was written whenever the DB dictionary version changes.
         If DB is empty, generate initial list from AI.
         """
         if self._custom_words_loaded:
+            if self.version is None:
+                return  # Loaded outside of the versioned path
+            if time.monotonic() - self._last_version_check < settings.CUSS_WORDS_REFRESH_SECONDS:
+                return
+            self._last_version_check = time.monotonic()
+            try:
+                await self._refresh()
+            except Exception as e:
+                # Keep filtering with the current matcher; retry after the next interval
+                logger.warning(f"Cuss word refresh failed, keeping version {self.version}: {e}")
+                self._last_version_check = time.monotonic()
             return
+        self._last_version_check = time.monotonic()
 
+        self._load_cache()
+        await self._refresh()
+
+    async def _refresh(self):
+        """Apply DB changes since the loaded version (full reload when the delta is unreliable)."""
         async with get_db_session() as session:
             queries = DBQueries(session)
-            db_words = await queries.get_cuss_words()
+            version = await queries.get_setting(VERSION_KEY) or "0"
+            if self._custom_words_loaded and version == self.version:
+                return
+            
+            rows = None
+            if self.synced_at is not None:
+                rows = await queries.get_cuss_words_since(self.synced_at)
+                if self.db_word_count + len(rows) != await queries.count_cuss_words():
+                    # Words were removed or backdated; delta is unreliable
+                    rows = None
+            
+            if rows is None:
+                rows = await queries.get_cuss_words_since()
+                
+                if not rows:
+                    logger.info("No cuss words in DB. Generating from AI...")
+                    ai_words = await gemini_client.generate_cuss_word_list()
+                    if ai_words:
+                        await queries.bulk_add_cuss_words(ai_words)
+                        version = await queries.get_setting(VERSION_KEY) or version
+                        rows = await queries.get_cuss_words_since()
+                
+                self.matcher = ProfanityMatcher(default_words())
+                self.synced_at = None
+                self.db_word_count = 0
             
-            if not db_words:
-                logger.info("No cuss words in DB. Generating from AI...")
-                ai_words = await gemini_client.generate_cuss_word_list()
-                if ai_words:
-                    await queries.bulk_add_cuss_words(ai_words)
-                    db_words = ai_words
+            if rows:
+                self.matcher.add_words(word for word, _ in rows)
+                newest = max(created_at for _, created_at in rows)
+                self.synced_at = max(newest, self.synced_at) if self.synced_at else newest
+                self.db_word_count += len(rows)
+                logger.info(f"Loaded {len(rows)} cuss words into filter (version {version}).")
             
-            if db_words:
-                profanity.add_censor_words(db_words)
-                logger.info(f"Loaded {len(db_words)} cuss words into filter.")
-                self._custom_words_loaded = True
+            self.version = version
+            self._custom_words_loaded = True
+            self._save_cache()
+
+    def _load_cache(self) -> bool:
+        """Restore the compiled matcher from disk. Returns True on success."""
+        if not self.cache_path.exists():
+            return False
+        try:
+            with open(self.cache_path, "rb") as f:
+                data = pickle.load(f)
+            if data.get("format") != CACHE_FORMAT:
+                return False
+            self.matcher = data["matcher"]
+            self.version = data["version"]
+            self.synced_at = data["synced_at"]
+            self.db_word_count = data["db_word_count"]
+            self._custom_words_loaded = True
+            logger.info(f"Loaded cuss word matcher cache (version {self.version}, {len(self.matcher)} words)")
+            return True
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable cuss word cache {self.cache_path}: {e}")
+            return False
+
+    def _save_cache(self) -> None:
+        """Write the compiled matcher atomically so concurrent workers never read a partial file."""
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.cache_path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, "wb") as f:
+                pickle.dump({
+                    "format": CACHE_FORMAT,
+                    "version": self.version,
+                    "synced_at": self.synced_at,
+                    "db_word_count": self.db_word_count,
+                    "matcher": self.matcher,
+                }, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.cache_path)
+        except Exception as e:
+            logger.warning(f"Failed to write cuss word cache: {e}")
 
     async def censor_text(self, text: str) -> str:
         """
         Replace cuss words with ****.
         """
+        censored, _ = await self.censor_with_spans(text)
+        return censored
+
+    async def censor_with_spans(self, text: str) -> Tuple[str, List[Tuple[int, int]]]:
+        """
+        Censor text and return (censored_text, spans) where spans are the
+        (start, end) character ranges of the masks in the censored text.
+        """
         await self.load_custom_words()
-        return profanity.censor(text, censor_char="*")
+        return self.matcher.censor(text, censor_char="*")
 
     async def get_bleep_locations(self, text: str) -> List[dict]:
         """
-        Analyze text to find locations of censored words for audio bleeping.
-        Returns list of dicts with word and approximate position.
-        Note: Precise timestamping happens during TTS alignment, 
-        this might be used for heuristic checks.
+        Find censored (or still profane) words in text for audio bleeping.
+        Works on both raw and already censored text ("****" tokens).
+        Returns list of dicts: word, index (whitespace token), start, end (chars).
         """
         await self.load_custom_words()
         
-        # This is a complex task because 'profanity' lib returns censored text string
-        # but doesn't give positions.
-        # We will iterate through words and check if they are censored.
-        
-        words = text.split()
-        bleep_words = []
+        spans = self.matcher.find_spans(text)
+        if not spans:
+            return []
         
-        for i, word in enumerate(words):
-            if profanity.contains_profanity(word):
-                bleep_words.append({
-                    "word": word,
-                    "index": i
-                })
-                
-        return bleep_words
+        token_starts = [m.start() for m in re.finditer(r'\S+', text)]
+        return [
+            {
+                "word": text[start:end],
+                "index": bisect_right(token_starts, start) - 1,
+                "start": start,
+                "end": end
+            }
+            for start, end in spans
+        ]
 
 # Global instance
 censor_engine = Censor()
@@ -0,0 +1,83 @@
+import math
+import time
+from typing import Dict, List, Optional, Tuple
+
+from src.utils.logger import logger
+
+# Prior: 150 words per minute at ~6 characters per word (incl. space)
+DEFAULT_SECONDS_PER_CHAR = 60 / 150 / 6
+
+# Samples needed before a voice's own rate outweighs the prior
+PRIOR_WEIGHT = 5
+
+# Plan with the rate plus this many standard deviations so parts stay under the cap
+SAFETY_SIGMAS = 1.0
+
+# How long fitted rates are reused before re-reading audio_files
+REFRESH_SECONDS = 3600
+
+class VoiceDurationModel:
+    """
+    Per-voice speaking-rate model fitted from historical audio_files
+    (duration_seconds vs character_count). Rates are seconds per character,
+    shrunk towards the 150 wpm prior when a voice has few samples.
+    """
+
+    def __init__(self):
+        # voice -> (seconds_per_char, std_seconds_per_char, sample_count)
+        self.rates: Dict[str, Tuple[float, float, int]] = {}
+        self._loaded_at = 0.0
+
+    def fit(self, samples: List[Tuple[str, int, float]]) -> None:
+        """Fit rates from (voice_name, character_count, duration_seconds) rows."""
+        by_voice: Dict[str, List[Tuple[int, float]]] = {}
+        for voice, chars, duration in samples:
+            if voice and chars and duration and chars > 0 and duration > 0:
+                by_voice.setdefault(voice, []).append((chars, duration))
+
+        rates = {}
+        for voice, rows in by_voice.items():
+            n = len(rows)
+            # Ratio estimator: total seconds / total characters
+            rate = sum(d for _, d in rows) / sum(c for c, _ in rows)
+            per_sample = [d / c for c, d in rows]
+            mean = sum(per_sample) / n
+            std = math.sqrt(sum((r - mean) ** 2 for r in per_sample) / (n - 1)) if n > 1 else rate * 0.1
+
+            weight = n / (n + PRIOR_WEIGHT)
+            rates[voice] = (weight * rate + (1 - weight) * DEFAULT_SECONDS_PER_CHAR, std, n)
+
+        self.rates = rates
+
+    def seconds_per_char(self, voice: Optional[str] = None, conservative: bool = True) -> float:
+        if voice not in self.rates:
+            return DEFAULT_SECONDS_PER_CHAR
+        rate, std, _ = self.rates[voice]
+        return rate + SAFETY_SIGMAS * std if conservative else rate
+
+    def estimate(self, text: str, voice: Optional[str] = None, conservative: bool = False) -> float:
+        """Predicted audio duration of text in seconds."""
+        return len(text) * self.seconds_per_char(voice, conservative)
+
+    async def refresh(self, force: bool = False) -> None:
+        """Refit from the database, at most once per REFRESH_SECONDS."""
+        if not force and time.monotonic() - self._loaded_at < REFRESH_SECONDS:
+            return
+
+        from src.database.connection import get_db_session
+        from src.database.queries import DBQueries
+
+        try:
+            async with get_db_session() as session:
+                samples = await DBQueries(session).get_voice_duration_samples()
+            self.fit(samples)
+            self._loaded_at = time.monotonic()
+            summary = ", ".join(
+                f"{v}: {60 / (r * 6):.0f}wpm (n={n})" for v, (r, _, n) in sorted(self.rates.items())
+            )
+            logger.info(f"Voice duration model refreshed: {summary or 'no samples, using prior'}")
+        except Exception as e:
+            logger.warning(f"Could not refresh voice duration model, keeping current rates: {e}")
+
+# Global instance
+duration_model = VoiceDurationModel()
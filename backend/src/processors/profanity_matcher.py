@@ -0,0 +1,201 @@
+from collections import deque
+from typing import Dict, Iterable, List, Tuple
+
+from better_profanity.utils import get_complete_path_of_file, read_wordlist
+
+# Obfuscation characters folded onto the letter they stand in for.
+# Applied identically to patterns and text so "$h1t" matches "shit".
+LEET_TABLE = str.maketrans({
+    "@": "a",
+    "4": "a",
+    "1": "i",
+    "0": "o",
+    "3": "e",
+    "$": "s",
+    "5": "s",
+    "7": "t",
+})
+
+MASK_CHAR = "*"
+VOWELS = "aeiou"
+
+def default_words() -> List[str]:
+    """Words shipped with better_profanity (used as the base dictionary)."""
+    return list(read_wordlist(get_complete_path_of_file("profanity_wordlist.txt")))
+
+def _is_word_char(c: str) -> bool:
+    return c.isalnum() or c in "@$*"
+
+class ProfanityMatcher:
+    """
+    Aho-Corasick automaton over normalized cuss words.
+    A single left-to-right pass over the text finds every profane word
+    (including leetspeak and single-vowel '*' variants) and every already
+    masked token ("****", "f**k"), returning exact character spans.
+    """
+
+    def __init__(self, words: Iterable[str] = ()):
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        # Length of the pattern ending exactly at each node (0 if none)
+        self.terminal: List[int] = [0]
+        # Pattern lengths ending at each node, longest first (merged along fail links)
+        self.out: List[Tuple[int, ...]] = [()]
+        self.words: set = set()
+        self.add_words(words)
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Lowercase and fold obfuscation chars, preserving length."""
+        norm = text.lower().translate(LEET_TABLE)
+        if len(norm) != len(text):
+            # Some unicode lowercases to several chars; fold per char instead
+            norm = "".join(c.lower() if len(c.lower()) == 1 else c for c in text).translate(LEET_TABLE)
+        return norm
+
+    @staticmethod
+    def _variants(word: str) -> List[str]:
+        """The word plus each single vowel, and all vowels, replaced by '*'."""
+        variants = {word}
+        vowel_positions = [i for i, c in enumerate(word) if c in VOWELS]
+        for i in vowel_positions:
+            variants.add(word[:i] + MASK_CHAR + word[i + 1:])
+        if len(vowel_positions) > 1:
+            variants.add("".join(MASK_CHAR if c in VOWELS else c for c in word))
+        return list(variants)
+
+    def add_words(self, words: Iterable[str]) -> int:
+        """
+        Insert words into the trie and rebuild failure links.
+        Returns number of new words.
+        """
+        added = 0
+        for word in words:
+            word = " ".join(self.normalize(word).split())
+            if not word or word in self.words:
+                continue
+            self.words.add(word)
+            added += 1
+            for variant in self._variants(word):
+                self._insert(variant)
+        if added:
+            self._build_links()
+        return added
+
+    def _insert(self, pattern: str) -> None:
+        node = 0
+        for c in pattern:
+            nxt = self.goto[node].get(c)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][c] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.terminal.append(0)
+                self.out.append(())
+            node = nxt
+        self.terminal[node] = len(pattern)
+
+    def _build_links(self) -> None:
+        """BFS over the trie computing fail links and merged outputs."""
+        terminal = [(length,) if length else () for length in self.terminal]
+        queue = deque()
+        for child in self.goto[0].values():
+            self.fail[child] = 0
+            self.out[child] = terminal[child]
+            queue.append(child)
+        while queue:
+            node = queue.popleft()
+            for c, child in self.goto[node].items():
+                f = self.fail[node]
+                while f and c not in self.goto[f]:
+                    f = self.fail[f]
+                link = self.goto[f].get(c, 0)
+                self.fail[child] = link if link != child else 0
+                self.out[child] = terminal[child] + self.out[self.fail[child]]
+                queue.append(child)
+
+    def find_spans(self, text: str) -> List[Tuple[int, int]]:
+        """
+        Return sorted, non-overlapping (start, end) spans of profane or
+        masked words in text. One linear pass.
+        """
+        norm = self.normalize(text)
+        n = len(norm)
+        goto, fail, out = self.goto, self.fail, self.out
+        candidates = []
+
+        node = 0
+        token_start = -1
+        token_masks = 0
+        for i, c in enumerate(norm):
+            # Automaton step
+            while node and c not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(c, 0)
+
+            word_char = _is_word_char(c)
+            if word_char:
+                if token_start < 0:
+                    token_start, token_masks = i, 0
+                if c == MASK_CHAR:
+                    token_masks += 1
+
+            at_end = i + 1 == n or not _is_word_char(norm[i + 1])
+            if not at_end:
+                continue
+
+            for length in out[node]:
+                start = i + 1 - length
+                if start == 0 or not _is_word_char(norm[start - 1]):
+                    candidates.append((start, i + 1))
+                    break
+
+            if token_start >= 0:
+                # Already censored token: "****" or mostly starred "f**k", "sh**"
+                if token_masks >= 2 and token_masks >= i + 1 - token_start - 2:
+                    candidates.append((token_start, i + 1))
+                token_start = -1
+
+        return self._resolve(candidates)
+
+    @staticmethod
+    def _resolve(candidates: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+        """Keep leftmost-longest spans, dropping overlaps."""
+        candidates.sort(key=lambda s: (s[0], -s[1]))
+        spans = []
+        last_end = -1
+        for start, end in candidates:
+            if start >= last_end:
+                spans.append((start, end))
+                last_end = end
+        return spans
+
+    def contains_profanity(self, text: str) -> bool:
+        return bool(self.find_spans(text))
+
+    def censor(self, text: str, censor_char: str = "*") -> Tuple[str, List[Tuple[int, int]]]:
+        """
+        Replace each profane word with four censor chars.
+        Returns (censored_text, spans) with spans in censored-text coordinates.
+        """
+        replacement = censor_char * 4
+        pieces = []
+        spans = []
+        cursor = 0
+        offset = 0
+        for start, end in self.find_spans(text):
+            pieces.append(text[cursor:start])
+            word = text[start:end]
+            # Leave already masked tokens untouched
+            new = word if set(word) <= {MASK_CHAR} else replacement
+            new_start = start + offset
+            pieces.append(new)
+            spans.append((new_start, new_start + len(new)))
+            offset += len(new) - len(word)
+            cursor = end
+        pieces.append(text[cursor:])
+        return "".join(pieces), spans
@@ -8,6 +8,7 @@ from src.database.models import Story
 from src.ai.gemini_client import gemini_client
 from src.processors.censor import censor_engine
 from src.processors.text_splitter import splitter
+from src.generators.tts_generator import tts_engine
 from src.utils.logger import logger
 from src.config import settings
 
@@ -35,6 +36,8 @@ class StoryProcessor:
             
             # Ensure censor words are loaded
             await censor_engine.load_custom_words()
+            # Per-voice speaking rates for part sizing
+            await splitter.duration_model.refresh()
             
             for story in stories:
                 try:
@@ -61,15 +64,15 @@ class StoryProcessor:
                     # 4. Censor
                     censored_content = await censor_engine.censor_text(modified_content)
                     
-                    # 5. Split
-                    parts_data = splitter.split_story(censored_content)
+                    # 5. Pick voice and split (fewest parts under the duration cap)
+                    voice, parts_data = splitter.choose_voice(censored_content, tts_engine.voices)
                     
                     # 6. Save Updates
                     story.processed_content = censored_content # Storing censored version
                     story.processed_title = new_title
                     story.hashtags = hashtags
                     story.word_count = len(censored_content.split())
-                    story.estimated_duration_seconds = splitter.estimate_duration(censored_content)
+                    story.estimated_duration_seconds = splitter.estimate_duration(censored_content, voice)
                     story.part_count = len(parts_data)
                     story.status = "processed"
                     story.processed_at = datetime.utcnow() # Use func.now() in model, but here explicitly helpful for tracking
@@ -84,6 +87,7 @@ class StoryProcessor:
                             "total_parts": p["total_parts"],
                             "content": p["content"],
                             "word_count": p["word_count"],
+                            "voice_name": voice,
                             "status": "pending",
                             # Title for part: "Title [Part 1/3]"
                             "title": f"{new_title} [Part {p['part_number']}/{p['total_parts']}]" if p["total_parts"] > 1 else new_title
@@ -97,7 +101,7 @@ class StoryProcessor:
                     await session.commit()
                     
                     processed_count += 1
-                    logger.info(f"Successfully processed story {story.reddit_id} into {story.part_count} parts.")
+                    logger.info(f"Successfully processed story {story.reddit_id} into {story.part_count} parts (voice {voice}).")
                     
                 except Exception as e:
                     logger.error(f"Error processing story {story.reddit_id}: {e}")
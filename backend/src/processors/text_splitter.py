@@ -1,24 +1,48 @@
 
 import math
-from typing import List, Dict, Any
+import random
+import re
+from typing import List, Dict, Any, Optional, Sequence, Tuple
 
 from src.config import settings
+from src.processors.duration_model import duration_model
 
 class TextSplitter:
     def __init__(self):
-        self.words_per_minute = 150  # Average speaking rate
+        self.words_per_minute = 150  # Average speaking rate (prior for unknown voices)
         self.max_duration = settings.MAX_VIDEO_DURATION_SECONDS
-        
-    def estimate_duration(self, text: str) -> int:
+        # Parts over the cap are sped up at render time (bounded), so plan with that headroom
+        self.max_tempo = 1 + settings.TTS_MAX_TEMPO_UP_PERCENT / 100
+        self.duration_model = duration_model
+
+    def estimate_duration(self, text: str, voice: Optional[str] = None) -> int:
         """
-        Estimate audio duration in seconds based on word count.
+        Estimate audio duration in seconds.
+        Uses the voice's fitted rate when known, otherwise word count at 150 wpm.
         """
+        if voice and voice in self.duration_model.rates:
+            return math.ceil(self.duration_model.estimate(text, voice))
         word_count = len(text.split())
         return math.ceil((word_count / self.words_per_minute) * 60)
 
-    def split_story(self, text: str) -> List[Dict[str, Any]]:
+    def choose_voice(self, text: str, voices: Sequence[str]) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Pick the voice that needs the fewest parts (renders) for this text
+        while keeping every part under max_duration. Ties are broken
+        randomly to keep narrator variety.
+        Returns (voice, parts).
+        """
+        splits = {voice: self.split_story(text, voice) for voice in voices}
+        fewest = min(len(parts) for parts in splits.values())
+        voice = random.choice([v for v, parts in splits.items() if len(parts) == fewest])
+        return voice, splits[voice]
+
+    def split_story(self, text: str, voice: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         Split story into parts if it exceeds max duration.
+        Part length is budgeted in seconds using the voice's speaking rate
+        (conservative estimate, so parts stay under the cap) at the fastest
+        allowed tempo.
         Returns list of dicts:
         [
             {"part_number": 1, "content": "...", "word_count": ...},
@@ -26,36 +50,37 @@ class TextSplitter:
         ]
         """
         # Split into sentences to avoid cutting mid-sentence
-        import re
         sentences = re.split(r'(?<=[.!?])\s+', text)
-        
+        seconds_per_char = self.duration_model.seconds_per_char(voice, conservative=True) / self.max_tempo
+
         parts = []
         current_part_sentences = []
         current_word_count = 0
-        
+        current_chars = 0
+
         for sentence in sentences:
             sentence_word_count = len(sentence.split())
-            
+            # +1 for the joining space
+            sentence_chars = len(sentence) + (1 if current_part_sentences else 0)
+
             # Check if adding this sentence exceeds limit
-            # Limit is in words approx equivalent to MAX_VIDEO_DURATION
-            # e.g., 60s -> 150 words
-            max_words = (self.max_duration / 60) * self.words_per_minute
-            
-            if current_word_count + sentence_word_count > max_words and current_part_sentences:
+            if (current_chars + sentence_chars) * seconds_per_char > self.max_duration and current_part_sentences:
                 # Finish current part
                 part_content = " ".join(current_part_sentences)
                 parts.append({
                     "content": part_content,
                     "word_count": current_word_count
                 })
-                
+
                 # Start new part
                 current_part_sentences = [sentence]
                 current_word_count = sentence_word_count
+                current_chars = len(sentence)
             else:
                 current_part_sentences.append(sentence)
                 current_word_count += sentence_word_count
-        
+                current_chars += sentence_chars
+
         # Add final part
         if current_part_sentences:
             part_content = " ".join(current_part_sentences)
@@ -63,14 +88,14 @@ class TextSplitter:
                 "content": part_content,
                 "word_count": current_word_count
             })
-            
+
         # Add part numbers
         for i, part in enumerate(parts):
             part["part_number"] = i + 1
             part["total_parts"] = len(parts)
-            
+            part["voice_name"] = voice
+
         return parts
 
 # Global instance
 splitter = TextSplitter()
-
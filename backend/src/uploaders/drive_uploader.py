@@ -98,20 +98,27 @@ class DriveUploader:
 
     async def list_gameplay_videos(self) -> List[dict]:
         """
-        List all MP4 files in the input folder.
+        List all video files in the input folder (every page), with size
+        and md5Checksum for cache validation.
         """
         if not self.service:
             return []
             
         query = f"'{settings.DRIVE_INPUT_FOLDER_ID}' in parents and mimeType contains 'video/' and trashed = false"
         
-        results = self.service.files().list(
-            q=query,
-            pageSize=100,
-            fields="nextPageToken, files(id, name, size)"
-        ).execute()
-        
-        return results.get('files', [])
+        files = []
+        page_token = None
+        while True:
+            results = self.service.files().list(
+                q=query,
+                pageSize=1000,
+                pageToken=page_token,
+                fields="nextPageToken, files(id, name, size, md5Checksum)"
+            ).execute()
+            files.extend(results.get('files', []))
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return files
 
     async def download_file(self, file_id: str, output_path: str):
         """
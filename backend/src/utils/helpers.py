@@ -1,7 +1,9 @@
 
+import hashlib
 import re
 import os
 import shutil
+import time
 from pathlib import Path
 from datetime import timedelta
 
@@ -35,13 +37,24 @@ def get_file_size_mb(path: str | Path) -> float:
     except OSError:
         return 0.0
 
-def cleanup_temp_files(temp_dir: Path, pattern: str = "*"):
+def file_checksum(path: str | Path, algorithm: str = "sha256") -> str:
     """
-    Remove files in temp directory matching pattern.
+    Hex digest of a file, read in 1 MB blocks (md5 matches Drive's md5Checksum).
+    """
+    digest = hashlib.new(algorithm)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def cleanup_temp_files(temp_dir: Path, pattern: str = "*", min_age_seconds: float = 0):
+    """
+    Remove files in temp directory matching pattern (only those last
+    modified at least min_age_seconds ago).
     """
     for file_path in temp_dir.glob(pattern):
         try:
-            if file_path.is_file():
+            if file_path.is_file() and time.time() - file_path.stat().st_mtime >= min_age_seconds:
                 file_path.unlink()
         except Exception as e:
             print(f"Error deleting {file_path}: {e}")
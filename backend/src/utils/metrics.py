@@ -0,0 +1,59 @@
+
+import threading
+from collections import defaultdict, deque
+from typing import Deque, Dict, Optional
+
+class Metrics:
+    """
+    In-process counters and latency samples.
+    Exposed through the API /status endpoint.
+    """
+
+    def __init__(self, max_samples: int = 1000):
+        self.max_samples = max_samples
+        self.counters: Dict[str, float] = defaultdict(float)
+        self.samples: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=self.max_samples))
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self.counters[name] += value
+
+    def set(self, name: str, value: float) -> None:
+        """Set a gauge (current value, e.g. cache size in bytes)."""
+        with self._lock:
+            self.counters[name] = value
+
+    def observe(self, name: str, value: float) -> None:
+        """Record a sample (e.g. latency in seconds) for percentile reporting."""
+        with self._lock:
+            self.samples[name].append(value)
+
+    def percentile(self, name: str, q: float) -> Optional[float]:
+        """q in [0, 100]. None until at least one sample exists."""
+        with self._lock:
+            values = sorted(self.samples.get(name, ()))
+        if not values:
+            return None
+        index = min(len(values) - 1, int(round(q / 100 * (len(values) - 1))))
+        return values[index]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+            names = list(self.samples)
+        distributions = {}
+        for name in names:
+            count = len(self.samples[name])
+            if count:
+                distributions[name] = {
+                    "count": count,
+                    "p50": self.percentile(name, 50),
+                    "p90": self.percentile(name, 90),
+                    "p99": self.percentile(name, 99),
+                    "max": self.percentile(name, 100),
+                }
+        return {"counters": counters, "distributions": distributions}
+
+# Global instance
+metrics = Metrics()
@@ -32,6 +32,126 @@ async def test_censor_logic():
     # We can't easily test bad words without the library loaded with words, 
     # but we verify the method runs.
 
+@pytest.mark.asyncio
+async def test_profanity_matcher_spans():
+    """Test single-pass matcher returns exact spans, incl. leetspeak and masks."""
+    from src.processors.profanity_matcher import ProfanityMatcher
+    matcher = ProfanityMatcher(["shit", "fuck"])
+    
+    censored, spans = matcher.censor("Oh $h1t, what the f*ck. Classic.")
+    assert censored == "Oh ****, what the ****. Classic."
+    assert [censored[s:e] for s, e in spans] == ["****", "****"]
+    
+    # Already censored text is detected without re-censoring
+    assert matcher.find_spans("the **** dog") == [(4, 8)]
+    assert matcher.find_spans("shitake mushrooms") == []
+
+@pytest.mark.asyncio
+async def test_censor_incremental_reload(tmp_path):
+    """Test cuss word cache round-trips and picks up deltas on version bump."""
+    from contextlib import asynccontextmanager
+    from datetime import datetime, timedelta
+    from src.processors import censor as censor_module
+    
+    db = {"version": "1", "rows": [("zonk", datetime(2026, 1, 1))]}
+    
+    class FakeQueries:
+        def __init__(self, session):
+            pass
+        async def get_setting(self, key):
+            return db["version"]
+        async def get_cuss_words_since(self, since=None):
+            return [r for r in db["rows"] if since is None or r[1] > since]
+        async def count_cuss_words(self):
+            return len(db["rows"])
+    
+    @asynccontextmanager
+    async def fake_session():
+        yield None
+    
+    with patch.object(censor_module, "DBQueries", FakeQueries), \
+         patch.object(censor_module, "get_db_session", fake_session), \
+         patch.object(censor_module.settings, "CUSS_WORDS_REFRESH_SECONDS", 0):
+        first = censor_module.Censor()
+        first.cache_path = tmp_path / "cuss_words.pkl"
+        assert await first.censor_text("zonk it") == "**** it"
+        assert first.cache_path.exists()
+        
+        # New worker starts from the cache, then sees a delta after the bump
+        db["rows"].append(("blorp", datetime(2026, 1, 1) + timedelta(days=1)))
+        db["version"] = "2"
+        second = censor_module.Censor()
+        second.cache_path = first.cache_path
+        assert await second.censor_text("zonk blorp") == "**** ****"
+        assert second.db_word_count == 2
+
+@pytest.mark.asyncio
+async def test_censor_refresh_failure_keeps_matcher(tmp_path):
+    """Test a failing version check keeps the loaded matcher and backs off."""
+    from contextlib import asynccontextmanager
+    from src.processors import censor as censor_module
+
+    opened = []
+
+    @asynccontextmanager
+    async def broken_session():
+        opened.append(1)
+        raise RuntimeError("database unavailable")
+        yield
+
+    censor = censor_module.Censor()
+    censor.cache_path = tmp_path / "cuss_words.pkl"
+    censor.matcher.add_words(["zonk"])
+    censor.version = "1"
+    censor._custom_words_loaded = True
+
+    with patch.object(censor_module, "get_db_session", broken_session), \
+         patch.object(censor_module.settings, "CUSS_WORDS_REFRESH_SECONDS", 60):
+        assert await censor.censor_text("zonk it") == "**** it"
+        assert len(opened) == 1
+        assert censor.version == "1"
+
+        # The failed check restarted the interval instead of retrying every call
+        assert await censor.censor_text("zonk again") == "**** again"
+        assert len(opened) == 1
+
+@pytest.mark.asyncio
+async def test_bleep_alignment():
+    """Test censor spans map onto TTS word boundaries despite drift."""
+    from src.generators.word_aligner import word_aligner
+    text = "I paid $1,000 for this **** car. Don't be a ****."
+    spoken = ["I", "paid", "one", "thousand", "dollars", "for", "this", "car", "Don't", "be", "a", "star"]
+    timings = [{"word": w, "start": i * 0.5, "end": i * 0.5 + 0.4} for i, w in enumerate(spoken)]
+    spans = [(23, 27), (44, 48)]
+    
+    intervals, masked = word_aligner.bleep_intervals(text, spans, timings)
+    # First mask was not spoken: bleep the gap between "this" and "car"
+    assert intervals[0] == (timings[6]["end"], timings[7]["start"])
+    # Second mask was read as "star": bleep exactly that word
+    assert intervals[1] == (timings[11]["start"], timings[11]["end"])
+    assert masked == {11}
+
+def test_alignment_stays_fast_when_streams_diverge():
+    """Test spelled-out numbers and text that never lines up again align in bounded time."""
+    import time
+    from src.generators.word_aligner import word_aligner
+    
+    words = [f"word{i % 37}" for i in range(150)]
+    text = " ".join(words[:70]) + " it cost $1,234,567.89 for that **** " + " ".join(words[70:])
+    spoken = words[:70] + ("it cost one million two hundred thirty four thousand five hundred "
+                           "sixty seven dollars and eighty nine cents for that star").split() + words[70:]
+    timings = [{"word": w, "start": i * 0.3, "end": i * 0.3 + 0.2} for i, w in enumerate(spoken)]
+    started = time.perf_counter()
+    intervals, masked = word_aligner.bleep_intervals(text, [(text.index("****"), text.index("****") + 4)], timings)
+    assert time.perf_counter() - started < 0.05
+    # Anchors resume after the number, so the mask still lands on its own word
+    assert masked == {spoken.index("star")}
+    
+    started = time.perf_counter()
+    _, owned = word_aligner.align(" ".join(f"alpha{i}" for i in range(400)),
+                                  [{"word": f"beta{i}", "start": i, "end": i + 0.5} for i in range(400)])
+    assert time.perf_counter() - started < 1.0 and len(owned) == 400
+
 @pytest.mark.asyncio
 async def test_text_splitter():
     """Test text splitting logic."""
@@ -50,6 +170,967 @@ async def test_text_splitter():
     parts_long = splitter.split_story(long_text)
     assert len(parts_long) > 1
 
+@pytest.mark.asyncio
+async def test_llm_usage_metering():
+    """Test LLM calls are metered with tokens, retries and cost."""
+    from unittest.mock import AsyncMock
+    from src.ai.gemini_client import AIClient
+    client = AIClient()
+    client.provider = "groq"
+    client.model = "llama-3.3-70b-versatile"
+    
+    response = MagicMock()
+    response.choices[0].message.content = " A title "
+    response.usage.prompt_tokens = 1000
+    response.usage.completion_tokens = 10
+    response.usage.prompt_tokens_details = None
+    client.client = MagicMock()
+    client.client.chat.completions.create = AsyncMock(return_value=response)
+    
+    text = await client.generate_text("prompt", prompt_name="title_generation")
+    assert text == "A title"
+    
+    record = client.pending_usage[-1]
+    assert record["prompt_name"] == "title_generation"
+    assert record["prompt_tokens"] == 1000
+    assert record["retry_count"] == 0
+    assert record["cost_usd"] > 0
+    assert client.run_usage["title_generation"]["calls"] == 1
+
+@pytest.mark.asyncio
+async def test_voice_calibrated_split():
+    """Test the splitter sizes parts by fitted voice rate and picks the fastest fit."""
+    from src.processors.text_splitter import TextSplitter
+    from src.processors.duration_model import VoiceDurationModel
+    splitter = TextSplitter()
+    splitter.duration_model = VoiceDurationModel()
+    splitter.max_duration = 60
+    # "fast" speaks 1000 chars in 50s, "slow" in 90s
+    splitter.duration_model.fit(
+        [("fast", 1000, 50.0 + i * 0.1) for i in range(20)] +
+        [("slow", 1000, 90.0 + i * 0.1) for i in range(20)]
+    )
+    
+    text = " ".join(["This is one sentence of a story."] * 50)  # ~1650 chars
+    assert len(splitter.split_story(text, "slow")) > len(splitter.split_story(text, "fast"))
+    
+    voice, parts = splitter.choose_voice(text, ["slow", "fast"])
+    assert voice == "fast"
+    for part in parts:
+        assert splitter.duration_model.estimate(part["content"], "fast") < 60
+
+@pytest.mark.asyncio
+async def test_tts_cache_lru_and_integrity(tmp_path):
+    """Test TTS cache hits, evicts least recently used and rejects corrupt audio."""
+    import os
+    from src.generators.tts_cache import TTSCache
+    cache = TTSCache(tmp_path / "tts", max_bytes=2500)
+    audio = tmp_path / "part.mp3"
+    audio.write_bytes(b"x" * 1000)
+    
+    first = cache.make_key("Hello   world", "en-US-GuyNeural")
+    assert first == cache.make_key("Hello world", "en-US-GuyNeural")
+    cache.put(first, str(audio), 1.5, "en-US-GuyNeural", [{"word": "Hello", "start": 0.0, "end": 0.4}])
+    assert cache.get(first)["duration"] == 1.5
+    
+    second = cache.make_key("second", "en-US-GuyNeural")
+    cache.put(second, str(audio), 1.0, "en-US-GuyNeural", [])
+    os.utime(cache._paths(second)[1], (1, 1))  # make it the oldest
+    cache.put(cache.make_key("third", "en-US-GuyNeural"), str(audio), 1.0, "en-US-GuyNeural", [])
+    assert cache.get(second) is None
+    assert cache.get(first) is not None
+    
+    cache._paths(first)[0].write_bytes(b"y" * 1000)
+    assert cache.get(first) is None
+
+@pytest.mark.asyncio
+async def test_chunked_tts_stitching():
+    """Test parallel chunks are stitched with a uniform pause and rebased timings."""
+    from src.generators.tts_backends import EdgeTTSBackend, MP3_FRAME_BYTES, MP3_FRAME_SECONDS
+    tts = EdgeTTSBackend()
+    frame = b"\xff" + b"\x00" * (MP3_FRAME_BYTES - 1)
+    
+    async def fake_stream(text, voice, rate=None):
+        # 1s of audio per chunk, one word from 0.24s to 0.72s
+        return frame * 42, [{"word": text.split()[0], "start": 0.24, "end": 0.72}]
+    
+    with patch.object(tts, "_synthesize_stream", side_effect=fake_stream), \
+         patch("src.generators.tts_backends.settings.TTS_CHUNK_PAUSE_MS", 240):
+        audio, timings = await tts._synthesize_chunked(["One.", "Two.", "Three."], "en-US-GuyNeural")
+    
+    assert [t["word"] for t in timings] == ["One.", "Two.", "Three."]
+    # Gap between consecutive words is the configured pause (to frame precision)
+    for prev, nxt in zip(timings, timings[1:]):
+        assert abs((nxt["start"] - prev["end"]) - 0.24) <= 2 * MP3_FRAME_SECONDS
+    assert len(audio) % MP3_FRAME_BYTES == 0
+
+@pytest.mark.asyncio
+async def test_story_level_tts_slicing(tmp_path):
+    """Test one story-level synthesis is cut into per-part cache entries with rebased timings."""
+    from src.generators.tts_generator import TTSGenerator, MP3_FRAME_BYTES, MP3_FRAME_SECONDS
+    from src.generators.tts_cache import TTSCache
+    tts = TTSGenerator()
+    cache = TTSCache(tmp_path, max_bytes=10**7)
+    frame = b"\xff" + b"\x00" * (MP3_FRAME_BYTES - 1)
+    
+    async def fake_stream(text, voice, rate=None):
+        # 5s of audio; part 2 ("Second part here.") starts at 2.5s after a pause
+        timings = [
+            {"word": "First", "start": 0.1, "end": 0.5},
+            {"word": "part", "start": 0.5, "end": 1.0},
+            {"word": "Second", "start": 2.5, "end": 3.0},
+            {"word": "part", "start": 3.0, "end": 3.4},
+            {"word": "here", "start": 3.4, "end": 4.0},
+        ]
+        return frame * round(5 / MP3_FRAME_SECONDS), timings
+    
+    with patch.object(tts.backend, "_synthesize_stream", side_effect=fake_stream) as stream, \
+         patch("src.generators.tts_generator.tts_cache", cache):
+        assert await tts.synthesize_story(["First part.", "Second part here."], "en-US-GuyNeural")
+        assert await tts.synthesize_story(["First part.", "Second part here."], "en-US-GuyNeural")
+        assert stream.call_count == 1
+        
+        out = str(tmp_path / "part2.mp3")
+        duration, _, timings = await tts.generate_audio("Second part here.", out, voice="en-US-GuyNeural")
+        assert stream.call_count == 1  # served from cache
+    
+    # Cut at the middle of the 1.0s-2.5s pause, snapped to a frame
+    assert [t["word"] for t in timings] == ["Second", "part", "here"]
+    assert abs(timings[0]["start"] - 0.75) <= MP3_FRAME_SECONDS
+    assert abs(duration - 2.25) <= MP3_FRAME_SECONDS
+    assert (tmp_path / "part2.mp3").stat().st_size % MP3_FRAME_BYTES == 0
+
+@pytest.mark.asyncio
+async def test_tts_stall_deadline_and_hedge():
+    """Test stalled streams time out and a slow request is hedged by a second one."""
+    import asyncio
+    from src.generators.tts_backends import EdgeTTSBackend
+    from src.utils.metrics import Metrics
+    tts = EdgeTTSBackend()
+    calls = []
+    
+    class FakeCommunicate:
+        def __init__(self, text, voice, rate=None):
+            calls.append(text)
+            self.delay = 5 if len(calls) == 1 else 0  # first request is slow
+        
+        async def stream(self):
+            await asyncio.sleep(self.delay)
+            yield {"type": "audio", "data": b"\xff"}
+            yield {"type": "WordBoundary", "offset": 0, "duration": 5_000_000, "text": "Hi"}
+    
+    fake_metrics = Metrics()
+    for _ in range(20):
+        fake_metrics.observe("tts.latency_per_char", 0.01)
+    
+    with patch("src.generators.tts_backends.edge_tts.Communicate", FakeCommunicate), \
+         patch("src.generators.tts_backends.metrics", fake_metrics), \
+         patch.multiple("src.generators.tts_backends.settings", TTS_STALL_SECONDS=10,
+                        TTS_DEADLINE_BASE_SECONDS=3, TTS_HEDGE_PERCENTILE=95, TTS_HEDGE_MIN_SAMPLES=20):
+        audio, timings = await tts._synthesize_stream("Hi", "v")
+    
+    assert len(calls) == 2
+    assert timings[0]["end"] == 0.5
+    assert fake_metrics.counters["tts.hedges"] == 1 and fake_metrics.counters["tts.hedge_wins"] == 1
+    
+    # Stall: no chunk within TTS_STALL_SECONDS
+    calls.clear()
+    with patch("src.generators.tts_backends.edge_tts.Communicate", FakeCommunicate), \
+         patch("src.generators.tts_backends.metrics", fake_metrics), \
+         patch("src.generators.tts_backends.settings.TTS_STALL_SECONDS", 0.05):
+        with pytest.raises(asyncio.TimeoutError):
+            await tts._stream_once("Hi", "v")
+    assert fake_metrics.counters["tts.stalls"] == 1
+
+@pytest.mark.asyncio
+async def test_local_tts_backend_and_fallback(tmp_path):
+    """Test espeak timings follow sentence audio and edge failures fall back to the local engine."""
+    import numpy as np
+    from src.generators.tts_backends import LocalTTSBackend, LAME_DELAY_SECONDS
+    from src.generators.tts_generator import TTSGenerator
+    from src.generators.tts_cache import TTSCache
+    
+    def wav(pcm, rate=20000):
+        data = pcm.astype("<i2").tobytes()
+        fmt = (16).to_bytes(4, "little") + (1).to_bytes(2, "little") + (1).to_bytes(2, "little") \
+            + rate.to_bytes(4, "little") + (rate * 2).to_bytes(4, "little") + (2).to_bytes(2, "little") + (16).to_bytes(2, "little")
+        return b"RIFF" + b"\xff" * 4 + b"WAVE" + b"fmt " + fmt + b"data" + b"\xff" * 4 + data
+    
+    local = LocalTTSBackend()
+    # 1s sentence: 0.25s silence, 0.5s speech, 0.25s silence
+    pcm = np.zeros(20000, dtype=np.int16)
+    pcm[5000:15000] = 8000
+    samples, rate = local._parse_wav(wav(pcm))
+    timings = local._spread_words("Hi there.", samples, rate, offset=2.0)
+    assert rate == 20000 and len(samples) == 20000
+    assert timings[0]["start"] == 2.25 and abs(timings[-1]["end"] - 2.75) < 1e-9
+    # "Hi" (3 units) vs "there." (7 units)
+    assert abs((timings[0]["end"] - timings[0]["start"]) - 0.15) < 1e-9
+    
+    async def fake_render(sentence, espeak_voice, words_per_minute):
+        assert espeak_voice == "en-us+f3"
+        return samples, rate
+    
+    async def fake_encode(pcm, sample_rate):
+        return b"\xff" * 144
+    
+    async def edge_down(text, voice, rate=None):
+        raise ConnectionError("edge-tts unreachable")
+    
+    with patch.multiple("src.generators.tts_generator.settings", TTS_BACKEND="edge", TTS_FALLBACK_BACKEND="espeak"):
+        tts = TTSGenerator()
+    with patch.object(tts.backend, "synthesize", side_effect=edge_down), \
+         patch.object(tts.fallback, "_render", side_effect=fake_render), \
+         patch.object(tts.fallback, "_encode_mp3", side_effect=fake_encode), \
+         patch("src.generators.tts_generator.tts_cache", TTSCache(tmp_path / "tts", max_bytes=10**6)):
+        duration, voice, timings = await tts.generate_audio("One. Two.", str(tmp_path / "out.mp3"), voice="en-US-AriaNeural")
+    
+    assert voice == "espeak:en-us+f3"
+    assert [t["word"] for t in timings] == ["One.", "Two."]
+    # Second sentence starts one sentence-length later, shifted by the encoder delay
+    assert abs(timings[1]["start"] - (1.25 + LAME_DELAY_SECONDS)) < 1e-9
+    assert abs(duration - (1.75 + LAME_DELAY_SECONDS)) < 1e-9
+
+@pytest.mark.asyncio
+async def test_local_tts_maps_edge_voice_names(tmp_path):
+    """Test an espeak-only setup speaks parts stored with edge voice names without touching edge."""
+    from src.generators.tts_backends import EdgeTTSBackend
+    from src.generators.tts_generator import TTSGenerator
+    from src.generators.tts_cache import TTSCache
+
+    voices_used = []
+
+    async def fake_synthesize(text, voice, rate=None):
+        voices_used.append(voice)
+        return b"\xff" * 144, [{"word": "Hi.", "start": 0.0, "end": 0.5}]
+
+    async def edge_called(*args, **kwargs):
+        raise AssertionError("edge-tts must not be used")
+
+    with patch.multiple("src.generators.tts_generator.settings", TTS_BACKEND="espeak", TTS_FALLBACK_BACKEND=""):
+        tts = TTSGenerator()
+    with patch.object(tts.backend, "synthesize", side_effect=fake_synthesize), \
+         patch.object(EdgeTTSBackend, "synthesize", edge_called), \
+         patch.object(EdgeTTSBackend, "synthesize_single", edge_called), \
+         patch("src.generators.tts_generator.tts_cache", TTSCache(tmp_path / "tts", max_bytes=10**6)):
+        assert await tts.synthesize_story(["Hi."], "en-US-GuyNeural") is False
+        _, voice, _ = await tts.generate_audio("Hi.", str(tmp_path / "out.mp3"), voice="en-US-GuyNeural")
+
+    assert voice == "espeak:en-us+m3"
+    assert voices_used == ["espeak:en-us+m3"]
+
+@pytest.mark.asyncio
+async def test_in_memory_audio_handoff(tmp_path):
+    """Test bleeps are mixed in one NumPy buffer, ready to hand to the encoder without re-encoding."""
+    import numpy as np
+    from pydub.generators import Sine
+    from src.generators.audio_mixer import AudioMixer, pcm_to_float
+    from src.generators.sound_bank import SoundBank
+    
+    mixer = AudioMixer()
+    mixer.sound_bank = SoundBank(cache_dir=tmp_path, assets_dir=tmp_path)
+    # Nothing to bleep: the TTS file is used as-is, never decoded
+    assert await mixer.mix_audio("clean text", "/nonexistent.mp3", [], bleep_intervals=[]) is None
+    
+    speech = Sine(200, sample_rate=24000).to_audio_segment(duration=2000).apply_gain(-12)
+    samples, rate = mixer.mix(pcm_to_float(speech), speech.frame_rate, [(0.5, 0.6), (1.0, 1.25)])
+    assert rate == 24000 and samples.shape == (48000, 1) and samples.dtype == np.float32
+    assert np.abs(samples).max() <= 1.0
+    # Short words still get 200ms of bleep, with a fade-in from the speech level
+    original = speech.get_array_of_samples()[12000] / 32768
+    assert abs(samples[12000, 0] - original) < 1e-3
+    assert not np.allclose(samples[12500:16800, 0], np.array(speech.get_array_of_samples()[12500:16800]) / 32768)
+    
+    with patch("src.generators.audio_mixer.settings.BLEEP_MUTE_SPEECH", True):
+        muted, _ = mixer.mix(np.zeros((48000, 1), dtype=np.float32), 24000, [(0.5, 0.9)])
+    assert np.abs(muted[12500:21000]).max() > 0 and np.abs(muted[30000:]).max() == 0
+
+def test_sound_bank_quantized_buffers(tmp_path):
+    """Test bank buffers cover the word, are tapered, loop short assets and cache resampled PCM."""
+    import numpy as np
+    from pydub.generators import Sine
+    from src.generators.sound_bank import SoundBank
+    
+    bank = SoundBank(cache_dir=tmp_path / "cache", assets_dir=tmp_path)
+    bleep = bank.get("bleep", 0.05, 24000)
+    assert bleep.shape == (4800, 1)  # Short words get the 200ms minimum
+    assert bleep[0, 0] == 0 and not bleep.flags.writeable
+    assert bank.get("bleep", 0.61, 24000).shape == (15360, 1)  # 640ms quantum
+    assert bank.get("bleep", 0.61, 24000) is bank.get("bleep", 0.62, 24000)
+    assert bank.get("bleep", 3.0, 24000).shape == (72000, 1)  # Beyond the bank: rendered on demand
+    
+    # A 100ms asset is looped to 1s and resampled once to the speech format
+    Sine(500).to_audio_segment(duration=100).export(str(tmp_path / "whoosh.wav"), format="wav")
+    whoosh = bank.get("whoosh", 1.0, 24000, channels=2)
+    assert whoosh.shape == (24000, 2) and np.abs(whoosh[20000:21000]).max() > 0.5
+    assert len(list((tmp_path / "cache").glob("whoosh-*-24000-2.npy"))) == 1
+
+def test_pause_trimming_remaps_timings():
+    """Test long pauses and edge silence are cut to their caps and timings follow."""
+    import numpy as np
+    from src.generators.pause_trimmer import PauseTrimmer
+    
+    rate = 24000
+    t = np.arange(int(3.6 * rate)) / rate
+    speech = (0.3 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+    voiced = ((t >= 0.5) & (t < 1.0)) | ((t >= 2.2) & (t < 2.6))
+    samples = (speech * voiced)[:, None]
+    timings = [{"word": "Hello", "start": 0.5, "end": 1.0}, {"word": "there", "start": 2.2, "end": 2.6}]
+    
+    with patch.multiple("src.generators.pause_trimmer.settings", TRIM_SILENCE_DB=-45,
+                        TRIM_MAX_PAUSE_MS=350, TRIM_LEAD_MS=100, TRIM_TAIL_MS=250):
+        trimmed, remapped = PauseTrimmer().trim(samples, rate, timings)
+    
+    # 0.1 lead + 0.5 word + 0.35 pause + 0.4 word + 0.25 tail
+    assert abs(len(trimmed) / rate - 1.6) < 0.011
+    assert abs(remapped[0]["start"] - 0.1) < 0.011 and abs(remapped[0]["end"] - 0.6) < 0.011
+    assert abs(remapped[1]["start"] - 0.95) < 0.011 and abs(remapped[1]["end"] - 1.35) < 0.011
+    # Speech itself is untouched: the second word's audio starts where its timing says
+    start = int(remapped[1]["start"] * rate)
+    assert np.abs(trimmed[start + 240:start + 2400]).max() > 0.2
+    assert np.abs(trimmed[start - 2400:start - 240]).max() == 0
+
+def test_word_timings_pack_roundtrip():
+    """Test word timings survive the compact blob format at float32 precision."""
+    from src.generators.word_timings import WordTimings
+    
+    timings = [{"word": w, "start": i * 0.3125, "end": i * 0.3125 + 0.25} for i, w in enumerate("Héllo, **** world!".split())]
+    blob = WordTimings.from_dicts(timings).to_bytes()
+    assert len(blob) < 8 + 8 * len(timings) + 64
+    
+    loaded = WordTimings.from_bytes(blob)
+    assert len(loaded) == 3 and loaded.words == ["Héllo,", "****", "world!"]
+    assert loaded.to_dicts() == timings  # Exact for these binary fractions
+    assert abs(loaded.duration - 0.875) < 1e-6
+    assert len(WordTimings.from_bytes(WordTimings.from_dicts([]).to_bytes())) == 0
+
+@pytest.mark.asyncio
+async def test_retry_reuses_stored_narration(tmp_path):
+    """Test a part's TTS output is stored with packed timings and reloaded on retry instead of re-synthesized."""
+    from contextlib import asynccontextmanager
+    from types import SimpleNamespace
+    from uuid import uuid4
+    import src.main as pipeline
+    
+    rows = []
+    
+    class FakeSession:
+        def add(self, row):
+            row.id = uuid4()
+            rows.append(row)
+        async def flush(self):
+            pass
+    
+    class FakeQueries:
+        def __init__(self, session):
+            pass
+        async def get_part_audio(self, story_part_id):
+            return next((r for r in reversed(rows) if r.story_part_id == story_part_id and r.status == "generated"), None)
+    
+    @asynccontextmanager
+    async def fake_session():
+        yield FakeSession()
+    
+    part = SimpleNamespace(id=uuid4(), content="Hello there world")
+    audio_path = tmp_path / f"{part.id}_audio.mp3"
+    audio_path.write_bytes(b"\xff" * 144)
+    timings = [{"word": "Hello", "start": 0.125, "end": 0.5}, {"word": "there", "start": 0.5, "end": 0.75}]
+    
+    with patch.object(pipeline, "get_db_session", fake_session), patch.object(pipeline, "DBQueries", FakeQueries):
+        assert await pipeline.load_narration(part, str(audio_path)) is None
+        audio_id = await pipeline.record_narration(part, str(audio_path), 0.75, "en-US-AriaNeural", 1.1, timings)
+        
+        assert await pipeline.load_narration(part, str(audio_path)) == (audio_id, "en-US-AriaNeural", 1.1, timings)
+        # Edited text or a cleaned-up file means synthesizing again
+        assert await pipeline.load_narration(SimpleNamespace(id=part.id, content="Changed"), str(audio_path)) is None
+        audio_path.unlink()
+        assert await pipeline.load_narration(part, str(audio_path)) is None
+
+class FakeFFmpeg:
+    """
+    Stand-in for the render engine's FFmpeg children. Every spawn is recorded
+    in `calls` as (args, kwargs, process); concat demuxer lists are captured in
+    `listings` as they were when the child started. Each child replays
+    `progress` on stdout and runs `seconds` unless killed, then exits with
+    `returncode` (each a value, or a function of the command line).
+    """
+    def __init__(self):
+        self.calls = []
+        self.listings = []
+        self.running = self.peak = self.killed = 0
+        self.progress, self.seconds, self.returncode = b"", 0.0, 0
+    
+    @property
+    def commands(self):
+        return [args for args, _, _ in self.calls]
+    
+    async def exec(self, *args, **kwargs):
+        if "concat" in args:
+            with open(args[args.index("concat") + 4]) as f:
+                self.listings.append(f.read())
+        returncode = self.returncode(args) if callable(self.returncode) else self.returncode
+        seconds = self.seconds(args) if callable(self.seconds) else self.seconds
+        proc = FakeFFmpegProcess(self, returncode, seconds)
+        self.calls.append((args, kwargs, proc))
+        return proc
+
+class FakeFFmpegProcess:
+    """One FFmpeg child: records stdin in `fed`, replays progress, runs until done or killed."""
+    def __init__(self, ffmpeg: FakeFFmpeg, returncode: int, seconds: float):
+        import asyncio
+        self.ffmpeg, self.seconds = ffmpeg, seconds
+        self.pid = 10**8 + len(ffmpeg.calls)  # Never a live process
+        self.stdin, self.fed = self, bytearray()
+        self.stdout, self.stderr = asyncio.StreamReader(), asyncio.StreamReader()
+        self.stdout.feed_data(ffmpeg.progress)
+        self.stdout.feed_eof()
+        self.stderr.feed_eof()
+        self.returncode, self._exit = None, returncode
+        ffmpeg.running += 1
+        ffmpeg.peak = max(ffmpeg.peak, ffmpeg.running)
+    
+    def write(self, data):
+        self.fed += data
+    
+    async def drain(self):
+        pass
+    
+    def close(self):
+        pass
+    
+    def kill(self):
+        self.ffmpeg.killed += 1
+        self.returncode = -9
+    
+    async def wait(self):
+        import asyncio
+        waited = 0.0
+        while self.returncode is None and waited < self.seconds:
+            await asyncio.sleep(0.01)
+            waited += 0.01
+        if self.returncode is None:
+            self.returncode = self._exit
+        self.ffmpeg.running -= 1
+        return self.returncode
+
+@pytest.fixture
+def fake_ffmpeg():
+    """Route the render engine's subprocesses to a FakeFFmpeg for the test."""
+    ffmpeg = FakeFFmpeg()
+    with patch("src.generators.render_engine.asyncio.create_subprocess_exec", ffmpeg.exec):
+        yield ffmpeg
+
+@pytest.mark.asyncio
+async def test_single_pass_render_command(tmp_path, fake_ffmpeg):
+    """Test the render is one FFmpeg graph (crop, scale, subtitles, audio) fed PCM on stdin."""
+    import numpy as np
+    from src.generators.render_engine import RenderEngine
+    
+    engine = RenderEngine()
+    cmd = engine.build_command("game.mp4", "C:\\temp\\subs.ass", "out.mp4", 63.5, audio_format=(24000, 1), start_offset=12.0)
+    graph = cmd[cmd.index("-filter_complex") + 1]
+    assert cmd.count("-i") == 2 and "pipe:0" in cmd and cmd[cmd.index("-t") + 1] == "63.500"
+    assert cmd[cmd.index("-ss") + 1] == "12.000" and cmd.index("-ss") < cmd.index("game.mp4")
+    assert f"scale={settings.VIDEO_WIDTH}:{settings.VIDEO_HEIGHT}" in graph
+    assert "ass='C\\:/temp/subs.ass'" in graph and "apad" in graph
+    assert cmd.count("-c:v") == 1 and "_temp" not in " ".join(cmd)
+    
+    # In-memory audio is piped as float32 PCM
+    samples = np.full((2400, 1), 0.5, dtype=np.float32)
+    await engine.render("game.mp4", "subs.ass", "out.mp4", 3.1, audio_samples=(samples, 24000))
+    args, _, proc = fake_ffmpeg.calls[0]
+    assert np.frombuffer(bytes(proc.fed), dtype="<f4").tolist() == [0.5] * 2400
+    assert "f32le" in args
+
+def test_gameplay_mezzanine_ingest_metadata():
+    """Test mezzanine transcode uses a fixed GOP and probe output maps onto gameplay_videos columns."""
+    import json
+    from src.generators.gameplay_library import GameplayLibrary
+    from src.generators.render_engine import RenderEngine
+    
+    library = GameplayLibrary()
+    with patch.multiple("src.generators.gameplay_library.settings", VIDEO_FPS=30, GAMEPLAY_GOP_SECONDS=1.0):
+        cmd = library.transcode_command("raw.mkv", "out.mp4")
+    assert cmd[cmd.index("-g") + 1] == "30" and cmd[cmd.index("-keyint_min") + 1] == "30"
+    assert cmd[cmd.index("-sc_threshold") + 1] == "0" and "-an" in cmd
+    
+    probe = json.dumps({
+        "frames": [{"pts_time": "0.000000"}, {"pts_time": "2.000000"}, {"pts_time": "1.000000"}],
+        "streams": [{"width": 720, "height": 1280, "avg_frame_rate": "30/1"}],
+        "format": {"duration": "2.966667", "size": "1048576"},
+    })
+    meta = GameplayLibrary.parse_probe(probe)
+    assert meta["keyframe_times"] == [0.0, 1.0, 2.0]
+    assert meta["fps"] == 30.0 and meta["width"] == 720 and meta["file_size_bytes"] == 1048576
+    assert abs(meta["duration_seconds"] - 2.966667) < 1e-9
+    
+    # Renders from a mezzanine only burn in subtitles
+    graph_cmd = RenderEngine().build_command("m.mp4", "s.ass", "o.mp4", 10, audio_path="a.mp3", normalized=True)
+    graph = graph_cmd[graph_cmd.index("-filter_complex") + 1]
+    assert "crop" not in graph and "scale" not in graph and "ass='s.ass'" in graph
+
+@pytest.mark.asyncio
+async def test_random_keyframe_offsets_and_concat_chain(tmp_path, fake_ffmpeg):
+    """Test gameplay starts at a keyframe away from recent starts and short sources chain via concat."""
+    import os
+    import random
+    from types import SimpleNamespace
+    from src.generators.gameplay_library import GameplayLibrary
+    from src.generators.render_engine import RenderEngine
+    
+    keyframes = [float(t) for t in range(0, 100)]
+    rng = random.Random(7)
+    for _ in range(20):
+        offset = GameplayLibrary.choose_offset(keyframes, 100.0, 40.0, [10.0, 50.0], rng)
+        assert offset in keyframes and offset + 40 <= 100
+        assert min(abs(offset - 10), abs(offset - 50)) >= 7
+    # Too short: starts at the first keyframe
+    assert GameplayLibrary.choose_offset([0.0, 1.0], 20.0, 40.0, [], rng) == 0.0
+    
+    short = SimpleNamespace(id=1, mezzanine_path="a.mp4", keyframe_times=[0.0, 1.0], duration_seconds=20.0, recent_offsets=None,
+                            usage_count=0, last_used_at=None)
+    other = SimpleNamespace(id=2, mezzanine_path="b.mp4", keyframe_times=keyframes, duration_seconds=100.0, recent_offsets=[],
+                            usage_count=0, last_used_at=None)
+    segments = GameplayLibrary().plan_segments(short, [other], 45.0, rng)
+    assert [s[0].id for s in segments] == [1, 2]
+    assert segments[0][1:] == (0.0, 20.0) and segments[1][1] in keyframes
+    assert abs(sum(end - start for _, start, end in segments) - 45.0) < 1e-9
+    
+    # One range: input-side seek without looping; several: concat demuxer list
+    engine = RenderEngine()
+    out = str(tmp_path / "o.mp4")
+    await engine.render(None, "s.ass", out, 30, audio_path="a.mp3", normalized=True, segments=[("m.mp4", 12.0, 42.0)])
+    await engine.render(None, "s.ass", out, 45, audio_path="a.mp3", normalized=True,
+                        segments=[("a.mp4", 0.0, 20.0), ("b.mp4", 33.0, 58.0)])
+    single, chained = fake_ffmpeg.commands
+    assert single[single.index("-ss") + 1] == "12.000" and "-stream_loop" not in single
+    listing = fake_ffmpeg.listings[0]
+    assert "-ss" not in chained and "-stream_loop" not in chained and chained[chained.index("-f") + 1] == "concat"
+    assert "inpoint 33.000" in listing and "outpoint 20.000" in listing and listing.count("file '") == 2
+    assert not os.path.exists(out + ".concat.txt")
+
+@pytest.mark.asyncio
+async def test_render_executor_bounds_kills_and_pins(fake_ffmpeg):
+    """Test renders are bounded by worker slots, niced/pinned, and killed on timeout or cancel."""
+    import asyncio
+    from src.generators.render_engine import RenderEngine, parse_cpu_list
+    
+    assert parse_cpu_list("0-2, 5") == {0, 1, 2, 5} and parse_cpu_list("") == set()
+    
+    # Nice/affinity are applied from the parent after spawn, never via preexec_fn
+    limited = []
+    fake_ffmpeg.seconds = 0.05
+    engine = RenderEngine(workers=2, nice=5, cpu_affinity="0", timeout=5)
+    with patch("src.generators.render_engine.os.setpriority", side_effect=lambda which, pid, prio: limited.append(("nice", pid))), \
+         patch("src.generators.render_engine.os.sched_setaffinity", side_effect=lambda pid, cpus: limited.append((cpus, pid))):
+        await asyncio.gather(*(engine._run(["ffmpeg"]) for _ in range(5)))
+        assert fake_ffmpeg.peak == 2 and fake_ffmpeg.killed == 0
+        assert all("preexec_fn" not in kwargs for _, kwargs, _ in fake_ffmpeg.calls)
+        assert sorted(limited, key=str) == sorted([("nice", p.pid) for _, _, p in fake_ffmpeg.calls] +
+                                                  [({0}, p.pid) for _, _, p in fake_ffmpeg.calls], key=str)
+        
+        fake_ffmpeg.seconds = 10
+        engine = RenderEngine(workers=1, nice=0, cpu_affinity="", timeout=0.05)
+        with pytest.raises(RuntimeError, match="timed out"):
+            await engine._run(["ffmpeg"])
+        assert fake_ffmpeg.killed == 1 and len(limited) == 10
+    
+    engine.timeout = 10
+    task = asyncio.create_task(engine._run(["ffmpeg"]))
+    await asyncio.sleep(0.05)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    assert fake_ffmpeg.killed == 2 and fake_ffmpeg.running == 0 and not engine.jobs
+
+@pytest.mark.asyncio
+async def test_render_progress_telemetry(fake_ffmpeg):
+    """Test -progress blocks become live fps/speed/bytes/ETA and final per-preset stats."""
+    import asyncio
+    from src.generators.render_engine import RenderEngine, parse_progress
+    
+    assert parse_progress({"speed": "N/A", "fps": "0.00"})["speed"] == 0.0
+    
+    engine = RenderEngine(workers=1, timeout=5, profile="throughput")
+    progress = (
+        b"frame=300\nfps=150.0\ntotal_size=1048576\nout_time_us=10000000\nspeed=5.0x\nprogress=continue\n"
+        b"frame=900\nfps=160.0\ntotal_size=3145728\nout_time_us=30000000\nspeed=5.5x\nprogress=end\n"
+    )
+    fake_ffmpeg.progress, fake_ffmpeg.seconds = progress, 0.05
+    seen = []
+    
+    async def watch():
+        while not engine.jobs:
+            await asyncio.sleep(0.005)
+        await asyncio.sleep(0.02)
+        seen.append(engine.progress())
+    
+    await asyncio.gather(engine.render("game.mp4", "s.ass", "out.mp4", 30.0, audio_path="a.mp3"), watch())
+    cmd = fake_ffmpeg.commands[0]
+    assert cmd[cmd.index("-progress") + 1] == "pipe:1"
+    live = seen[0]["out.mp4"]
+    assert live["fps"] == 160.0 and live["bytes"] == 3145728 and live["eta_seconds"] == 0.0
+    
+    result = engine.pop_result("out.mp4")
+    assert result["speed"] == 5.5 and result["preset"] == "throughput" and result["source"] == "game.mp4"
+    assert result["elapsed"] > 0 and engine.pop_result("out.mp4") is None and not engine.jobs
+
+def test_encoding_profiles_and_benchmark_winner(tmp_path):
+    """Test profiles map to x264 args and the benchmark winner becomes the default profile."""
+    from src.generators import encoding_profiles as ep
+    
+    args = ep.codec_args("size")
+    assert args[args.index("-preset") + 1] == "medium" and args[args.index("-maxrate") + 1] == settings.VIDEO_BITRATE
+    assert "-maxrate" not in ep.codec_args("throughput") and "-tune" in ep.codec_args("quality")
+    assert ep._double_rate("2M") == "4M" and ep._double_rate("1500k") == "3000k"
+    
+    assert ep.parse_ssim("[Parsed_ssim_0 @ 0x1] SSIM Y:0.99 U:0.98 V:0.98 All:0.987654 (19.08)") == 0.987654
+    assert ep.parse_vmaf("[libvmaf @ 0x2] VMAF score: 94.51") == 94.51
+    
+    results = {
+        "throughput": {"fps": 400.0, "bytes": 9000, "ssim": 0.93},
+        "size": {"fps": 120.0, "bytes": 3000, "ssim": 0.96},
+        "quality": {"fps": 60.0, "bytes": 7000, "ssim": 0.99},
+    }
+    assert ep.pick_winner(results, 0.95) == "size" and ep.pick_winner(results, 0.999) is None
+    
+    with patch.multiple("src.generators.encoding_profiles.settings", CACHE_DIR=tmp_path, VIDEO_ENCODING_PROFILE=""):
+        assert ep.default_profile() == ep.DEFAULT_PROFILE
+        ep.record_winner(results, "size")
+        assert ep.default_profile() == "size"
+    with patch.multiple("src.generators.encoding_profiles.settings", CACHE_DIR=tmp_path, VIDEO_ENCODING_PROFILE="quality"):
+        assert ep.default_profile() == "quality"
+
+@pytest.mark.asyncio
+async def test_gameplay_cache_lru_checksums_and_balance(tmp_path):
+    """Test the gameplay cache mirrors Drive, verifies checksums, evicts LRU and prefers unused clips."""
+    import hashlib
+    import json
+    import os
+    import random
+    from contextlib import asynccontextmanager
+    from datetime import datetime, timedelta
+    from types import SimpleNamespace
+    from src.generators.gameplay_library import GameplayLibrary
+    
+    source = b"raw gameplay" * 10
+    good_md5 = hashlib.md5(source).hexdigest()
+    listing = [
+        {"id": "a", "name": "a.mp4", "md5Checksum": good_md5},
+        {"id": "b", "name": "b.mp4", "md5Checksum": "0" * 32},
+        {"id": "c", "name": "c.mp4", "md5Checksum": good_md5},
+    ]
+    rows = {"c": SimpleNamespace(drive_file_id="c", filename="c.mp4", source_md5=good_md5, usage_count=5,
+                                 last_used_at=None, mezzanine_path=None, mezzanine_sha256=None)}
+    
+    class FakeQueries:
+        def __init__(self, session):
+            pass
+        async def sync_gameplay_listing(self, files):
+            for f in files:
+                row = rows.setdefault(f["id"], SimpleNamespace(
+                    drive_file_id=f["id"], filename=f["name"], usage_count=0, last_used_at=None,
+                    mezzanine_path=None, mezzanine_sha256=None))
+                row.source_md5 = f["md5Checksum"]
+        async def get_active_gameplay_videos(self):
+            return list(rows.values())
+        async def upsert_gameplay_video(self, data):
+            rows[data["drive_file_id"]].__dict__.update(data)
+        async def clear_gameplay_mezzanine(self, drive_file_id):
+            rows[drive_file_id].mezzanine_path = rows[drive_file_id].mezzanine_sha256 = None
+    
+    @asynccontextmanager
+    async def fake_session():
+        yield None
+    
+    async def fake_download(file_id, path):
+        with open(path, "wb") as f:
+            f.write(source)
+    
+    async def fake_run(cmd):
+        if "-show_frames" in cmd:
+            return json.dumps({"frames": [{"pts_time": "0.0"}], "streams": [{"width": 720, "height": 1280}],
+                               "format": {"duration": "30.0", "size": "100"}}).encode()
+        with open(cmd[-1], "wb") as f:
+            f.write(os.urandom(100))
+        return b""
+    
+    library = GameplayLibrary(tmp_path, max_bytes=250)
+    library._run = fake_run
+    with patch("src.database.connection.get_db_session", fake_session), \
+         patch("src.database.queries.DBQueries", FakeQueries), \
+         patch("src.uploaders.drive_uploader.drive_uploader.list_gameplay_videos", side_effect=lambda: listing), \
+         patch("src.uploaders.drive_uploader.drive_uploader.download_file", side_effect=fake_download), \
+         patch("src.generators.gameplay_library.settings.GAMEPLAY_PREFETCH", 2):
+        # Least used first: a ingests, b fails its md5, c (used 5x) waits
+        assert await library.sync() == 1
+        assert rows["a"].mezzanine_path and not rows["b"].mezzanine_path and not rows["c"].mezzanine_path
+        
+        # Budget holds two clips: fetching b and c evicts the least recently used (a)
+        os.utime(rows["a"].mezzanine_path, (1, 1))
+        listing[1]["md5Checksum"] = rows["b"].source_md5 = good_md5
+        assert await library.prefetch(count=5) == 2
+        assert rows["a"].mezzanine_path is None and not (tmp_path / "a.mp4").exists()
+        assert rows["b"].mezzanine_path and rows["c"].mezzanine_path
+        
+        # A corrupted local file is dropped on the next sync
+        with open(rows["b"].mezzanine_path, "r+b") as f:
+            f.write(b"\0" * 10)
+        with patch("src.generators.gameplay_library.settings.GAMEPLAY_PREFETCH", 0):
+            await library.sync()
+        assert rows["b"].mezzanine_path is None and not (tmp_path / "b.mp4").exists()
+        assert rows["c"].mezzanine_path
+    
+    # Selection prefers the least used / longest unused clips
+    now = datetime(2026, 1, 1)
+    videos = [SimpleNamespace(id=i, usage_count=n, last_used_at=now - timedelta(days=d))
+              for i, (n, d) in enumerate([(9, 1), (0, 1), (0, 5), (3, 2), (7, 9), (8, 1), (4, 3), (6, 2)])]
+    picks = {library.choose_balanced(videos, random.Random(seed)).id for seed in range(30)}
+    assert picks == {1, 2}
+
+@pytest.mark.asyncio
+async def test_gameplay_ingest_shared_and_killed_on_cancel(tmp_path):
+    """Test concurrent ingests of one file share a single run and cancelled transcodes are killed."""
+    import asyncio
+    from src.generators.gameplay_library import GameplayLibrary
+    
+    library = GameplayLibrary(tmp_path)
+    started = []
+    
+    async def slow_ingest(drive_file):
+        started.append(drive_file["id"])
+        await asyncio.sleep(0.05)
+        return {"drive_file_id": drive_file["id"]}
+    
+    library._ingest = slow_ingest
+    rows = await asyncio.gather(library.ingest({"id": "a"}), library.ingest({"id": "a"}), library.ingest({"id": "b"}))
+    assert started == ["a", "b"] and [r["drive_file_id"] for r in rows] == ["a", "a", "b"]
+    assert not library._ingests
+    
+    class HungFFmpeg:
+        returncode = None
+        killed = False
+        async def communicate(self):
+            await asyncio.sleep(10)
+        def kill(self):
+            self.killed = True
+        async def wait(self):
+            return -9
+    
+    proc = HungFFmpeg()
+    
+    async def fake_exec(*args, **kwargs):
+        return proc
+    
+    with patch("src.generators.gameplay_library.asyncio.create_subprocess_exec", side_effect=fake_exec):
+        task = asyncio.create_task(library._run(["ffmpeg", "-i", "raw.mkv", "out.mp4"]))
+        await asyncio.sleep(0.02)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    assert proc.killed
+
+@pytest.mark.asyncio
+async def test_gameplay_verify_hashes_only_changed_files(tmp_path):
+    """Test sync-time verification trusts size+mtime and re-hashes only files that changed."""
+    import os
+    from types import SimpleNamespace
+    from src.generators import gameplay_library as library_module
+    from src.utils.helpers import file_checksum
+
+    path = tmp_path / "a.mp4"
+    path.write_bytes(b"mezzanine" * 10)
+    stat = path.stat()
+    video = SimpleNamespace(mezzanine_path=str(path), file_size_bytes=stat.st_size,
+                            mezzanine_sha256=file_checksum(path), mezzanine_mtime=stat.st_mtime)
+    hashed = []
+
+    def counting_checksum(p, algorithm="sha256"):
+        hashed.append(p)
+        return file_checksum(p, algorithm)
+
+    with patch.object(library_module, "file_checksum", counting_checksum):
+        assert await library_module.GameplayLibrary._verify(video) and hashed == []
+
+        # Touched but identical: hashed once, then trusted again at the new mtime
+        os.utime(path, (stat.st_atime, stat.st_mtime + 5))
+        assert await library_module.GameplayLibrary._verify(video) and len(hashed) == 1
+        assert video.mezzanine_mtime == stat.st_mtime + 5
+        assert await library_module.GameplayLibrary._verify(video) and len(hashed) == 1
+
+        # Same size, different content
+        path.write_bytes(b"corrupted" * 10)
+        assert not await library_module.GameplayLibrary._verify(video) and len(hashed) == 2
+
+@pytest.mark.asyncio
+async def test_batch_render_shares_gameplay_decode(fake_ffmpeg):
+    """Test a story's parts render from one FFmpeg process: split/trim video, atrim'd audio, N outputs."""
+    import numpy as np
+    from src.generators.render_engine import RenderEngine
+    
+    engine = RenderEngine(workers=1, timeout=5, profile="throughput")
+    parts = [
+        ("p1.ass", "p1.mp4", 33.0, (np.full((24000 * 30, 1), 0.25, dtype=np.float32), 24000)),
+        ("p2.ass", "p2.mp4", 21.5, (np.full((24000 * 18, 1), 0.5, dtype=np.float32), 24000)),
+    ]
+    outputs = await engine.render_batch(None, parts, normalized=True, segments=[("m.mp4", 40.0, 94.5)])
+    assert outputs == ["p1.mp4", "p2.mp4"] and len(fake_ffmpeg.calls) == 1
+    
+    cmd, _, proc = fake_ffmpeg.calls[0]
+    graph = cmd[cmd.index("-filter_complex") + 1]
+    assert cmd.count("-i") == 2 and cmd[cmd.index("-ss") + 1] == "40.000"
+    assert "split=2[g0][g1]" in graph and "asplit=2[s0][s1]" in graph and "crop" not in graph
+    assert "[g1]trim=start=33.000:duration=21.500" in graph
+    assert "atrim=start_sample=720000:end_sample=1152000" in graph
+    assert cmd.count("-c:v") == 2 and cmd[-1] == "p2.mp4" and cmd[cmd.index("p1.mp4") - 1] == "+faststart"
+    
+    # Narrations are streamed back to back
+    fed = np.frombuffer(bytes(proc.fed), dtype="<f4")
+    assert len(fed) == 24000 * 48 and fed[0] == 0.25 and fed[-1] == 0.5
+    assert engine.pop_result("p2.mp4")["batch_size"] == 2 and engine.pop_result("p1.mp4")
+    
+    with pytest.raises(ValueError):
+        await engine.render_batch("g.mp4", [parts[0], ("p3.ass", "p3.mp4", 5.0, (np.zeros((10, 2), np.float32), 24000))])
+
+@pytest.mark.asyncio
+async def test_batch_render_apportions_encode_stats(fake_ffmpeg):
+    """Test each batched part is credited its share of the encode time, not the whole batch's."""
+    import numpy as np
+    from src.generators.render_engine import RenderEngine
+    
+    engine = RenderEngine(workers=1, timeout=5, profile="throughput")
+    fake_ffmpeg.progress = b"frame=1200\nfps=300.0\ntotal_size=4194304\nout_time_us=40000000\nspeed=10.0x\nprogress=end\n"
+    fake_ffmpeg.seconds = 0.05
+    audio = (np.zeros((2400, 1), dtype=np.float32), 24000)
+    await engine.render_batch("g.mp4", [("p1.ass", "p1.mp4", 30.0, audio), ("p2.ass", "p2.mp4", 10.0, audio)])
+    
+    p1, p2 = engine.pop_result("p1.mp4"), engine.pop_result("p2.mp4")
+    assert abs(p1["elapsed"] - 3 * p2["elapsed"]) < 1e-9
+    assert p1["out_seconds"] == 30.0 and p2["out_seconds"] == 10.0
+    assert p1["speed"] == p2["speed"] == 10.0 and p1["bytes"] is None and p1["batch_size"] == 2
+
+@pytest.mark.asyncio
+async def test_segment_parallel_encoding(tmp_path, fake_ffmpeg):
+    """Test long renders split at GOP boundaries by idle cores, encode in parallel and stream-copy concat."""
+    import os
+    from src.generators.render_engine import RenderEngine
+    
+    timeline = RenderEngine.split_timeline(63.5, 4, 1.0)
+    assert [start for start, _ in timeline] == [0.0, 16.0, 32.0, 47.0]
+    assert abs(sum(length for _, length in timeline) - 63.5) < 1e-9
+    assert RenderEngine.split_timeline(1.5, 4, 1.0) == [(0.0, 1.5)]
+    
+    engine = RenderEngine(workers=1, timeout=5, profile="throughput")
+    with patch.object(engine, "idle_cores", return_value=13.0), \
+         patch.multiple("src.generators.render_engine.settings", RENDER_SEGMENT_THREADS=4, RENDER_SEGMENT_MIN_SECONDS=10):
+        assert engine.segment_count(63.5) == 3 and engine.segment_count(25) == 2 and engine.segment_count(8) == 1
+    
+    fake_ffmpeg.seconds = 0.05
+    out = str(tmp_path / "o.mp4")
+    with patch.object(engine, "idle_cores", return_value=16.0), \
+         patch.multiple("src.generators.render_engine.settings", RENDER_PARALLEL_SEGMENTS=True,
+                        RENDER_SEGMENT_THREADS=4, RENDER_SEGMENT_MIN_SECONDS=10, GAMEPLAY_GOP_SECONDS=1.0):
+        await engine.render(None, "s.ass", out, 45.0, audio_path="a.mp3", normalized=True, segments=[("m.mp4", 20.0, 65.0)])
+    
+    segment_cmds, mux, listing = fake_ffmpeg.commands[:4], fake_ffmpeg.commands[4], fake_ffmpeg.listings[0]
+    assert fake_ffmpeg.peak == 4  # Segments run side by side despite one worker slot
+    seeks = sorted(float(c[c.index("-ss") + 1]) for c in segment_cmds)
+    assert seeks == [20.0, 31.0, 42.0, 54.0]
+    assert all("-an" in c and "setpts=PTS-STARTPTS" in c[c.index("-filter_complex") + 1] for c in segment_cmds)
+    assert mux[mux.index("-c:v") + 1] == "copy" and listing.count("file '") == 4
+    assert engine.pop_result(out)["segments"] == 4
+    assert not [f for f in os.listdir(tmp_path) if ".seg" in f or f.endswith(".txt")]
+
+@pytest.mark.asyncio
+async def test_segment_failure_kills_sibling_encodes(tmp_path, fake_ffmpeg):
+    """Test one failed segment cancels the others and kills their FFmpeg children before cleanup."""
+    import os
+    from src.generators.render_engine import RenderEngine
+    
+    failing = lambda args: any(str(a).endswith(".seg1.mp4") for a in args)
+    fake_ffmpeg.returncode = lambda args: 1 if failing(args) else 0
+    fake_ffmpeg.seconds = lambda args: 0.02 if failing(args) else 10
+    
+    engine = RenderEngine(workers=1, timeout=30, profile="throughput")
+    out = str(tmp_path / "o.mp4")
+    with patch.object(engine, "idle_cores", return_value=16.0), \
+         patch.multiple("src.generators.render_engine.settings", RENDER_PARALLEL_SEGMENTS=True,
+                        RENDER_SEGMENT_THREADS=4, RENDER_SEGMENT_MIN_SECONDS=10, GAMEPLAY_GOP_SECONDS=1.0):
+        with pytest.raises(RuntimeError, match="failed \\(1\\)"):
+            await engine.render(None, "s.ass", out, 45.0, audio_path="a.mp3", normalized=True, segments=[("m.mp4", 20.0, 65.0)])
+    
+    assert len(fake_ffmpeg.calls) == 4  # No mux after the failure
+    assert fake_ffmpeg.killed == 3 and fake_ffmpeg.running == 0 and not engine.jobs
+    assert not [f for f in os.listdir(tmp_path) if ".seg" in f or f.endswith(".txt")]
+
+def test_multi_variant_outputs_from_one_decode(tmp_path):
+    """Test extra formats split one decode, each cropped/scaled/subtitled and encoded to its own file."""
+    from src.generators.output_variants import parse_variants, variant_path
+    from src.generators.render_engine import RenderEngine
+    from src.generators.subtitle_generator import SubtitleGenerator
+    
+    variants = parse_variants("reels:1080x1920:4M:watermark, square:1081x1080, broken:wide")
+    assert [v["name"] for v in variants] == ["reels", "square"]
+    assert variants[0]["bitrate"] == "4M" and variants[0]["watermark"] is True
+    assert variants[1]["width"] == 1080 and variants[1]["bitrate"] is None and variants[1]["watermark"] is False
+    assert variant_path("/t/story_1.mp4", "square") == "/t/story_1_square.mp4"
+    
+    # Per-variant subtitles are laid out for the variant's size, watermark optional
+    ass = tmp_path / "square.ass"
+    timings = [{"word": "hello", "start": 0.0, "end": 0.5}]
+    with patch("src.generators.subtitle_generator.settings.WATERMARK_TEXT", "@chan"):
+        SubtitleGenerator().generate_ass(timings, str(ass), width=1080, height=1080, watermark=False)
+        text = ass.read_text(encoding="utf-8")
+        assert "PlayResX: 1080" in text and "PlayResY: 1080" in text and "@chan" not in text
+        SubtitleGenerator().generate_ass(timings, str(ass))
+        assert "@chan" in ass.read_text(encoding="utf-8")
+    
+    outputs = [{**v, "subtitle_path": f"{v['name']}.ass", "output_path": f"o_{v['name']}.mp4"} for v in variants]
+    cmd = RenderEngine(profile="throughput").build_command(
+        "m.mp4", "s.ass", "o.mp4", 30.0, audio_path="a.mp3", normalized=True, variants=outputs
+    )
+    graph = cmd[cmd.index("-filter_complex") + 1]
+    assert cmd.count("-i") == 2 and "split=3[g0][g1][g2]" in graph and "asplit=3[a0][a1][a2]" in graph
+    assert "[g0]ass='s.ass'[v0]" in graph  # Mezzanine already at the primary size
+    assert "scale=1080:1920" in graph and "scale=1080:1080" in graph and "ass='square.ass'" in graph
+    assert [cmd[i + 1] for i, arg in enumerate(cmd) if arg == "-movflags"] == ["+faststart"] * 3
+    assert cmd[cmd.index("o_reels.mp4") - 1] == "+faststart" and cmd[-1] == "o_square.mp4"
+    reels_args = cmd[cmd.index("o.mp4") + 1:cmd.index("o_reels.mp4")]
+    assert reels_args[reels_args.index("-maxrate") + 1] == "4M"
+    
+    # Without variants the graph stays a single chain
+    single = RenderEngine(profile="throughput").build_command("m.mp4", "s.ass", "o.mp4", 30.0, audio_path="a.mp3", normalized=True)
+    assert "split" not in single[single.index("-filter_complex") + 1]
+
+def test_mezzanine_covers_largest_variant():
+    """Test mezzanines are transcoded big enough for every variant, so none is upscaled from 720p."""
+    from src.generators.gameplay_library import GameplayLibrary
+    from src.generators.output_variants import mezzanine_size, parse_variants
+    from src.generators.render_engine import RenderEngine
+    
+    spec = "reels:1080x1920,square:1080x1080"
+    with patch.multiple("src.generators.output_variants.settings", VIDEO_WIDTH=720, VIDEO_HEIGHT=1280, OUTPUT_VARIANTS=""):
+        assert mezzanine_size() == (720, 1280)
+    with patch.multiple("src.generators.output_variants.settings", VIDEO_WIDTH=720, VIDEO_HEIGHT=1280,
+                        OUTPUT_VARIANTS="square:1200x1200"):
+        assert mezzanine_size() == (1200, 2134)
+    
+    with patch.multiple("src.generators.output_variants.settings", VIDEO_WIDTH=720, VIDEO_HEIGHT=1280, OUTPUT_VARIANTS=spec):
+        assert mezzanine_size() == (1080, 1920)
+        transcode = GameplayLibrary().transcode_command("raw.mkv", "out.mp4")
+        assert "scale=1080:1920" in transcode[transcode.index("-vf") + 1]
+        
+        outputs = [{**v, "subtitle_path": f"{v['name']}.ass", "output_path": f"o_{v['name']}.mp4"} for v in parse_variants(spec)]
+        engine = RenderEngine(profile="throughput")
+        cmd = engine.build_command("m.mp4", "s.ass", "o.mp4", 30.0, audio_path="a.mp3", normalized=True, variants=outputs)
+        graph = cmd[cmd.index("-filter_complex") + 1]
+        assert "scale=720:1280" in graph  # Main video scaled down from the mezzanine
+        assert "[g1]ass='reels.ass'[v1]" in graph  # Reels is the mezzanine size
+        assert "scale=1080:1080" in graph and "scale=1080:1920" not in graph
+        
+        segment = engine.build_segment_command("m.mp4", "s.ass", "o.seg0.mp4", 0.0, 0.0, 10.0)
+        assert "scale=720:1280" in segment[segment.index("-filter_complex") + 1]
+
 if __name__ == "__main__":
     import asyncio
     try: